@@ -0,0 +1,81 @@
+"""
+Compares the dict and numpy aggregation engines at summing and ranking daily top article
+views, on daily payloads built from the June 2023 monthly snapshot and on synthetic
+365 day inputs.
+
+Usage, from the benchmarks directory:
+    python3 aggregation_benchmark.py [--repeat 5] [--vocabulary 20000]
+"""
+
+import argparse
+import random
+import timeit
+
+import context  # noqa: F401 (puts src on the path)
+from aggregation import DictEngine, NumpyEngine
+from stub_server import load_snapshot_articles, top_payload, TOP_ARTICLES_PER_DAY
+
+
+def snapshot_days():
+    articles = load_snapshot_articles()
+    return [top_payload(articles, "2023", "06", day) for day in range(1, 31)]
+
+
+def synthetic_days(days, vocabulary_size):
+    rand = random.Random(0)
+    vocabulary = ["Article_{n}".format(n=n) for n in range(vocabulary_size)]
+    results = []
+    for _ in range(days):
+        names = rand.sample(vocabulary, TOP_ARTICLES_PER_DAY)
+        articles = [
+            {"article": name, "views": int(rand.paretovariate(1.2) * 1000)}
+            for name in names
+        ]
+        results.append({"items": [{"articles": articles}]})
+    return results
+
+
+def best_of(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def compare(label, daily_results, repeat):
+    print("{label}: {n} days".format(label=label, n=len(daily_results)))
+    rankings = []
+    for engine in [DictEngine(), NumpyEngine()]:
+        daily_views = [engine.daily_views(day) for day in daily_results]
+        convert = best_of(
+            lambda: [engine.daily_views(day) for day in daily_results], repeat
+        )
+        total = best_of(lambda: engine.sum(daily_views), repeat)
+        totals = engine.sum(daily_views)
+        rank_all = best_of(lambda: engine.rank(totals), repeat)
+        rank_100 = best_of(lambda: engine.rank(totals, 100), repeat)
+        rankings.append(engine.rank(totals))
+        print(
+            "  {name:<12} daily views {convert:8.2f} ms  sum {total:8.2f} ms  "
+            "rank all {rank_all:8.2f} ms  rank top 100 {rank_100:8.2f} ms".format(
+                name=type(engine).__name__,
+                convert=convert,
+                total=total,
+                rank_all=rank_all,
+                rank_100=rank_100,
+            )
+        )
+    print("  rankings identical: {same}".format(same=rankings[0] == rankings[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args()
+
+    compare("top_monthly_202306 snapshot", snapshot_days(), args.repeat)
+    compare(
+        "synthetic year", synthetic_days(365, args.vocabulary), max(args.repeat // 2, 1)
+    )
+
+
+if __name__ == "__main__":
+    main()
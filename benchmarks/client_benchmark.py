@@ -0,0 +1,74 @@
+"""
+Compares a 31 day top_articles fan-out using one-off requests.get calls (a new
+connection per URL) against the pooled keep-alive session in wikipedia_client.
+
+Usage, from the benchmarks directory:
+    python3 client_benchmark.py [--rounds 5] [--handshake-latency 0.02]
+"""
+
+import argparse
+import os
+import requests
+import time
+
+# Measure connection reuse, not the upstream rate limit or a cache left on disk
+os.environ.setdefault("PAGEVIEWS_RATE_LIMIT", "100000")
+os.environ.setdefault("PAGEVIEWS_CACHE_PATH", "")
+
+from context import wikipedia_client
+from stub_server import StubUpstream
+
+DATES = ["2023/07/{:02d}".format(day) for day in range(1, 32)]
+
+
+class UnpooledSession:
+    """Mimics the previous behaviour of calling requests.get for every URL"""
+
+    def get(self, url, **kwargs):
+        return requests.get(url, **kwargs)
+
+
+def time_top_articles(rounds):
+    timings = []
+    for _ in range(rounds):
+        # Every round goes upstream, rather than being answered from the response cache
+        wikipedia_client.response_cache.clear()
+        wikipedia_client.rate_limiter.reset()
+        start = time.perf_counter()
+        wikipedia_client.top_articles(DATES)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--handshake-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with StubUpstream(args.latency, args.handshake_latency) as stub:
+        wikipedia_client.BASE_URL = stub.base_url
+        pooled_session = wikipedia_client.session
+
+        for name, session in [
+            ("requests.get per URL", UnpooledSession()),
+            ("pooled keep-alive session", pooled_session),
+        ]:
+            wikipedia_client.session = session
+            connections = stub.connections
+            best, mean = time_top_articles(args.rounds)
+            print(
+                "{name:<28} best {best:7.1f} ms  mean {mean:7.1f} ms  "
+                "connections opened {conns}".format(
+                    name=name,
+                    best=best * 1000,
+                    mean=mean * 1000,
+                    conns=stub.connections - connections,
+                )
+            )
+        wikipedia_client.session = pooled_session
+
+
+if __name__ == "__main__":
+    main()
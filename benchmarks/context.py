@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import config
+from src import pageviews
+from src import wikipedia_client
+from src import response
+from src import compression
+from src import jsonlib
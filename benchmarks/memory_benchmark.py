@@ -0,0 +1,68 @@
+"""
+Measures the peak Python memory used to fetch and aggregate a month (or a year) of daily
+top article payloads from the local stub server, holding every decoded payload until
+they are all fetched versus parsing each body into compact daily views as it arrives.
+
+The response cache is disabled so cached bodies don't count towards either peak.
+
+Usage, from the benchmarks directory:
+    python3 memory_benchmark.py [--days 31]
+"""
+
+import argparse
+import os
+import tracemalloc
+
+os.environ["PAGEVIEWS_CACHE_MAX_BYTES"] = "0"
+
+from context import wikipedia_client, response
+from aggregation import DictEngine
+from datetime import date, timedelta
+from jsonlib import loads
+from stub_server import StubUpstream
+
+
+def full_payloads(dates):
+    payloads = wikipedia_client.top_articles(dates)
+    return response.TopViewsResponse(payloads, date.today(), date.today())
+
+
+def streamed(dates):
+    engine = DictEngine()
+    daily_views = wikipedia_client.top_articles(
+        dates, parse=lambda body: engine.daily_views(loads(body))
+    )
+    return engine.rank(engine.sum(daily_views))
+
+
+def peak_memory(fn, dates):
+    tracemalloc.start()
+    fn(dates)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=31)
+    args = parser.parse_args()
+
+    start = date(2023, 1, 1)
+    dates = [
+        (start + timedelta(days=x)).strftime("%Y/%m/%d") for x in range(args.days)
+    ]
+    with StubUpstream() as stub:
+        wikipedia_client.BASE_URL = stub.base_url
+        # Warm the stub's payloads so they are not part of either measurement
+        wikipedia_client.top_articles(dates, parse=len)
+        for name, fn in [("decoded payloads", full_payloads), ("streamed", streamed)]:
+            print(
+                "{name:<18} peak {mb:6.1f} MB for {days} days".format(
+                    name=name, mb=peak_memory(fn, dates) / 2**20, days=args.days
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
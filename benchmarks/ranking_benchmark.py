@@ -0,0 +1,41 @@
+"""
+Times ranking the article totals of the June 2023 monthly snapshot with a full sort
+against selecting only the top k articles with a bounded heap.
+
+Usage, from the benchmarks directory:
+    python3 ranking_benchmark.py [--repeat 20]
+"""
+
+import argparse
+import timeit
+
+from context import response
+from stub_server import load_snapshot_articles
+
+LIMITS = [50, 100, 1000, None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    totals = {a["article"]: a["views"] for a in load_snapshot_articles()}
+    print("ranking {n} articles".format(n=len(totals)))
+    for limit in LIMITS:
+        best = min(
+            timeit.repeat(
+                lambda: response.rank_articles(totals, limit),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(
+            "limit {limit:>5}: {ms:7.2f} ms".format(
+                limit=str(limit or "all"), ms=best * 1000
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Measures the memory a cached ranking holds, for a ranking as large as a year-long date
+range produces, kept as one dict per ranked article versus as the columns of a
+TopViewsResponse (a tuple of names and an array of views). The article names are shared
+with the summed totals in both cases, so only the ranking's own memory is counted.
+
+Usage, from the benchmarks directory:
+    python3 result_memory_benchmark.py [--articles 100000]
+"""
+
+import argparse
+import tracemalloc
+
+from context import response
+from datetime import datetime
+
+
+def retained_memory(fn):
+    tracemalloc.start()
+    result = fn()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=100000)
+    args = parser.parse_args()
+
+    totals = {
+        "Article_{n}".format(n=n): (n * 7919) % 1000003 for n in range(args.articles)
+    }
+    start, end = datetime(2023, 1, 1), datetime(2023, 12, 31)
+    rankings = [
+        ("dicts", lambda: response.ranked_hashes(*response.rank_articles(totals))),
+        (
+            "columns",
+            lambda: response.TopViewsResponse.from_ranking(
+                response.rank_articles(totals), start, end
+            ),
+        ),
+    ]
+    for name, fn in rankings:
+        retained = retained_memory(fn)
+        print(
+            "{name:>8}: {mb:6.1f} MB, {per:5.0f} bytes per ranked article".format(
+                name=name, mb=retained / 2**20, per=retained / args.articles
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
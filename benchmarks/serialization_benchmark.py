@@ -0,0 +1,61 @@
+"""
+Times serializing the June 2023 monthly snapshot as a TopViewsResponse with the standard
+library and with orjson, and compares the bytes sent on the wire uncompressed, gzipped
+and brotli compressed (with the time taken to compress).
+
+Usage, from the benchmarks directory:
+    python3 serialization_benchmark.py [--repeat 20]
+"""
+
+import argparse
+import gzip
+import json
+import timeit
+
+from context import compression, jsonlib, response
+from datetime import datetime
+from stub_server import load_snapshot_articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    totals = {a["article"]: a["views"] for a in load_snapshot_articles()}
+    result = response.TopViewsResponse.from_ranking(
+        response.rank_articles(totals), datetime(2023, 6, 1), datetime(2023, 6, 30)
+    )
+    print("serializing {n} ranked articles".format(n=len(result.names)))
+
+    # Each serializer also builds the JSON shape from the ranking's columns, as a
+    # response does when it is serialized
+    serializers = [("json", lambda: json.dumps(result.as_dict()).encode())]
+    if jsonlib.orjson is not None:
+        serializers.append(("orjson", lambda: jsonlib.orjson.dumps(result.as_dict())))
+    for name, serialize in serializers:
+        best = min(timeit.repeat(serialize, number=1, repeat=args.repeat))
+        print("{name:>8}: {ms:7.2f} ms".format(name=name, ms=best * 1000))
+
+    body = response.serialize(result)
+    encoders = [
+        ("identity", lambda: body),
+        ("gzip", lambda: gzip.compress(body, compression.GZIP_LEVEL, mtime=0)),
+    ]
+    if compression.brotli is not None:
+        brotli = compression.brotli
+        encoders.append(
+            ("br", lambda: brotli.compress(body, quality=compression.BROTLI_QUALITY))
+        )
+        encoders.append(("br q11", lambda: brotli.compress(body)))
+    for name, encode in encoders:
+        best = min(timeit.repeat(encode, number=1, repeat=max(args.repeat // 4, 1)))
+        print(
+            "{name:>8}: {size:9,d} bytes, {ms:7.2f} ms to encode".format(
+                name=name, size=len(encode()), ms=best * 1000
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+A local stand-in for the Wikimedia PageViews API used by the benchmarks. Top article
+payloads are synthesized from the monthly snapshot fixture so they have a realistic
+size and shape (1000 articles per day), and per-article requests return one item per
+day in the requested range.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "snapshots")
+TOP_MONTHLY_SNAPSHOT = os.path.join(SNAPSHOT_DIR, "top_monthly_202306.json")
+
+TOP_ARTICLES_PER_DAY = 1000
+
+NOT_FOUND_BODY = json.dumps({"detail": "Not found."}).encode()
+THROTTLED_BODY = json.dumps({"detail": "Too many requests."}).encode()
+
+
+def load_snapshot_articles(path=TOP_MONTHLY_SNAPSHOT):
+    with open(path) as snapshot:
+        return json.load(snapshot)["article_views"]
+
+
+def top_payload(articles, year, month, day):
+    """
+    Builds a daily top articles payload in the format returned by Wikimedia, spreading
+    each article's monthly views over the days of the month with a small daily variation
+    """
+    daily = []
+    for idx, article in enumerate(articles[:TOP_ARTICLES_PER_DAY]):
+        variation = (idx * 31 + day * 17) % 11
+        daily.append(
+            {"article": article["article"], "views": article["views"] // 30 + variation}
+        )
+    daily.sort(key=lambda a: a["views"], reverse=True)
+    for idx, article in enumerate(daily):
+        article["rank"] = idx + 1
+    return {
+        "items": [
+            {
+                "project": "en.wikipedia",
+                "access": "all-access",
+                "year": year,
+                "month": month,
+                "day": "{:02d}".format(day),
+                "articles": daily,
+            }
+        ]
+    }
+
+
+def per_article_payload(article, granularity, start, end):
+    start_date = datetime.strptime(start[:8], "%Y%m%d")
+    end_date = datetime.strptime(end[:8], "%Y%m%d")
+    if granularity == "monthly":
+        timestamps = [start_date.strftime("%Y%m0100")]
+    else:
+        days = (end_date - start_date).days + 1
+        timestamps = [
+            (start_date + timedelta(days=x)).strftime("%Y%m%d00") for x in range(days)
+        ]
+    items = [
+        {
+            "project": "en.wikipedia",
+            "article": article,
+            "granularity": granularity,
+            "timestamp": ts,
+            "access": "all-access",
+            "agent": "all-agents",
+            "views": 1000 + (int(ts[6:8]) * 37) % 500,
+        }
+        for ts in timestamps
+    ]
+    return {"items": items}
+
+
+class StubUpstream:
+    """
+    Serves PageViews API paths on a local port until stop() is called.
+
+    - latency: seconds to wait before answering each request
+    - handshake_latency: seconds to wait once per new connection, standing in for the
+      TCP and TLS handshake cost of a fresh connection to wikimedia.org
+    - not_found_rate: fraction of paths answered with a 404, as Wikimedia does for days
+      that are not loaded yet. The same paths always get a 404, chosen by seed.
+    - throttle_rate: fraction of requests answered with a 429 and a Retry-After of
+      retry_after seconds, chosen at random (from seed) for each request
+
+    The settings are read for every request, so they can be changed while serving.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        handshake_latency=0.0,
+        not_found_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=0,
+        seed=0,
+    ):
+        self.latency = latency
+        self.handshake_latency = handshake_latency
+        self.not_found_rate = not_found_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.articles = load_snapshot_articles()
+        self.connections = 0
+        self.requests = 0
+        self.statuses = {}
+        """Number of responses sent with each status code"""
+        self._payloads = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return "http://{host}:{port}".format(host=host, port=port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def body_for(self, path):
+        """Returns (status, body) for a request path relative to the API root"""
+        if self.not_found_rate and (
+            random.Random("{seed}{path}".format(seed=self.seed, path=path)).random()
+            < self.not_found_rate
+        ):
+            return 404, NOT_FOUND_BODY
+        parts = path.strip("/").split("/")
+        if parts[0] == "top" and len(parts) == 6:
+            year, month, day = parts[3], parts[4], parts[5]
+            with self._lock:
+                if path not in self._payloads:
+                    payload = top_payload(self.articles, year, month, int(day))
+                    self._payloads[path] = json.dumps(payload).encode()
+                return 200, self._payloads[path]
+        if parts[0] == "per-article" and len(parts) == 8:
+            article, granularity, start, end = parts[4:8]
+            payload = per_article_payload(article, granularity, start, end)
+            return 200, json.dumps(payload).encode()
+        return 404, NOT_FOUND_BODY
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+                if stub.handshake_latency:
+                    time.sleep(stub.handshake_latency)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    throttled = stub._random.random() < stub.throttle_rate
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if throttled:
+                    status, body = 429, THROTTLED_BODY
+                else:
+                    status, body = stub.body_for(self.path)
+                with stub._lock:
+                    stub.statuses[status] = stub.statuses.get(status, 0) + 1
+                self.send_response(status)
+                if throttled:
+                    self.send_header("Retry-After", str(stub.retry_after))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
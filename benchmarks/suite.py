@@ -0,0 +1,406 @@
+"""
+Runs the benchmark suite against the local stub upstream and stores the results as JSON,
+so runs on different commits can be compared.
+
+- parse.*: parsing upstream payloads into TopViewsResponse, DateWithMostViewsResponse
+  and ArticleViewsResponse objects
+- route.*: end-to-end latency of the /views, /top and /views/top-day routes through the
+  Flask app, cold (every cache cleared before each request) and warm
+- throughput.*: requests per second and latency percentiles of each route under
+  concurrent requests for a spread of articles and dates
+- faults.*: /top with the stub answering some days with 404s or throttling requests
+  with 429s
+
+Usage, from the benchmarks directory:
+    python3 suite.py [--filter route.] [--latency 0.02] [--output results/mine.json]
+    python3 suite.py --compare results/<baseline commit>.json
+
+Results are written to results/<commit>.json by default. With --compare, each result is
+compared against the baseline file and the command exits with status 1 if any is slower
+by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# The suite measures this service, not the upstream rate limit or a cache left on disk
+os.environ.setdefault("PAGEVIEWS_RATE_LIMIT", "100000")
+os.environ.setdefault("PAGEVIEWS_CACHE_PATH", "")
+os.environ.setdefault("PAGEVIEWS_STORE_PATH", "")
+
+import context  # noqa: F401 (puts src on the path)
+import compression
+import httpcache
+import jsonlib
+import pageviews
+import response
+import wikipedia_client
+
+from main import app
+from stub_server import (
+    StubUpstream,
+    load_snapshot_articles,
+    per_article_payload,
+    top_payload,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+ARTICLE = "Barbie_(film)"
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Registers a benchmark function, which takes the suite and returns its metrics"""
+
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+
+    return register
+
+
+class Suite:
+    def __init__(self, stub, args):
+        self.stub = stub
+        self.args = args
+        self.client = app.test_client()
+
+    def get(self, path):
+        """Requests path from the app, returning its status code"""
+        return self.client.get(path).status_code
+
+    def reset(self, latency=None, not_found_rate=0.0, throttle_rate=0.0):
+        """Clears every cache and sets how the stub upstream behaves"""
+        wikipedia_client.response_cache.clear()
+        wikipedia_client.rate_limiter.reset()
+        pageviews.top_views_cache.clear()
+        pageviews.window_aggregator.clear()
+        httpcache.validators.clear()
+        compression.compressed_cache.clear()
+        self.stub.latency = self.args.latency if latency is None else latency
+        self.stub.not_found_rate = not_found_rate
+        self.stub.throttle_rate = throttle_rate
+
+
+def timings(fn, repeat, number=1, setup=None):
+    """
+    Returns:
+    The min, median, p95 and mean time (ms) of one call of fn, from repeat rounds of
+    number calls each. setup is called before each round and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) * 1000 / number)
+    return summary(times)
+
+
+def summary(times):
+    times = sorted(times)
+    return {
+        "min_ms": round(times[0], 4),
+        "median_ms": round(statistics.median(times), 4),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 4),
+        "mean_ms": round(statistics.mean(times), 4),
+        "rounds": len(times),
+    }
+
+
+def throughput(suite, paths):
+    """Requests every path with --concurrency threads, starting with every cache cleared"""
+    suite.reset()
+
+    def timed_get(path):
+        start = time.perf_counter()
+        status = suite.get(path)
+        return status, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(suite.args.concurrency) as executor:
+        results = list(executor.map(timed_get, paths))
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    metrics = summary([ms for _, ms in results])
+    metrics.update(
+        {"requests_per_s": round(len(paths) / elapsed, 2), "statuses": statuses}
+    )
+    return metrics
+
+
+def month_of_top_payloads():
+    articles = load_snapshot_articles()
+    return [
+        jsonlib.loads(jsonlib.dumps(top_payload(articles, "2023", "07", day)))
+        for day in range(1, 32)
+    ]
+
+
+@benchmark("parse.top_views_response")
+def parse_top_views(suite):
+    payloads = month_of_top_payloads()
+    start, end = datetime(2023, 7, 1), datetime(2023, 7, 31)
+    return timings(
+        lambda: response.TopViewsResponse(payloads, start, end), suite.args.repeat
+    )
+
+
+@benchmark("parse.date_with_most_views_response")
+def parse_date_with_most_views(suite):
+    payload = [per_article_payload(ARTICLE, "daily", "20230701", "20230731")]
+    return timings(
+        lambda: response.DateWithMostViewsResponse(payload, ARTICLE),
+        suite.args.repeat,
+        number=1000,
+    )
+
+
+@benchmark("parse.article_views_response")
+def parse_article_views(suite):
+    payload = per_article_payload(ARTICLE, "daily", "20230701", "20230731")
+    start, end = datetime(2023, 7, 1), datetime(2023, 7, 31)
+    return timings(
+        lambda: response.ArticleViewsResponse(payload, ARTICLE, start, end),
+        suite.args.repeat,
+        number=1000,
+    )
+
+
+ROUTES = {
+    "views": "/views/monthly/{article}/2023-07".format(article=ARTICLE),
+    "top": "/top/monthly/2023-06",
+    "top_day": "/views/top-day/{article}/2023-07".format(article=ARTICLE),
+}
+
+
+def route_benchmark(route):
+    path = ROUTES[route]
+
+    @benchmark("route.{route}.cold".format(route=route))
+    def cold(suite):
+        return timings(lambda: suite.get(path), suite.args.repeat, setup=suite.reset)
+
+    @benchmark("route.{route}.warm".format(route=route))
+    def warm(suite):
+        suite.reset()
+        suite.get(path)
+        return timings(lambda: suite.get(path), suite.args.repeat, number=10)
+
+
+for route in ROUTES:
+    route_benchmark(route)
+
+
+def snapshot_articles(count):
+    return [article["article"] for article in load_snapshot_articles()[:count]]
+
+
+@benchmark("throughput.views")
+def views_throughput(suite):
+    return throughput(
+        suite,
+        [
+            "/views/monthly/{article}/2023-{month:02d}".format(article=a, month=m)
+            for a in snapshot_articles(suite.args.requests // 6)
+            for m in range(1, 7)
+        ],
+    )
+
+
+@benchmark("throughput.top")
+def top_throughput(suite):
+    # Weeks starting on each day of the first half of 2023, so windows overlap
+    return throughput(
+        suite,
+        [
+            "/top/weekly/2023-{month:02d}-{day:02d}".format(month=m, day=d)
+            for m in range(1, 7)
+            for d in range(1, 29)
+        ][: suite.args.requests],
+    )
+
+
+@benchmark("throughput.top_day")
+def top_day_throughput(suite):
+    return throughput(
+        suite,
+        [
+            "/views/top-day/{article}/2023-{month:02d}".format(article=a, month=m)
+            for a in snapshot_articles(suite.args.requests // 6)
+            for m in range(1, 7)
+        ],
+    )
+
+
+def top_with_faults(suite, path, **faults):
+    statuses = []
+    metrics = timings(
+        lambda: statuses.append(suite.get(path)),
+        suite.args.repeat,
+        setup=lambda: suite.reset(**faults),
+    )
+    metrics["status"] = statuses[-1]
+    metrics["upstream_statuses"] = {
+        str(status): count for status, count in sorted(suite.stub.statuses.items())
+    }
+    metrics["throttled"] = wikipedia_client.rate_limiter.stats()["throttled"]
+    return metrics
+
+
+@benchmark("faults.top.not_found")
+def top_not_found(suite):
+    return top_with_faults(suite, "/top/monthly/2023-06", not_found_rate=0.1)
+
+
+@benchmark("faults.top.not_found_partial")
+def top_not_found_partial(suite):
+    return top_with_faults(
+        suite, "/top/monthly/2023-06?partial=true", not_found_rate=0.1
+    )
+
+
+@benchmark("faults.top.throttled")
+def top_throttled(suite):
+    return top_with_faults(suite, "/top/monthly/2023-06", throttle_rate=0.1)
+
+
+def primary_metric(metrics):
+    """
+    The metric a benchmark is compared on, and whether higher is better. The fastest round
+    is the least affected by noise from other processes.
+    """
+    if "requests_per_s" in metrics:
+        return "requests_per_s", True
+    return "min_ms", False
+
+
+def compare(results, baseline, threshold):
+    """Prints each benchmark against the baseline and returns the regressed names"""
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        metric, higher_is_better = primary_metric(metrics)
+        before, after = baseline[name].get(metric), metrics.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        slower = -change if higher_is_better else change
+        flag = ""
+        if slower > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            "{name:<40} {metric:<15} {before:>12.3f} -> {after:>12.3f} "
+            "({change:+.1%}){flag}".format(
+                name=name,
+                metric=metric,
+                before=before,
+                after=after,
+                change=change,
+                flag=flag,
+            )
+        )
+    return regressions
+
+
+def metadata(args):
+    def git(*command):
+        try:
+            return subprocess.run(
+                ["git"] + list(command),
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "json_library": "orjson" if jsonlib.orjson is not None else "json",
+        "args": vars(args),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--filter", default="", help="only run benchmarks with this prefix")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per benchmark")
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="stub upstream latency (seconds)"
+    )
+    parser.add_argument("--requests", type=int, default=120, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="results file (default: results/<commit>.json)")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="fractional slowdown reported as a regression (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    with StubUpstream(args.latency) as stub:
+        wikipedia_client.BASE_URL = stub.base_url
+        suite = Suite(stub, args)
+        for name, fn in BENCHMARKS:
+            if not name.startswith(args.filter):
+                continue
+            stub.statuses.clear()
+            metrics = fn(suite)
+            results[name] = metrics
+            metric, _ = primary_metric(metrics)
+            print(
+                "{name:<40} {metric:<15} {value:12.3f}".format(
+                    name=name, metric=metric, value=metrics[metric]
+                )
+            )
+
+    run = {"metadata": metadata(args), "results": results}
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = run["metadata"]["commit"] or "unknown"
+        output = os.path.join(RESULTS_DIR, commit[:12] + ".json")
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+    print("results written to {output}".format(output=output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print("\ncompared with {baseline}:".format(baseline=args.compare))
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
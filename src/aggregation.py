@@ -0,0 +1,386 @@
+import errors
+import jsonlib
+import response
+import threading
+
+from array import array
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ONE_DAY = timedelta(days=1)
+
+DICT = "dict"
+NUMPY = "numpy"
+
+
+def engine(name):
+    """Returns the aggregation engine configured by name ('dict' or 'numpy')"""
+    if name == DICT:
+        return DictEngine()
+    elif name == NUMPY:
+        return NumpyEngine()
+    raise ValueError(
+        "Aggregation engine must be 'dict' or 'numpy', got {name} instead".format(
+            name=name
+        )
+    )
+
+
+class DictEngine:
+    """
+    Aggregates article views with a Counter of article name to views per day and per
+    window. Pure Python, with no extra dependencies.
+
+    Each engine converts a day's views to and from parallel sequences of article names
+    and views (from_articles and articles), the layout used by columnar.ColumnarStore.
+    """
+
+    def daily_views(self, daily_result):
+        return response.daily_article_views(daily_result)
+
+    def from_articles(self, names, views):
+        return Counter(dict(zip(names, views)))
+
+    def articles(self, daily_views):
+        return list(daily_views.keys()), list(daily_views.values())
+
+    def sum(self, daily_views):
+        totals = Counter()
+        for views in daily_views:
+            totals.update(views)
+        return totals
+
+    def copy(self, totals):
+        return Counter(totals)
+
+    def add(self, totals, views):
+        totals.update(views)
+        return totals
+
+    def subtract(self, totals, views):
+        # Counter subtraction also drops articles left with no views
+        totals -= views
+        return totals
+
+    def rank(self, totals, limit=None):
+        return response.rank_articles(totals, limit)
+
+
+class NumpyEngine:
+    """
+    Aggregates article views in NumPy arrays. Article names are interned to integer ids,
+    each day is stored as parallel arrays of ids and views, and window totals are a dense
+    array of views indexed by id, so sums run as bincount / np.add.at instead of dict
+    updates. Ranking selects candidates with argpartition and orders only those with
+    lexsort, matching the (views, name) descending order of the dict engine.
+
+    Interned names are kept for the life of the process.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("numpy must be installed to use the numpy aggregation engine")
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def daily_views(self, daily_result):
+        ids = []
+        views = []
+        try:
+            with self._lock:
+                for item in daily_result["items"]:
+                    for article in item["articles"]:
+                        name = article["article"]
+                        if name != "-":
+                            ids.append(self.__intern(name))
+                            views.append(article["views"])
+        except Exception as e:
+            raise errors.ParseResponseException(str(e))
+        return np.array(ids, dtype=np.int64), np.array(views, dtype=np.int64)
+
+    def from_articles(self, names, views):
+        """Builds a day's views from article names and a buffer (or list) of their views"""
+        with self._lock:
+            ids = [self.__intern(name) for name in names]
+        if isinstance(views, memoryview):
+            # Read the views in place, for example from a memory-mapped columnar.ColumnarStore
+            views = np.frombuffer(views, dtype=np.int64)
+        return np.array(ids, dtype=np.int64), np.asarray(views, dtype=np.int64)
+
+    def articles(self, daily_views):
+        ids, views = daily_views
+        with self._lock:
+            names = [self._names[idx] for idx in ids]
+        return names, views
+
+    def sum(self, daily_views):
+        daily_views = list(daily_views)
+        if not daily_views:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.concatenate([day_ids for day_ids, _ in daily_views])
+        views = np.concatenate([day_views for _, day_views in daily_views])
+        size = int(ids.max()) + 1 if len(ids) else 0
+        totals = np.zeros(size, dtype=np.int64)
+        np.add.at(totals, ids, views)
+        return totals
+
+    def copy(self, totals):
+        return totals.copy()
+
+    def add(self, totals, views):
+        ids, day_views = views
+        totals = self.__fit(totals, ids)
+        np.add.at(totals, ids, day_views)
+        return totals
+
+    def subtract(self, totals, views):
+        ids, day_views = views
+        totals = self.__fit(totals, ids)
+        np.subtract.at(totals, ids, day_views)
+        return totals
+
+    def rank(self, totals, limit=None):
+        present = np.flatnonzero(totals > 0)
+        if limit is not None and limit < len(present):
+            # Keep every article tied with the limit-th highest views, so ties are broken
+            # by name exactly as in a full sort
+            threshold = np.partition(totals[present], len(present) - limit)[
+                len(present) - limit
+            ]
+            present = present[totals[present] >= threshold]
+        with self._lock:
+            names = [self._names[idx] for idx in present]
+        views = totals[present]
+        order = np.lexsort((np.array(names, dtype=str), views))[::-1]
+        if limit is not None:
+            order = order[:limit]
+        ranked_views = array("q")
+        ranked_views.frombytes(views[order].astype(np.int64).tobytes())
+        return tuple(names[idx] for idx in order), ranked_views
+
+    def __intern(self, name):
+        idx = self._ids.get(name)
+        if idx is None:
+            idx = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return idx
+
+    def __fit(self, totals, ids):
+        """Grows totals so every id in ids has a slot"""
+        if len(ids) and ids.max() >= len(totals):
+            totals = np.concatenate(
+                [totals, np.zeros(int(ids.max()) + 1 - len(totals), dtype=np.int64)]
+            )
+        return totals
+
+
+class WindowAggregator:
+    """
+    Sums per-day article views over windows of consecutive days, reusing work between
+    overlapping windows. Views are represented and summed by an aggregation engine
+    (DictEngine by default).
+
+    Daily views are kept in a store of up to max_days days. The totals of recently
+    requested windows are also kept (up to max_windows of them) and a new window is
+    derived from the cached window it overlaps most by adding the days it gains and
+    subtracting the days it loses. Moving a 7 day window on by one day costs one day of
+    work instead of seven. Only windows made up entirely of stored days are kept, so a
+    window including days passed in just for one call (such as days whose views may still
+    change) is derived again from its days every time.
+
+    Stored views and totals are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_days, max_windows, engine=None):
+        self.engine = engine or DictEngine()
+        """Represents, sums and ranks article views"""
+        self.max_days = max_days
+        """The number of days of views kept"""
+        self.max_windows = max_windows
+        """The number of window totals kept"""
+        self.days_summed = 0
+        """The number of days of views added to or subtracted from a window so far"""
+        self._days = OrderedDict()
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def missing_days(self, days):
+        """Returns the days (in order) that do not have stored views"""
+        with self._lock:
+            return [day for day in days if day not in self._days]
+
+    def add_day(self, day, article_views):
+        """Stores the article views for one day, as returned by engine.daily_views"""
+        with self._lock:
+            self._days[day] = article_views
+            self._days.move_to_end(day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+
+    def totals(self, days, fetched=None):
+        """
+        Expects:
+        A list of consecutive days and optionally a dict of day to views for days that
+        were just fetched (in case they have already been evicted from the store)
+
+        Returns:
+        The total views of each article over the days, which can be ranked with
+        engine.rank
+        """
+        fetched = fetched or {}
+        key = (days[0], days[-1])
+        with self._lock:
+            base_key, base_totals = self.__closest_window(days)
+            daily = {}
+            stored = True
+            for day in days:
+                views = fetched.get(day, self._days.get(day))
+                if views is None:
+                    raise KeyError("no article views stored for {day}".format(day=day))
+                daily[day] = views
+                if day in self._days:
+                    self._days.move_to_end(day)
+                else:
+                    stored = False
+            if base_key is not None:
+                removed, added = self.__window_difference(base_key, days)
+                removed_views = [self._days.get(day) for day in removed]
+                if None in removed_views:
+                    base_key = None
+
+        if base_key is None:
+            totals = self.engine.sum(daily[day] for day in days)
+            summed = len(days)
+        else:
+            totals = self.engine.copy(base_totals)
+            for day in added:
+                totals = self.engine.add(totals, daily[day])
+            for views in removed_views:
+                totals = self.engine.subtract(totals, views)
+            summed = len(added) + len(removed)
+
+        with self._lock:
+            self.days_summed += summed
+            if stored:
+                self._windows[key] = totals
+                self._windows.move_to_end(key)
+                while len(self._windows) > self.max_windows:
+                    self._windows.popitem(last=False)
+        return totals
+
+    def sum_days(self, days, fetched=None):
+        """
+        The same as totals, but for days that need not be consecutive. The result is not
+        kept as a window to derive other windows from.
+        """
+        fetched = fetched or {}
+        daily = []
+        with self._lock:
+            for day in days:
+                views = fetched.get(day, self._days.get(day))
+                if views is None:
+                    raise KeyError("no article views stored for {day}".format(day=day))
+                daily.append(views)
+            self.days_summed += len(days)
+        return self.engine.sum(daily)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._windows.clear()
+
+    def __closest_window(self, days):
+        """Returns the cached window (key, totals) needing the fewest days of work, if any"""
+        best_key, best_totals, best_work = None, None, len(days)
+        for key, totals in self._windows.items():
+            removed, added = self.__window_difference(key, days)
+            work = len(removed) + len(added)
+            if work < best_work:
+                best_key, best_totals, best_work = key, totals, work
+        return best_key, best_totals
+
+    def __window_difference(self, key, days):
+        """Returns the days in the cached window but not in days, and the days only in days"""
+        start, end = key
+        removed = []
+        day = start
+        while day <= end:
+            if day < days[0] or day > days[-1]:
+                removed.append(day)
+            day += ONE_DAY
+        added = [day for day in days if day < start or day > end]
+        return removed, added
+
+
+def peak_days(series):
+    """
+    Expects:
+    A list of equal length lists of daily views, one per article
+
+    Returns:
+    A list with a (most views, indices of the days with that many views) tuple for each
+    series. With numpy installed every series is compared in one vectorized pass over a
+    views matrix.
+    """
+    if not series:
+        return []
+    if np is None:
+        peaks = []
+        for views in series:
+            most = max(views)
+            peaks.append((most, [idx for idx, day in enumerate(views) if day == most]))
+        return peaks
+    matrix = np.array(series, dtype=np.int64)
+    most = matrix.max(axis=1)
+    rows, days = np.nonzero(matrix == most[:, None])
+    peak_days = [[] for _ in series]
+    for row, day in zip(rows.tolist(), days.tolist()):
+        peak_days[row].append(day)
+    return list(zip(most.tolist(), peak_days))
+
+
+def count_views(bodies):
+    """
+    Expects:
+    A list of raw daily top articles response bodies
+
+    Returns:
+    A Counter of the total views of each article over the days. This and merge_counts are
+    module-level functions so they can run in a process pool.
+    """
+    totals = Counter()
+    for body in bodies:
+        totals.update(response.daily_article_views(jsonlib.loads(body)))
+    return totals
+
+
+def merge_counts(first, second):
+    """Returns the sum of two Counters of article views"""
+    first.update(second)
+    return first
+
+
+def tree_reduce(executor, partials):
+    """
+    Merges a list of Counters pairwise, level by level, so each level's merges can run in
+    parallel on the executor (a concurrent.futures executor, or None to merge inline)
+    """
+    partials = list(partials)
+    if not partials:
+        return Counter()
+    while len(partials) > 1:
+        pairs = list(zip(partials[::2], partials[1::2]))
+        leftover = partials[-1:] if len(partials) % 2 else []
+        if executor is None:
+            merged = [merge_counts(first, second) for first, second in pairs]
+        else:
+            futures = [executor.submit(merge_counts, a, b) for a, b in pairs]
+            merged = [future.result() for future in futures]
+        partials = merged + leftover
+    return partials[0]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+asyncio variant of wikipedia_client built on aiohttp. A fan-out over many dates costs one
+coroutine per URL instead of one thread, so a single worker can keep hundreds of upstream
+requests in flight. URLs and errors are the same as the blocking client.
+
+aiohttp is an optional dependency and is only needed once one of these functions is called.
+"""
+
+import asyncio
+import config
+import metrics
+import time
+import wikipedia_client
+from errors import ZeroOrNotLoadedDataException, ThrottlingException
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def new_session():
+    """
+    Creates an aiohttp ClientSession whose connector allows up to ASYNC_CONCURRENCY
+    concurrent upstream connections. Sessions are tied to the event loop they are created
+    on, so callers running a long-lived loop can create one and pass it to the functions
+    below to reuse its connections across calls.
+    """
+    if aiohttp is None:
+        raise ImportError("aiohttp must be installed to use async_wikipedia_client")
+    connector = aiohttp.TCPConnector(limit=config.ASYNC_CONCURRENCY)
+    return aiohttp.ClientSession(
+        headers=wikipedia_client.HEADERS, connector=connector
+    )
+
+
+async def top_articles(dates, session=None, parse=None, partial=False):
+    """See wikipedia_client.top_articles"""
+    urls = [wikipedia_client.top_articles_url(date) for date in dates]
+    return await __with_session(
+        session, __get_pageviews_concurrent, urls, dates, parse, partial
+    )
+
+
+async def views_per_article_by_day(article, dates, granularity, session=None):
+    urls = [
+        wikipedia_client.per_article_url(article, date, date, granularity)
+        for date in dates
+    ]
+    return await __with_session(session, __get_pageviews_concurrent, urls, dates)
+
+
+async def daily_views_per_article(article, dates, session=None, partial=False):
+    """See wikipedia_client.daily_views_per_article"""
+    url = wikipedia_client.per_article_url(
+        article, dates[0], dates[-1], wikipedia_client.DAILY
+    )
+    response_json = await __with_session(session, __get_pageviews, url, dates)
+    if not partial:
+        wikipedia_client.check_daily_dates(response_json, dates)
+    return [response_json]
+
+
+async def views_per_article(article, start_date, end_date, granularity, session=None):
+    url = wikipedia_client.per_article_url(article, start_date, end_date, granularity)
+    dates = wikipedia_client.range_error_dates(start_date, end_date)
+    return await __with_session(session, __get_pageviews, url, dates)
+
+
+async def __with_session(session, fetch, *args):
+    with metrics.stage("fetch"):
+        if session is not None:
+            return await fetch(session, *args)
+        async with new_session() as session:
+            return await fetch(session, *args)
+
+
+async def __get_pageviews_concurrent(session, urls, dates, parse=None, partial=False):
+    """Fetches each url concurrently, returning their json in the same order as urls"""
+    results = [None] * len(urls)
+    missing_data_dates = []
+    tasks = [
+        asyncio.ensure_future(__get_pageviews(session, url, [date], parse))
+        for url, date in zip(urls, dates)
+    ]
+    try:
+        for idx, task in enumerate(tasks):
+            try:
+                results[idx] = await task
+            except ZeroOrNotLoadedDataException as z:
+                missing_data_dates += z.dates
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    if len(missing_data_dates) and not partial:
+        raise ZeroOrNotLoadedDataException(missing_data_dates)
+    return results
+
+
+async def __get_pageviews(session, url, dates, parse=None):
+    response = wikipedia_client.response_cache.get(url)
+    if response is None:
+        # Share a request for the same url already in flight from either client
+        future, leader = wikipedia_client.upstream_calls.begin(url)
+        if not leader:
+            response = await asyncio.wrap_future(future)
+        else:
+            try:
+                response = await __fetch(session, url, dates)
+            except BaseException as e:
+                wikipedia_client.upstream_calls.finish(url, exception=e)
+                raise
+            wikipedia_client.upstream_calls.finish(url, result=response)
+    return wikipedia_client.load_cached_response(response, dates, parse)
+
+
+async def __fetch(session, url, dates):
+    limiter = wikipedia_client.rate_limiter
+    for _ in range(config.THROTTLE_RETRIES + 1):
+        wait = limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        start = time.perf_counter()
+        async with session.get(url) as response:
+            wikipedia_client.record_upstream(
+                url, response.status, time.perf_counter() - start
+            )
+            retry_after = wikipedia_client.retry_after(
+                response.headers.get("Retry-After")
+            )
+            if response.status == 200:
+                limiter.on_success()
+                body = await response.read()
+                wikipedia_client.response_cache.put(
+                    url, 200, body, wikipedia_client.cache_ttl(dates)
+                )
+                return 200, body
+            elif response.status == 404:
+                limiter.on_success()
+                wikipedia_client.response_cache.put(
+                    url, 404, b"", config.CACHE_NOT_FOUND_TTL
+                )
+                return 404, b""
+            elif response.status == 429:
+                limiter.on_throttled(retry_after)
+            else:
+                response.raise_for_status()
+                raise wikipedia_client.unexpected_status(url, response.status)
+    raise ThrottlingException(retry_after)
@@ -0,0 +1,197 @@
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+
+ENTRY_OVERHEAD = 100
+"""Approximate bytes of bookkeeping per cache entry, counted against the byte budget"""
+
+
+class LRUCache:
+    """
+    A thread-safe in-memory cache that evicts the least recently used entries once the
+    total size of its values exceeds max_bytes. Entries can optionally expire after a
+    number of seconds.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        """The byte budget for all values held in the cache"""
+        self.bytes = 0
+        """The number of bytes currently counted against the budget"""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value stored for key, or None if it is missing or has expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires = entry
+                if expires is None or expires > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self.__remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, value, size, ttl=None):
+        """
+        Stores value under key, counting size bytes against the budget. A ttl of None
+        keeps the entry until it is evicted.
+        """
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            if key in self._entries:
+                self.__remove(key)
+            self._entries[key] = (value, size, expires)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self.__remove(oldest)
+                self.evictions += 1
+
+    def ttl(self, key):
+        """Returns the seconds until key expires, or None if it never expires"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] is None:
+                return None
+            return max(entry[2] - time.time(), 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+
+class SQLiteStore:
+    """
+    A persistent key/value store for (status, body) responses that survives restarts.
+    Expired rows are removed lazily when they are read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, status INTEGER, body BLOB, expires REAL)"
+            )
+
+    def get(self, key):
+        """Returns (status, body, expires) for key, or None if it is missing or expired"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, body, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            status, body, expires = row
+            if expires is not None and expires <= time.time():
+                with self._connection:
+                    self._connection.execute(
+                        "DELETE FROM responses WHERE key = ?", (key,)
+                    )
+                return None
+            return status, bytes(body), expires
+
+    def put(self, key, status, body, ttl=None):
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, status, body, expires),
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class TieredCache:
+    """
+    Caches raw upstream responses as (status, body) pairs keyed by URL, first in an
+    in-memory LRUCache and then, if a disk store is given, in a SQLiteStore. Entries
+    found on disk are promoted back into memory.
+    """
+
+    def __init__(self, max_bytes, disk=None):
+        self.memory = LRUCache(max_bytes)
+        """The in-process tier"""
+        self.disk = disk
+        """The optional persistent tier"""
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        """Guards the counters, which executor threads update concurrently"""
+
+    def get(self, key):
+        """Returns the cached (status, body) for key, or None"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                status, body, expires = stored
+                ttl = None if expires is None else max(expires - time.time(), 0)
+                self.memory.put(key, (status, body), len(key) + len(body), ttl)
+                with self._lock:
+                    self.disk_hits += 1
+                return status, body
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, status, body, ttl=None):
+        self.memory.put(key, (status, body), len(key) + len(body), ttl)
+        if self.disk is not None:
+            self.disk.put(key, status, body, ttl)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """
+        Returns:
+        A dict of counters for the cache
+        - memory_hits: lookups answered from memory
+        - disk_hits: lookups answered from the disk store
+        - misses: lookups that had to go upstream
+        - memory_entries, memory_bytes: the current contents of the memory tier
+        - evictions: entries dropped from memory to stay within its byte budget
+        """
+        with self._lock:
+            disk_hits, misses = self.disk_hits, self.misses
+        return {
+            "memory_hits": self.memory.hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.bytes,
+            "evictions": self.memory.evictions,
+        }
@@ -0,0 +1,171 @@
+"""
+A local columnar store of historical pageviews, so months that are queried over and over
+are answered from disk instead of the upstream API.
+
+Each daily top list and each article's daily series is kept in its own file, laid out so
+it can be memory-mapped and read in place:
+
+top/YYYYMMDD.col - one day's top articles
+    header: magic, article count n, size of the name block (16 bytes)
+    int64[n] views
+    uint32[n + 1] offsets of each article name in the name block
+    the article names (UTF-8), which act as the article-id dictionary for the views
+
+articles/<sha1 of article>.col - one article's daily views
+    header: magic, day count n (16 bytes)
+    int32[n] days as date ordinals, in ascending order
+    int64[n] views (aligned to 8 bytes)
+
+Integers are stored in native byte order. Reads go through mmap and memoryview without
+copying the view arrays, so every worker process reading the store shares the same pages
+of the OS page cache. Files are written to a temporary file and renamed into place, so
+readers never see a partial file. Two processes updating the same article at once can
+lose one of the updates, which only means those days are fetched upstream again.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+from array import array
+from bisect import bisect_left
+
+TOP_MAGIC = b"PVT1"
+ARTICLE_MAGIC = b"PVA1"
+HEADER = struct.Struct("=4sII4x")
+
+
+class ColumnarStore:
+    def __init__(self, path):
+        self.path = path
+        """The directory holding the store"""
+        os.makedirs(os.path.join(path, "top"), exist_ok=True)
+        os.makedirs(os.path.join(path, "articles"), exist_ok=True)
+
+    def put_top_day(self, day, names, views):
+        """Stores one day's top list as parallel sequences of article names and views"""
+        encoded = [name.encode() for name in names]
+        offsets = array("I", [0])
+        for name in encoded:
+            offsets.append(offsets[-1] + len(name))
+        self.__write(
+            self.__top_path(day),
+            [
+                HEADER.pack(TOP_MAGIC, len(encoded), offsets[-1]),
+                array("q", views).tobytes(),
+                offsets.tobytes(),
+                b"".join(encoded),
+            ],
+        )
+
+    def has_top_day(self, day):
+        return os.path.exists(self.__top_path(day))
+
+    def top_day(self, day):
+        """
+        Returns:
+        A tuple of the article names and a memoryview of their views (int64) for the
+        day, or None if the day is not stored. The views are read in place from the
+        mapped file, which stays mapped for as long as they are referenced.
+        """
+        data = self.__map(self.__top_path(day), TOP_MAGIC)
+        if data is None:
+            return None
+        _, count, names_size = HEADER.unpack_from(data)
+        views_end = HEADER.size + 8 * count
+        offsets_end = views_end + 4 * (count + 1)
+        views = data[HEADER.size : views_end].cast("q")
+        offsets = data[views_end:offsets_end].cast("I")
+        names_block = bytes(data[offsets_end : offsets_end + names_size])
+        names = [
+            names_block[offsets[idx] : offsets[idx + 1]].decode()
+            for idx in range(count)
+        ]
+        return names, views
+
+    def put_article_days(self, article, day_views):
+        """
+        Adds an article's views for some days, given as a dict of date to views, to the
+        days already stored for it
+        """
+        stored = dict(self.__article_series(article))
+        stored.update((day.toordinal(), views) for day, views in day_views.items())
+        days = sorted(stored)
+        padding = b"\0" * (4 * len(days) % 8)
+        self.__write(
+            self.__article_path(article),
+            [
+                HEADER.pack(ARTICLE_MAGIC, len(days), 0),
+                array("i", days).tobytes(),
+                padding,
+                array("q", [stored[day] for day in days]).tobytes(),
+            ],
+        )
+
+    def article_days(self, article, days):
+        """
+        Returns:
+        The article's views on each of days (in the same order), or None if any of the
+        days is not stored
+        """
+        ordinals, views = self.__article_columns(article)
+        if ordinals is None:
+            return None
+        result = []
+        for day in days:
+            ordinal = day.toordinal()
+            idx = bisect_left(ordinals, ordinal)
+            if idx == len(ordinals) or ordinals[idx] != ordinal:
+                return None
+            result.append(views[idx])
+        return result
+
+    def __article_series(self, article):
+        ordinals, views = self.__article_columns(article)
+        if ordinals is None:
+            return []
+        return zip(ordinals, views)
+
+    def __article_columns(self, article):
+        data = self.__map(self.__article_path(article), ARTICLE_MAGIC)
+        if data is None:
+            return None, None
+        _, count, _ = HEADER.unpack_from(data)
+        days_end = HEADER.size + 4 * count
+        views_start = days_end + 4 * count % 8
+        ordinals = data[HEADER.size : days_end].cast("i")
+        views = data[views_start : views_start + 8 * count].cast("q")
+        return ordinals, views
+
+    def __map(self, path, magic):
+        """Returns a memoryview of the mapped file, or None if it does not exist"""
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < HEADER.size:
+                    return None
+                data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            return None
+        if bytes(data[:4]) != magic:
+            return None
+        return data
+
+    def __write(self, path, chunks):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def __top_path(self, day):
+        return os.path.join(self.path, "top", day.strftime("%Y%m%d") + ".col")
+
+    def __article_path(self, article):
+        name = hashlib.sha1(article.encode()).hexdigest()
+        return os.path.join(self.path, "articles", name + ".col")
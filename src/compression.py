@@ -0,0 +1,68 @@
+"""
+Content-Encoding negotiation and compression of response bodies with brotli (br) or gzip.
+brotli is an optional dependency, and only gzip is offered without it.
+
+Compressed bodies are cached by the ETag of the uncompressed body and the encoding, so a
+cached result is compressed once per encoding rather than on every request.
+"""
+
+import config
+import gzip
+import metrics
+
+from cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BROTLI = "br"
+GZIP = "gzip"
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+"""Brotli's default quality (11) makes a monthly top list about a quarter smaller than
+quality 5, but takes around 75 times as long to compress it"""
+
+compressed_cache = LRUCache(config.COMPRESSED_CACHE_MAX_BYTES)
+"""Compressed response bodies keyed by (etag of the uncompressed body, encoding)"""
+
+metrics.cache_lookups.add(metrics.lookups("compressed", compressed_cache))
+
+
+def supported_encodings():
+    """The encodings that can be produced, in order of preference"""
+    return [BROTLI, GZIP] if brotli is not None else [GZIP]
+
+
+def negotiate(accept_encodings, size):
+    """
+    Expects:
+    The request's parsed Accept-Encoding header (werkzeug's request.accept_encodings) and
+    the size of the uncompressed body
+
+    Returns:
+    The encoding to send the body with, or None to send it uncompressed
+    """
+    if size < config.COMPRESSION_MIN_BYTES:
+        return None
+    return accept_encodings.best_match(supported_encodings())
+
+
+def compress(body, encoding, etag):
+    """Returns body compressed with encoding, from the cache if it was compressed before"""
+    key = (etag, encoding)
+    compressed = compressed_cache.get(key)
+    if compressed is None:
+        compressed = encode(body, encoding)
+        compressed_cache.put(key, compressed, len(compressed))
+    return compressed
+
+
+def encode(body, encoding):
+    """Returns body compressed with encoding, without caching it"""
+    with metrics.stage("compress"):
+        if encoding == BROTLI:
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+        return gzip.compress(body, GZIP_LEVEL, mtime=0)
@@ -0,0 +1,109 @@
+"""
+Runtime settings for the PageViews wrapper. Each value can be overridden with the
+environment variable of the same name prefixed with PAGEVIEWS_ (e.g. PAGEVIEWS_POOL_SIZE)
+"""
+
+import os
+
+BASE_URL = os.environ.get(
+    "PAGEVIEWS_BASE_URL", "https://wikimedia.org/api/rest_v1/metrics/pageviews"
+)
+"""Root of the Wikimedia PageViews REST API (can point at a local stub server)"""
+
+POOL_SIZE = int(os.environ.get("PAGEVIEWS_POOL_SIZE", 16))
+"""Number of keep-alive upstream connections, and the cap on concurrent upstream fetches
+shared by every request the process is serving"""
+
+ASYNC_CLIENT = os.environ.get("PAGEVIEWS_ASYNC_CLIENT", "").lower() in ("1", "true")
+"""Serve the Flask routes with the asyncio client (requires aiohttp and Flask[async])"""
+
+ASYNC_CONCURRENCY = int(os.environ.get("PAGEVIEWS_ASYNC_CONCURRENCY", 100))
+"""Maximum number of upstream connections open at once per asyncio client session"""
+
+CACHE_MAX_BYTES = int(os.environ.get("PAGEVIEWS_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+"""Memory budget for cached upstream responses"""
+
+CACHE_PATH = os.environ.get("PAGEVIEWS_CACHE_PATH", "")
+"""Path of a SQLite file that persists cached upstream responses (disabled if empty)"""
+
+CACHE_RECENT_TTL = int(os.environ.get("PAGEVIEWS_CACHE_RECENT_TTL", 600))
+"""Seconds to cache responses that include today or yesterday, which may still change"""
+
+CACHE_NOT_FOUND_TTL = int(os.environ.get("PAGEVIEWS_CACHE_NOT_FOUND_TTL", 300))
+"""Seconds to remember that the upstream API had no data (404) for a URL"""
+
+RESULT_CACHE_MAX_BYTES = int(
+    os.environ.get("PAGEVIEWS_RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+"""Memory budget for ranked top article results and their serialized JSON bodies"""
+
+DAILY_AGGREGATE_DAYS = int(os.environ.get("PAGEVIEWS_DAILY_AGGREGATE_DAYS", 400))
+"""Number of days of parsed top article views kept to build weekly and monthly rankings"""
+
+RATE_LIMIT = float(os.environ.get("PAGEVIEWS_RATE_LIMIT", 100))
+"""Maximum upstream requests per second, backed off automatically when throttled"""
+
+THROTTLE_RETRIES = int(os.environ.get("PAGEVIEWS_THROTTLE_RETRIES", 3))
+"""Number of times a throttled (429) upstream request is retried before failing"""
+
+AGGREGATION_ENGINE = os.environ.get("PAGEVIEWS_AGGREGATION_ENGINE", "dict")
+"""How top article views are summed and ranked: 'dict' (pure Python) or 'numpy'"""
+
+RANGE_MAX_DAYS = int(os.environ.get("PAGEVIEWS_RANGE_MAX_DAYS", 366))
+"""Longest date range, in days, that a top articles range request may cover"""
+
+RANGE_CHUNK_DAYS = int(os.environ.get("PAGEVIEWS_RANGE_CHUNK_DAYS", 31))
+"""Number of days fetched and parsed together when building a date range ranking"""
+
+AGGREGATION_PROCESSES = int(
+    os.environ.get("PAGEVIEWS_AGGREGATION_PROCESSES", os.cpu_count() or 1)
+)
+"""Worker processes that parse and sum date range chunks (0 to do it in the serving
+process)"""
+
+STORE_PATH = os.environ.get("PAGEVIEWS_STORE_PATH", "")
+"""Directory of a local columnar store of historical daily top lists and article views,
+answered from before going upstream (disabled if empty)"""
+
+BATCH_MAX_ITEMS = int(os.environ.get("PAGEVIEWS_BATCH_MAX_ITEMS", 1000))
+"""Maximum number of items in one /views/batch request"""
+
+HTTP_MAX_AGE = int(os.environ.get("PAGEVIEWS_HTTP_MAX_AGE", 365 * 24 * 60 * 60))
+"""Cache-Control max-age (seconds) of responses that only cover days before yesterday"""
+
+HTTP_RECENT_MAX_AGE = int(os.environ.get("PAGEVIEWS_HTTP_RECENT_MAX_AGE", 60))
+"""Cache-Control max-age (seconds) of responses that include today or yesterday"""
+
+JSON_LIBRARY = os.environ.get("PAGEVIEWS_JSON_LIBRARY", "auto")
+"""JSON library used to parse payloads and serialize responses: 'orjson', 'json' (the
+standard library) or 'auto' (orjson if it is installed)"""
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("PAGEVIEWS_COMPRESSION_MIN_BYTES", 1024))
+"""Responses smaller than this are sent uncompressed"""
+
+COMPRESSED_CACHE_MAX_BYTES = int(
+    os.environ.get("PAGEVIEWS_COMPRESSED_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+)
+"""Memory budget for gzip and brotli compressed response bodies"""
+
+STREAM_PROVISIONAL_LIMIT = int(os.environ.get("PAGEVIEWS_STREAM_PROVISIONAL_LIMIT", 100))
+"""Maximum number of articles in each provisional ranking of a streamed top list (the
+final ranking is not cut)"""
+
+METRICS = os.environ.get("PAGEVIEWS_METRICS", "").lower() in ("1", "true")
+"""Record request, stage and upstream metrics and serve them at /metrics"""
+
+SERVER_TIMING = os.environ.get("PAGEVIEWS_SERVER_TIMING", "").lower() in ("1", "true")
+"""Add a Server-Timing header with the time spent in each stage to every response"""
+
+PROFILE_ALLOWED_IPS = [
+    address.strip()
+    for address in os.environ.get("PAGEVIEWS_PROFILE_ALLOWED_IPS", "").split(",")
+    if address.strip()
+]
+"""Client addresses or networks (comma separated, such as 127.0.0.1,10.0.0.0/8) allowed to
+profile a request with an X-Profile header or profile parameter (disabled if empty)"""
+
+PROFILE_PATH = os.environ.get("PAGEVIEWS_PROFILE_PATH", "")
+"""Directory profiles are written to, with the usual response sent back (if empty, the
+profile is sent instead of the response)"""
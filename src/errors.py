@@ -31,8 +31,13 @@ class ThrottlingException(Exception):
     Client has made too many requests and it is being throttled.
     This will happen if the storage cannot keep up with the request ratio from a given IP
     https://wikitech.wikimedia.org/wiki/Analytics/PageviewAPI#Gotchas
+
+    @param retry_after: seconds the API asked the client to wait before retrying, if given
     """
 
+    def __init__(self, retry_after=None):
+        self.retry_after = retry_after
+
     def __str__(self):
         return "Too many requests made, received 429 from Wikimedia API"
 
@@ -0,0 +1,149 @@
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+
+
+class FairExecutor:
+    """
+    A process-wide pool of worker threads shared by every caller, so the number of
+    threads (and upstream requests in flight) stays at max_workers no matter how many
+    requests are being served at once.
+
+    Work is submitted in batches (one batch per incoming request) and idle workers take
+    one task from each waiting batch in turn, so a request fanning out to 31 dates
+    cannot starve a 7 date request that arrived just after it.
+
+    Tasks must not submit further work to the same executor and wait on it, as that
+    can deadlock once every worker is waiting.
+
+    If observe_queue_wait is given, it is called with the seconds each task waited for a
+    worker, from the worker thread that starts it.
+    """
+
+    def __init__(self, max_workers, observe_queue_wait=None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        """The maximum number of tasks run at once"""
+        self.observe_queue_wait = observe_queue_wait
+        self._batches = deque()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._queued = 0
+        self._running = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._shutdown = False
+
+    def submit_batch(self, fn, args_list):
+        """
+        Expects:
+        A callable and a list of argument tuples to call it with
+
+        Returns:
+        A list of concurrent.futures.Future objects, one per argument tuple and in the same
+        order, which can be waited on with concurrent.futures.as_completed or wait
+        """
+        queued_at = time.perf_counter()
+        tasks = deque((Future(), fn, args, queued_at) for args in args_list)
+        futures = [future for future, _, _, _ in tasks]
+        if not tasks:
+            return futures
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot submit to an executor after shutdown")
+            self._batches.append(tasks)
+            self._queued += len(tasks)
+            self._peak_queued = max(self._peak_queued, self._queued)
+            self.__start_workers()
+            self._condition.notify(len(tasks))
+        return futures
+
+    def submit(self, fn, *args):
+        return self.submit_batch(fn, [args])[0]
+
+    def stats(self):
+        """
+        Returns:
+        A dict describing the current load on the executor
+        - queued: the number of tasks waiting for a worker
+        - waiting_batches: the number of callers with tasks waiting for a worker
+        - running: the number of tasks currently running
+        - peak_queued: the highest number of tasks waiting at once since startup
+        - completed: the number of tasks finished since startup
+        - max_workers: the size of the worker pool
+        """
+        with self._condition:
+            return {
+                "queued": self._queued,
+                "waiting_batches": len(self._batches),
+                "running": self._running,
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "max_workers": self.max_workers,
+            }
+
+    def shutdown(self, wait=True):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __start_workers(self):
+        """Starts another worker thread if there is queued work and room in the pool"""
+        idle = len(self._threads) - self._running
+        while idle < self._queued and len(self._threads) < self.max_workers:
+            thread = threading.Thread(
+                target=self.__work,
+                name="FairExecutor-{n}".format(n=len(self._threads)),
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+            idle += 1
+
+    def __next_task(self):
+        """Takes one task from the batch at the front of the queue and rotates it to the back"""
+        with self._condition:
+            while not self._batches and not self._shutdown:
+                self._condition.wait()
+            if not self._batches:
+                return None
+            tasks = self._batches.popleft()
+            task = tasks.popleft()
+            if tasks:
+                self._batches.append(tasks)
+            self._queued -= 1
+            self._running += 1
+            return task
+
+    def __work(self):
+        while True:
+            task = self.__next_task()
+            if task is None:
+                return
+            future, fn, args, queued_at = task
+            if self.observe_queue_wait is not None:
+                self.observe_queue_wait(time.perf_counter() - queued_at)
+            run = future.set_running_or_notify_cancel()
+            result, exception = None, None
+            if run:
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    exception = e
+            # Count the task as finished before its future is, so stats() agrees with
+            # callers that have just seen the future complete
+            with self._condition:
+                self._running -= 1
+                self._completed += 1
+            if run:
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,149 @@
+"""
+HTTP caching for the Flask resources: strong ETags, Last-Modified and Cache-Control
+headers, and 304 Not Modified answers to conditional requests.
+
+Pageviews for days before yesterday (UTC) never change, so responses covering only those
+days are cacheable for HTTP_MAX_AGE seconds, while responses that include today or
+yesterday are only cacheable for HTTP_RECENT_MAX_AGE seconds. The validators of each
+response are remembered by request URL for as long as the response is fresh, so a
+conditional request for a URL that was already served is answered with a 304 without
+computing the result again.
+
+Bodies are compressed with the best encoding the client accepts (see compression). Each
+encoding is a separate representation with its own ETag.
+"""
+
+import compression
+import config
+import hashlib
+import metrics
+import wikipedia_client
+
+from cache import LRUCache
+from calendar import monthrange
+from datetime import datetime, timedelta, timezone
+from flask import Response, request
+from werkzeug.http import is_resource_modified
+
+VALIDATOR_CACHE_BYTES = 8 * 1024 * 1024
+"""Memory budget for the validators of recently served responses"""
+
+VALIDATOR_BYTES = 100
+"""Approximate memory held by the validators of one response, besides its URL"""
+
+validators = LRUCache(VALIDATOR_CACHE_BYTES)
+"""(etag, last modified, max age, final) of recently served responses keyed by request
+URL and content encoding"""
+
+metrics.cache_lookups.add(metrics.lookups("validators", validators))
+
+
+def not_modified():
+    """
+    Returns:
+    A 304 response if the current request's URL was served recently and the request's
+    If-None-Match or If-Modified-Since header shows the client already has that response,
+    otherwise None
+    """
+    key = __validator_key()
+    known = validators.get(key)
+    if known is None:
+        return None
+    etag, last_modified, max_age, final = known
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    remaining = validators.ttl(key)
+    max_age = max_age if remaining is None else int(remaining)
+    return __with_headers(Response(status=304), etag, last_modified, max_age, final)
+
+
+def cacheable(body, end_date, mimetype="application/json", complete=True):
+    """
+    Expects:
+    A serialized response body, the last day (a date, or an ISO 8601 date string) of the
+    pageviews it covers and whether it covers every day up to then (a partial response
+    with missing days is never final, however old its days)
+
+    Returns:
+    A 200 response for the body with caching headers, or a 304 response if the current
+    request is conditional and the client already has this body
+    """
+    if isinstance(end_date, str):
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    encoding = compression.negotiate(request.accept_encodings, len(body))
+    if encoding is not None:
+        body = compression.compress(body, encoding, etag)
+        etag = "{etag}-{encoding}".format(etag=etag, encoding=encoding)
+    max_age, last_modified, final = freshness(end_date, complete)
+    key = __validator_key()
+    validators.put(
+        key,
+        (etag, last_modified, max_age, final),
+        len(request.full_path) + VALIDATOR_BYTES,
+        max_age,
+    )
+    response = __with_headers(
+        Response(body, 200, mimetype=mimetype), etag, last_modified, max_age, final
+    )
+    if encoding is not None:
+        response.content_encoding = encoding
+    return response.make_conditional(request)
+
+
+def compressed(body, mimetype="application/json"):
+    """
+    Returns:
+    A 200 response for a body without caching headers (such as the answer to a POST),
+    compressed with the best encoding the client accepts
+    """
+    encoding = compression.negotiate(request.accept_encodings, len(body))
+    if encoding is not None:
+        body = compression.encode(body, encoding)
+    response = Response(body, 200, mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.content_encoding = encoding
+    return response
+
+
+def freshness(end_date, complete=True):
+    """
+    Returns:
+    The max-age for a response covering days up to end_date, when its data last changed
+    and whether the data is final. Complete data is final two days after its last day,
+    otherwise it may have changed up to now.
+    """
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    if complete and wikipedia_client.cache_ttl([end_date.strftime("%Y%m%d")]) is None:
+        finalized = datetime(
+            end_date.year, end_date.month, end_date.day, tzinfo=timezone.utc
+        ) + timedelta(days=2)
+        return config.HTTP_MAX_AGE, min(finalized, now), True
+    return config.HTTP_RECENT_MAX_AGE, now, False
+
+
+def month_end(year_month):
+    """Returns the last day of a YYYY-MM month"""
+    year, month = (int(part) for part in year_month.split("-"))
+    return datetime(year, month, monthrange(year, month)[1]).date()
+
+
+def __validator_key():
+    """
+    Identifies the representation the current request is answered with: its URL and the
+    encoding it would be compressed with if its body is large enough
+    """
+    encoding = request.accept_encodings.best_match(compression.supported_encodings())
+    return request.full_path, encoding
+
+
+def __with_headers(response, etag, last_modified, max_age, final):
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if final:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,36 @@
+"""
+JSON encoding and decoding for upstream payloads and API responses. Uses orjson when it
+is installed, which parses large top article payloads and serializes large top lists
+several times faster than the standard library, and falls back to the json module
+otherwise. PAGEVIEWS_JSON_LIBRARY can force either one.
+"""
+
+import config
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if config.JSON_LIBRARY == "json":
+    orjson = None
+elif config.JSON_LIBRARY == "orjson" and orjson is None:
+    raise ImportError("orjson must be installed when PAGEVIEWS_JSON_LIBRARY is 'orjson'")
+
+
+def loads(body):
+    """Parses a JSON document from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(obj):
+    """
+    Serializes obj to a compact UTF-8 JSON document in bytes. Both libraries produce the
+    same bytes, so bodies and their ETags don't depend on which one is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
@@ -1,15 +1,59 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, current_app
 from flask_restful import Api, Resource
+import config
+import httpcache
+import ipaddress
+import jsonlib
+import metrics
 import pageviews
+import response
 import json
 from datetime import datetime, date
+from itertools import chain
 import errors
 
 app = Flask(__name__)
 api = Api(app)
 
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+
+
+PROFILE_VALUES = ("1", "pstats", "text", "collapsed")
+"""X-Profile header or profile parameter values that turn profiling on"""
+
+
+def profiled(meth):
+	"""
+	Runs the handler under a profiler if the request asks for one with an X-Profile header
+	or profile parameter set to one of PROFILE_VALUES and comes from an address allowed to
+	(see profiler). Other values run the handler as usual. The profiler module is only
+	imported for profiled requests.
+	"""
+	if not config.PROFILE_ALLOWED_IPS:
+		return meth
+	value = request.headers.get("X-Profile") or request.args.get("profile") or ""
+	if value.lower() not in PROFILE_VALUES or not profiling_allowed(request.remote_addr):
+		return meth
+	import profiler
+	return profiler.profiled(meth, value)
+
+
+def profiling_allowed(address):
+	"""Whether address is one of, or in one of the networks of, PROFILE_ALLOWED_IPS"""
+	try:
+		address = ipaddress.ip_address(address)
+	except ValueError:
+		return False
+	return any(
+		address in ipaddress.ip_network(network, strict=False)
+		for network in config.PROFILE_ALLOWED_IPS
+	)
+
 
 class ArticleViews(Resource):
+	method_decorators = [profiled]
+
 	def get(self, granularity, article, date):
 		"""
 		Parameters:
@@ -31,9 +75,12 @@ class ArticleViews(Resource):
 		- end_date (str): the date up to and including which the article view data ends in ISO
 			8601 format
 		"""
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
 		try:
 			result = pageviews.views_per_article(granularity, article, date)
-			return result.__dict__, 200
+			return httpcache.cacheable(response.serialize(result), result.end_date)
 		except errors.InvalidInputException as i:
 			return str(i), 400
 		except errors.ZeroOrNotLoadedDataException as z:
@@ -43,6 +90,8 @@ class ArticleViews(Resource):
 
 
 class TopViews(Resource):
+	method_decorators = [profiled]
+
 	def get(self, granularity, date):
 		"""
 		Parameters:
@@ -53,6 +102,14 @@ class TopViews(Resource):
 			indicates the day from which the week starts, and for monthly requests, the date
 			indicates the month and year to get top viewed articles for
 
+		Query parameters:
+		- limit (int, optional): only return the top limit articles
+		- partial (bool, optional): 'true' to rank the days that have data when some days of
+			the week or month do not have data yet, instead of responding with a 404
+		- stream (str, optional): 'sse' or 'ndjson' to stream a provisional ranking each time
+			another day's top list arrives from upstream, followed by the final ranking (also
+			selected by an Accept: text/event-stream or application/x-ndjson header)
+
 		Returns:
 		A json formatted TopViewsResponse object with the following attributes:
 		- article_views (list<dict>): a list of hashes describing cumulative top article views
@@ -70,10 +127,60 @@ class TopViews(Resource):
 			represented in ISO 8601 format
 		- end_date (str): the date up to and including which article views
 			are counted, represented in ISO 8601 format
+		- missing_dates (list<str>): only for partial requests, the ISO 8601 dates without
+			data that are not counted
+
+		When streaming, each event is a TopViewsResponse. Provisional rankings are cut to
+		PAGEVIEWS_STREAM_PROVISIONAL_LIMIT articles and list the days not counted yet in
+		missing_dates. With server-sent events the event type is 'provisional', 'final' or
+		'error' (with data {"status": ..., "error": ...}). With ndjson each line is
+		{"event": <type>, "result": <TopViewsResponse>}, or
+		{"event": "error", "status": ..., "error": ...}.
+		"""
+		stream = stream_requested()
+		if stream is not None:
+			return top_views_stream(granularity, date, stream)
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
+		try:
+			limit = request.args.get("limit")
+			result, body = pageviews.top_views_with_body(
+				granularity, date, limit, partial_requested()
+			)
+			return httpcache.cacheable(
+				body, result.end_date, complete=not result.missing_dates
+			)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		except errors.ZeroOrNotLoadedDataException as z:
+			return str(z), 404
+		except errors.ThrottlingException as t:
+			return str(t), 429
+
+
+class TopRangeViews(Resource):
+	def get(self, start, end):
 		"""
+		Parameters:
+		- start (str): An ISO 8601 formatted date string (YYYY-MM-DD) for the first day counted
+		- end (str): An ISO 8601 formatted date string (YYYY-MM-DD) for the last day counted.
+			The range can cover at most PAGEVIEWS_RANGE_MAX_DAYS days (366 by default)
+
+		Query parameters:
+		- limit (int, optional): only return the top limit articles
+
+		Returns:
+		A json formatted TopViewsResponse object for the articles viewed over the whole range,
+		in the same format as TopViews
+		"""
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
 		try:
-			result = pageviews.top_views(granularity, date)
-			return result.__dict__, 200
+			limit = request.args.get("limit")
+			result, body = pageviews.top_views_range_with_body(start, end, limit)
+			return httpcache.cacheable(body, result.end_date)
 		except errors.InvalidInputException as i:
 			return str(i), 400
 		except errors.ZeroOrNotLoadedDataException as z:
@@ -83,6 +190,8 @@ class TopViews(Resource):
 
 
 class DayWithMostViews(Resource):
+	method_decorators = [profiled]
+
 	def get(self, article, year_month):
 		"""
 		Parameters:
@@ -90,16 +199,31 @@ class DayWithMostViews(Resource):
 			underscores (e.g. the article Barbie (film) should be represented as Barbie_(film))
 		- year_month (str): An ISO 8601 formatted date string with the format YYYY-MM
 
+		Query parameters:
+		- partial (bool, optional): 'true' to find the peak over the days that have data when
+			some days of the month do not have data yet, instead of responding with a 404
+
 		Returns:
 		A json formatted DateWithMostViewsResponse object with attributes
 		- date (list<str>): a list of ISO 8601 dates representing the date (or dates if
 			multiple days are tied) the article received the most views in the month requested
 		- views (int): the number of views for the article on the returned date(s)
 		- article (str): the name of the requested article
+		- missing_dates (list<str>): only for partial requests, the ISO 8601 dates without
+			data that are not counted
 		"""
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
 		try:
-			result = pageviews.day_of_month_with_most_views(article, year_month)
-			return result.__dict__, 200
+			result = pageviews.day_of_month_with_most_views(
+				article, year_month, partial_requested()
+			)
+			return httpcache.cacheable(
+				response.serialize(result),
+				httpcache.month_end(year_month),
+				complete=not result.missing_dates,
+			)
 		except errors.InvalidInputException as i:
 			return str(i), 400
 		except errors.ZeroOrNotLoadedDataException as z:
@@ -108,11 +232,300 @@ class DayWithMostViews(Resource):
 			return str(t), 429
 
 
-api.add_resource(ArticleViews, "/views/<granularity>/<article>/<date>")
+class ManyDayWithMostViews(Resource):
+	def get(self, year_month):
+		"""
+		Parameters:
+		- year_month (str): An ISO 8601 formatted date string with the format YYYY-MM
+
+		Query parameters:
+		- article (str): an article to find the peak day of, repeated for each article (up to
+			PAGEVIEWS_BATCH_MAX_ITEMS), e.g. ?article=NewJeans&article=Barbie_(film)
+
+		Returns:
+		A json object {"results": [...]} with one entry per article, in the same order as
+		the articles, of the form
+			{"status": 200, "result": <DateWithMostViewsResponse>}
+		or, for an article that failed,
+			{"status": <400, 404, 429 or 500>, "error": <error message>}
+		"""
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
+		try:
+			body, complete = self.__results(request.args.getlist("article"), year_month)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		return httpcache.cacheable(
+			body, httpcache.month_end(year_month), complete=complete
+		)
+
+	def post(self, year_month):
+		"""The same as get, for long lists of articles sent as a json list in the body"""
+		articles = request.get_json(silent=True)
+		if not isinstance(articles, list) or not all(
+			isinstance(article, str) for article in articles
+		):
+			return "The request body must be a json list of article names.", 400
+		try:
+			body, _ = self.__results(articles, year_month)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		return httpcache.compressed(body)
+
+	def __results(self, articles, year_month):
+		"""Returns the serialized results and whether every article had a result"""
+		results = pageviews.day_of_month_with_most_views_many(articles, year_month)
+		entries = [batch_result(result, exception) for _, result, exception in results]
+		complete = all(entry["status"] == 200 for entry in entries)
+		return jsonlib.dumps({"results": entries}), complete
+
+
+class BatchArticleViews(Resource):
+	def post(self):
+		"""
+		Request body:
+		A json list of up to PAGEVIEWS_BATCH_MAX_ITEMS (1000 by default) items, each either an
+		object {"article": ..., "granularity": ..., "date": ...} or a list
+		[article, granularity, date] with the same meaning as the ArticleViews path parameters
+
+		Query parameters:
+		- stream (str, optional): 'ndjson' to stream each item's result as a line of json as
+			soon as it completes (also selected by an Accept: application/x-ndjson header)
+
+		Returns:
+		A json object {"results": [...]} with one entry per item, in the same order as the
+		items, of the form
+			{"status": 200, "result": <ArticleViewsResponse>}
+		or, for an item that failed,
+			{"status": <400, 404, 429 or 500>, "error": <error message>}
+
+		When streaming, each line is one of those entries with an extra "index" key giving
+		the position of its item in the request, in the order the items complete
+		"""
+		try:
+			items = batch_items(request.get_json(silent=True))
+			results = pageviews.views_per_article_batch(items)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		if request.args.get("stream") == "ndjson" or (
+			request.accept_mimetypes.best == NDJSON
+		):
+			return Response(ndjson_batch_results(results), 200, mimetype=NDJSON)
+		ordered = [None] * len(items)
+		for idx, result, exception in results:
+			ordered[idx] = batch_result(result, exception)
+		return httpcache.compressed(jsonlib.dumps({"results": ordered}))
+
+
+def partial_requested():
+	"""Whether the request asked for a partial result with ?partial=true"""
+	return request.args.get("partial", "").lower() in ("true", "1")
+
+
+def batch_items(body):
+	"""Returns the (article, granularity, date) tuples of a /views/batch request body"""
+	if not isinstance(body, list):
+		raise errors.InvalidInputException("A batch must be a non-empty list of items.")
+	items = []
+	for item in body:
+		if isinstance(item, dict):
+			item = [item.get("article"), item.get("granularity"), item.get("date")]
+		if not isinstance(item, list) or len(item) != 3 or not all(
+			isinstance(value, str) for value in item
+		):
+			raise errors.InvalidInputException(
+				"Batch items must have a string article, granularity and date, got {item} "
+				"instead".format(item=json.dumps(item))
+			)
+		items.append(tuple(item))
+	return items
+
+
+def batch_result(result, exception):
+	if exception is None:
+		return {"status": 200, "result": result.as_dict()}
+	return {"status": error_status(exception), "error": str(exception)}
 
-api.add_resource(TopViews, "/top/<granularity>/<date>")
 
-api.add_resource(DayWithMostViews, "/views/top-day/<article>/<year_month>")
+def error_status(exception):
+	"""The HTTP status the single item endpoints respond with for an exception"""
+	if isinstance(exception, errors.InvalidInputException):
+		return 400
+	elif isinstance(exception, errors.ZeroOrNotLoadedDataException):
+		return 404
+	elif isinstance(exception, errors.ThrottlingException):
+		return 429
+	return 500
+
+
+def ndjson_batch_results(results):
+	for idx, result, exception in results:
+		line = {"index": idx}
+		line.update(batch_result(result, exception))
+		yield jsonlib.dumps(line) + b"\n"
+
+
+def stream_requested():
+	"""
+	The streaming format (SSE or NDJSON) asked for with ?stream=sse or ?stream=ndjson or an
+	Accept header, or None for a single response
+	"""
+	stream = request.args.get("stream")
+	if stream == "sse" or (stream is None and request.accept_mimetypes.best == SSE):
+		return SSE
+	if stream == "ndjson" or (stream is None and request.accept_mimetypes.best == NDJSON):
+		return NDJSON
+	return None
+
+
+def top_views_stream(granularity, date, mimetype):
+	"""
+	Streams the rankings of pageviews.top_views_progressive. Errors before the first
+	ranking get the usual status code, later ones are sent as an error event.
+	"""
+	rankings = pageviews.top_views_progressive(
+		granularity, date, request.args.get("limit"), partial_requested()
+	)
+	try:
+		first = next(rankings)
+	except (
+		errors.InvalidInputException,
+		errors.ZeroOrNotLoadedDataException,
+		errors.ThrottlingException,
+	) as e:
+		return str(e), error_status(e)
+	return Response(
+		ranking_events(chain([first], rankings), mimetype),
+		200,
+		mimetype=mimetype,
+		# Ask proxies not to buffer the stream
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+	)
+
+
+def ranking_events(rankings, mimetype):
+	try:
+		for result, final in rankings:
+			event = "final" if final else "provisional"
+			yield stream_event(mimetype, event, {"result": result.as_dict()})
+	except Exception as e:
+		# The status line has already been sent, so report the error in the stream
+		yield stream_event(
+			mimetype, "error", {"status": error_status(e), "error": str(e)}
+		)
+
+
+def stream_event(mimetype, event, data):
+	"""Formats one event as a server-sent event or a line of ndjson"""
+	if mimetype == SSE:
+		payload = data["result"] if "result" in data else data
+		return b"event: " + event.encode() + b"\ndata: " + jsonlib.dumps(payload) + b"\n\n"
+	line = {"event": event}
+	line.update(data)
+	return jsonlib.dumps(line) + b"\n"
+
+
+def ensure_sync(meth):
+	"""Lets Flask-RESTful call coroutine handlers by running them on an event loop"""
+	return current_app.ensure_sync(meth)
+
+
+class AsyncArticleViews(ArticleViews):
+	"""ArticleViews served with the asyncio client, see ArticleViews.get"""
+
+	method_decorators = [profiled, ensure_sync]
+
+	async def get(self, granularity, article, date):
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
+		try:
+			result = await pageviews.views_per_article_async(granularity, article, date)
+			return httpcache.cacheable(response.serialize(result), result.end_date)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		except errors.ZeroOrNotLoadedDataException as z:
+			return str(z), 404
+		except errors.ThrottlingException as t:
+			return str(t), 429
+
+
+class AsyncTopViews(TopViews):
+	"""TopViews served with the asyncio client, see TopViews.get"""
+
+	method_decorators = [profiled, ensure_sync]
+
+	async def get(self, granularity, date):
+		stream = stream_requested()
+		if stream is not None:
+			# Streams are produced by the blocking client as the response is sent
+			return top_views_stream(granularity, date, stream)
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
+		try:
+			limit = request.args.get("limit")
+			result, body = await pageviews.top_views_with_body_async(
+				granularity, date, limit, partial_requested()
+			)
+			return httpcache.cacheable(
+				body, result.end_date, complete=not result.missing_dates
+			)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		except errors.ZeroOrNotLoadedDataException as z:
+			return str(z), 404
+		except errors.ThrottlingException as t:
+			return str(t), 429
+
+
+class AsyncDayWithMostViews(DayWithMostViews):
+	"""DayWithMostViews served with the asyncio client, see DayWithMostViews.get"""
+
+	method_decorators = [profiled, ensure_sync]
+
+	async def get(self, article, year_month):
+		cached = httpcache.not_modified()
+		if cached is not None:
+			return cached
+		try:
+			result = await pageviews.day_of_month_with_most_views_async(
+				article, year_month, partial_requested()
+			)
+			return httpcache.cacheable(
+				response.serialize(result),
+				httpcache.month_end(year_month),
+				complete=not result.missing_dates,
+			)
+		except errors.InvalidInputException as i:
+			return str(i), 400
+		except errors.ZeroOrNotLoadedDataException as z:
+			return str(z), 404
+		except errors.ThrottlingException as t:
+			return str(t), 429
+
+
+if config.ASYNC_CLIENT:
+	api.add_resource(AsyncArticleViews, "/views/<granularity>/<article>/<date>")
+
+	api.add_resource(AsyncTopViews, "/top/<granularity>/<date>")
+
+	api.add_resource(AsyncDayWithMostViews, "/views/top-day/<article>/<year_month>")
+else:
+	api.add_resource(ArticleViews, "/views/<granularity>/<article>/<date>")
+
+	api.add_resource(TopViews, "/top/<granularity>/<date>")
+
+	api.add_resource(DayWithMostViews, "/views/top-day/<article>/<year_month>")
+
+# Batches fan out over the shared upstream executor with either client
+api.add_resource(BatchArticleViews, "/views/batch")
+
+api.add_resource(ManyDayWithMostViews, "/views/top-day/<year_month>")
+
+# Range rankings are CPU bound and run in the aggregation process pool with either client
+api.add_resource(TopRangeViews, "/top/range/<start>/<end>")
 
 
 @app.route("/")
@@ -120,5 +533,22 @@ def index():
 	return "Wikimedia Pageviews Wrapper"
 
 
+if metrics.enabled or metrics.server_timing:
+	@app.before_request
+	def begin_request_timings():
+		metrics.begin_request()
+
+	@app.after_request
+	def end_request_timings(response):
+		endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+		return metrics.end_request(response, endpoint, request.method)
+
+
+if metrics.enabled:
+	@app.route("/metrics")
+	def prometheus_metrics():
+		return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
 	app.run(port=8000, debug=True)
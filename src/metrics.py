@@ -0,0 +1,289 @@
+"""
+Prometheus metrics for the /metrics endpoint, and per-request stage timings for the
+Server-Timing response header.
+
+Recording is off unless PAGEVIEWS_METRICS is set, and Server-Timing is off unless
+PAGEVIEWS_SERVER_TIMING is set. While both are off, every hook returns after checking a
+flag, so instrumented code costs next to nothing. Counters that are already kept
+elsewhere (cache hits and misses, executor load, throttling) are read when /metrics is
+scraped rather than recorded as they happen.
+
+Stage timings cover the thread handling the request. Work it waits on in other threads
+(such as parsing each upstream response in the upstream executor) is part of the stage
+that waits for it in the Server-Timing header, and has its own stage in the histograms.
+"""
+
+import config
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+enabled = config.METRICS
+"""Whether metrics are recorded and served at /metrics"""
+
+server_timing = config.SERVER_TIMING
+"""Whether responses carry a Server-Timing header"""
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+"""Histogram bucket upper bounds in seconds"""
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = []
+"""Every metric, in the order they are rendered"""
+
+NOOP = nullcontext()
+
+__request_timings = ContextVar("request_timings", default=None)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        """Adds amount to the count for the label values, if metrics are enabled"""
+        if not enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = render_header(self.name, self.documentation, "counter")
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(render_sample(self.name, self.labelnames, labels, value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, seconds, *labels):
+        """Records a duration for the label values, if metrics are enabled"""
+        if not enabled:
+            return
+        idx = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # One count per bucket, one above the last bucket, then the sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[idx] += 1
+            counts[-1] += seconds
+
+    def render(self):
+        lines = render_header(self.name, self.documentation, "histogram")
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        names = self.labelnames + ("le",)
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    render_sample(self.name + "_bucket", names, labels + (bound,), cumulative)
+                )
+            lines.append(render_sample(self.name + "_sum", self.labelnames, labels, counts[-1]))
+            lines.append(
+                render_sample(self.name + "_count", self.labelnames, labels, cumulative)
+            )
+        return lines
+
+
+class Collected:
+    """
+    A metric whose values are read when metrics are rendered, from functions (added with
+    add) each returning a dict of label values (a tuple) to value. Values for the same
+    labels from several functions are added together.
+    """
+
+    def __init__(self, name, documentation, kind, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        """The Prometheus metric type, 'counter' or 'gauge'"""
+        self.labelnames = labelnames
+        self.collectors = []
+        registry.append(self)
+
+    def add(self, collect):
+        self.collectors.append(collect)
+
+    def render(self):
+        lines = render_header(self.name, self.documentation, self.kind)
+        values = {}
+        for collect in self.collectors:
+            for labels, value in collect().items():
+                values[labels] = values.get(labels, 0) + value
+        for labels, value in sorted(values.items()):
+            lines.append(render_sample(self.name, self.labelnames, labels, value))
+        return lines
+
+
+class Timer:
+    """Times a stage into stage_seconds and the current request's Server-Timing"""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.stage, time.perf_counter() - self.start)
+
+
+stage_seconds = Histogram(
+    "pageviews_stage_seconds",
+    "Time spent in each stage of handling requests",
+    ("stage",),
+)
+
+upstream_seconds = Histogram(
+    "pageviews_upstream_request_seconds",
+    "Latency of each request to the Wikimedia API",
+    ("endpoint",),
+)
+
+upstream_responses = Counter(
+    "pageviews_upstream_responses_total",
+    "Responses from the Wikimedia API by status code",
+    ("endpoint", "status"),
+)
+
+executor_queue_wait = Histogram(
+    "pageviews_executor_queue_wait_seconds",
+    "Time upstream fetches wait in the shared executor before a worker starts them",
+)
+
+http_seconds = Histogram(
+    "pageviews_http_request_seconds",
+    "Time to handle each request to this service, until its body starts streaming",
+    ("endpoint", "method"),
+)
+
+http_responses = Counter(
+    "pageviews_http_responses_total",
+    "Responses sent by this service by status code",
+    ("endpoint", "method", "status"),
+)
+
+cache_lookups = Collected(
+    "pageviews_cache_lookups_total",
+    "Lookups in each cache by result",
+    "counter",
+    ("cache", "result"),
+)
+
+executor_tasks = Collected(
+    "pageviews_executor_tasks",
+    "Upstream fetches waiting for or running in the shared executor",
+    "gauge",
+    ("state",),
+)
+
+upstream_coalesced = Collected(
+    "pageviews_upstream_coalesced_total",
+    "Upstream requests answered by a request for the same URL already in flight",
+    "counter",
+)
+
+
+def lookups(name, cache):
+    """Returns a collector for cache_lookups reading the hits and misses of an LRUCache"""
+    return lambda: {(name, "hit"): cache.hits, (name, "miss"): cache.misses}
+
+
+def stage(name):
+    """
+    Returns a context manager timing the stage called name, or a shared no-op one if
+    neither metrics nor Server-Timing are enabled
+    """
+    if not enabled and not server_timing:
+        return NOOP
+    return Timer(name)
+
+
+def record_stage(name, seconds):
+    stage_seconds.observe(seconds, name)
+    timings = __request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def begin_request():
+    """Starts collecting the stage timings of the request handled in this context"""
+    __request_timings.set({"total": time.perf_counter()})
+
+
+def end_request(response, endpoint, method):
+    """
+    Records a finished request and, if Server-Timing is enabled, adds the header with the
+    time spent in each stage to the response
+    """
+    timings = __request_timings.get()
+    if timings is None:
+        return response
+    __request_timings.set(None)
+    timings["total"] = time.perf_counter() - timings["total"]
+    http_seconds.observe(timings["total"], endpoint, method)
+    http_responses.inc(endpoint, method, str(response.status_code))
+    if server_timing:
+        entries = [
+            "{name};dur={ms:.1f}".format(name=name, ms=seconds * 1000)
+            for name, seconds in timings.items()
+            if name != "total"
+        ]
+        entries.append("total;dur={ms:.1f}".format(ms=timings["total"] * 1000))
+        response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+def render():
+    """Returns every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def render_header(name, documentation, kind):
+    return [
+        "# HELP {name} {doc}".format(name=name, doc=documentation),
+        "# TYPE {name} {kind}".format(name=name, kind=kind),
+    ]
+
+
+def render_sample(name, labelnames, labels, value):
+    if labelnames:
+        name += "{" + ",".join(
+            '{label}="{value}"'.format(label=label, value=escape_label(value))
+            for label, value in zip(labelnames, labels)
+        ) + "}"
+    return "{name} {value}".format(name=name, value=value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
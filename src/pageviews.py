@@ -1,10 +1,26 @@
+import aggregation
+import async_wikipedia_client
+import config
+import jsonlib
+import metrics
+import multiprocessing
+import threading
 import wikipedia_client
 import response
 
+from aggregation import WindowAggregator
+from cache import LRUCache
 from calendar import monthrange
+from collections import deque
+from columnar import ColumnarStore
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
 from dateutil.parser import parse
-from errors import InvalidInputException
+from errors import (
+    InvalidInputException,
+    ParseResponseException,
+    ZeroOrNotLoadedDataException,
+)
 
 
 WEEKLY_VIEWS_OUTPUT = "Page views for {article} between {start} and {end}: {views}\n"
@@ -23,6 +39,35 @@ MONTHLY = "monthly"
 
 DAYS_IN_WEEK = 7
 
+RANKED_ARTICLE_BYTES = 80
+"""Approximate memory held by one ranked article in a TopViewsResponse: its name and its
+slots in the names tuple and views array"""
+
+WINDOW_CACHE_SIZE = 32
+"""The number of recent window totals kept to derive overlapping windows from"""
+
+top_views_cache = LRUCache(config.RESULT_CACHE_MAX_BYTES)
+"""Ranked TopViewsResponse results and their JSON bodies keyed by
+(granularity, start date, limit, partial)"""
+
+metrics.cache_lookups.add(metrics.lookups("top_views", top_views_cache))
+
+window_aggregator = WindowAggregator(
+    config.DAILY_AGGREGATE_DAYS,
+    WINDOW_CACHE_SIZE,
+    aggregation.engine(config.AGGREGATION_ENGINE),
+)
+"""Daily article views and recent window totals used to build top view rankings"""
+
+aggregation_pool = None
+"""Process pool that parses and sums date range chunks, started on first use"""
+
+__aggregation_pool_lock = threading.Lock()
+
+pageview_store = ColumnarStore(config.STORE_PATH) if config.STORE_PATH else None
+"""Optional local store of historical daily top lists and article views, checked before
+going upstream"""
+
 
 def views_per_article(granularity, article, date):
     """
@@ -37,6 +82,622 @@ def views_per_article(granularity, article, date):
     - start date: start date of the returned article data (the start of the requested month)
     - end date: end date of the returned article data (the end of the requested month)
     """
+    start_date, end_date, search_granularity = __views_per_article_range(
+        granularity, date
+    )
+    response_json = __stored_article_views(article, __dates_between(start_date, end_date))
+    if response_json is None:
+        start_formatted = __format_date(start_date)
+        end_formatted = __format_date(end_date)
+        response_json = wikipedia_client.views_per_article(
+            article, start_formatted, end_formatted, search_granularity
+        )
+        if search_granularity == DAILY:
+            __store_article_views(article, response_json)
+    result = response.ArticleViewsResponse(
+        response_json, article, start_date.date(), end_date.date()
+    )
+
+    return result
+
+
+async def views_per_article_async(granularity, article, date):
+    """The same as views_per_article, but fetched with the asyncio client"""
+    start_date, end_date, search_granularity = __views_per_article_range(
+        granularity, date
+    )
+    response_json = __stored_article_views(article, __dates_between(start_date, end_date))
+    if response_json is None:
+        start_formatted = __format_date(start_date)
+        end_formatted = __format_date(end_date)
+        response_json = await async_wikipedia_client.views_per_article(
+            article, start_formatted, end_formatted, search_granularity
+        )
+        if search_granularity == DAILY:
+            __store_article_views(article, response_json)
+    return response.ArticleViewsResponse(
+        response_json, article, start_date.date(), end_date.date()
+    )
+
+
+def views_per_article_batch(items):
+    """
+    Expects:
+    A list of (article, granularity, date) tuples, each as accepted by views_per_article,
+    with at most BATCH_MAX_ITEMS items
+
+    Returns:
+    A generator of (index, result, exception) tuples, one per item in the order the items
+    complete, where index is the item's position in items and either result is its
+    ArticleViewsResponse or exception is the error it raised. The items are fetched
+    concurrently on the shared upstream executor. Closing the generator early cancels the
+    items that have not started.
+    """
+    if not isinstance(items, list) or not items:
+        raise InvalidInputException("A batch must be a non-empty list of items.")
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise InvalidInputException(
+            "A batch can have at most {max} items, got {count} instead".format(
+                max=config.BATCH_MAX_ITEMS, count=len(items)
+            )
+        )
+    futures = wikipedia_client.upstream_executor.submit_batch(
+        __batch_views_per_article, items
+    )
+    return __completed_batch(futures)
+
+
+def top_views(granularity, date, limit=None, partial=False):
+    """
+    Returns a TopViewsResponse ranking the articles viewed in the week or month. If a limit
+    is given only the top limit articles are ranked and returned.
+
+    If partial is true, days the upstream API has no data for yet (such as the rest of the
+    current month) are left out of the ranking and listed in the result's missing_dates
+    instead of failing the whole request. The days with data are kept, so polling a
+    partial result again only fetches the days that were missing.
+    """
+    result, _ = top_views_with_body(granularity, date, limit, partial)
+    return result
+
+
+def top_views_json(granularity, date, limit=None, partial=False):
+    """
+    The same as top_views, but returns the TopViewsResponse serialized as a JSON body. Both
+    the ranked result and its body are cached, so repeat requests for the same week or month
+    skip parsing, aggregation and serialization.
+    """
+    _, body = top_views_with_body(granularity, date, limit, partial)
+    return body
+
+
+def top_views_with_body(granularity, date, limit=None, partial=False):
+    """Returns the TopViewsResponse of top_views together with its cached JSON body"""
+    dates = __top_views_dates(granularity, date)
+    limit = __parse_limit(limit)
+    key = (granularity, dates[0].date(), limit, partial)
+    cached = top_views_cache.get(key)
+    if cached is not None:
+        return cached
+    missing_dates = window_aggregator.missing_days(dates)
+    fetched = __stored_daily_views(missing_dates)
+    fetch_dates = [date for date in missing_dates if date not in fetched]
+    if fetch_dates:
+        daily_views = wikipedia_client.top_articles(
+            [__format_date(date, use_separators=True) for date in fetch_dates],
+            parse=__parse_daily_views,
+            partial=partial,
+        )
+        fetched.update(__store_daily_views(fetch_dates, daily_views))
+    unavailable = [date for date in fetch_dates if date not in fetched]
+    result = __top_views_from_daily(
+        dates, fetched, limit, unavailable if partial else None
+    )
+    return __cache_top_views(key, result, dates)
+
+
+async def top_views_async(granularity, date, limit=None, partial=False):
+    """The same as top_views, but fetched with the asyncio client"""
+    result, _ = await top_views_with_body_async(granularity, date, limit, partial)
+    return result
+
+
+async def top_views_with_body_async(granularity, date, limit=None, partial=False):
+    """The same as top_views_with_body, but fetched with the asyncio client"""
+    dates = __top_views_dates(granularity, date)
+    limit = __parse_limit(limit)
+    key = (granularity, dates[0].date(), limit, partial)
+    cached = top_views_cache.get(key)
+    if cached is not None:
+        return cached
+    missing_dates = window_aggregator.missing_days(dates)
+    fetched = __stored_daily_views(missing_dates)
+    fetch_dates = [date for date in missing_dates if date not in fetched]
+    if fetch_dates:
+        daily_views = await async_wikipedia_client.top_articles(
+            [__format_date(date, use_separators=True) for date in fetch_dates],
+            parse=__parse_daily_views,
+            partial=partial,
+        )
+        fetched.update(__store_daily_views(fetch_dates, daily_views))
+    unavailable = [date for date in fetch_dates if date not in fetched]
+    result = __top_views_from_daily(
+        dates, fetched, limit, unavailable if partial else None
+    )
+    return __cache_top_views(key, result, dates)
+
+
+def top_views_progressive(granularity, date, limit=None, partial=False):
+    """
+    The same as top_views, but a generator of (result, final) tuples that ranks the days
+    fetched so far each time another day arrives from upstream. Provisional results rank
+    at most STREAM_PROVISIONAL_LIMIT articles and list the days not counted yet in their
+    missing_dates. The last result is the final ranking, the same as top_views returns.
+    A cached ranking, or one whose days are all stored, is yielded at once as final.
+    """
+    dates = __top_views_dates(granularity, date)
+    limit = __parse_limit(limit)
+    key = (granularity, dates[0].date(), limit, partial)
+    cached = top_views_cache.get(key)
+    if cached is not None:
+        yield cached[0], True
+        return
+    missing_dates = window_aggregator.missing_days(dates)
+    fetched = __stored_daily_views(missing_dates)
+    fetch_dates = [date for date in missing_dates if date not in fetched]
+    unavailable = []
+    if fetch_dates:
+        engine = window_aggregator.engine
+        pending = set(fetch_dates)
+        totals = window_aggregator.sum_days(
+            [date for date in dates if date not in pending], fetched
+        )
+        provisional_limit = config.STREAM_PROVISIONAL_LIMIT
+        if limit is not None:
+            provisional_limit = min(limit, provisional_limit)
+        by_formatted = {
+            __format_date(day, use_separators=True): day for day in fetch_dates
+        }
+        arrived = {}
+        for formatted, views in wikipedia_client.top_articles_as_completed(
+            list(by_formatted), parse=__parse_daily_views
+        ):
+            day = by_formatted[formatted]
+            pending.discard(day)
+            if views is None:
+                unavailable.append(day)
+                continue
+            arrived[day] = views
+            totals = engine.add(totals, views)
+            if pending:
+                result = response.TopViewsResponse.from_ranking(
+                    engine.rank(totals, provisional_limit), dates[0], dates[-1]
+                )
+                result.missing_dates = [
+                    day.strftime("%Y-%m-%d")
+                    for day in dates
+                    if day in pending or day in unavailable
+                ]
+                yield result, False
+        unavailable.sort()
+        if unavailable and not partial:
+            raise ZeroOrNotLoadedDataException(
+                [__format_date(date, use_separators=True) for date in unavailable]
+            )
+        fetched.update(__store_daily_views(list(arrived), list(arrived.values())))
+    result = __top_views_from_daily(
+        dates, fetched, limit, unavailable if partial else None
+    )
+    result, _ = __cache_top_views(key, result, dates)
+    yield result, True
+
+
+def top_views_range(start, end, limit=None):
+    """
+    Expects:
+    Start and end dates (YYYY-MM-DD, inclusive) at most RANGE_MAX_DAYS days apart, and
+    optionally a limit on the number of articles ranked
+
+    Returns:
+    A TopViewsResponse ranking the articles viewed over the whole range
+    """
+    result, _ = top_views_range_with_body(start, end, limit)
+    return result
+
+
+def top_views_range_json(start, end, limit=None):
+    """The same as top_views_range, but returns the cached JSON body of the result"""
+    _, body = top_views_range_with_body(start, end, limit)
+    return body
+
+
+def top_views_range_with_body(start, end, limit=None):
+    """Returns the TopViewsResponse of top_views_range together with its cached JSON body"""
+    dates = __range_dates(start, end)
+    limit = __parse_limit(limit)
+    key = ("range", dates[0].date(), dates[-1].date(), limit)
+    cached = top_views_cache.get(key)
+    if cached is not None:
+        return cached
+    totals = __range_totals(dates)
+    ranking = response.rank_articles(totals, limit)
+    result = response.TopViewsResponse.from_ranking(ranking, dates[0], dates[-1])
+    return __cache_top_views(key, result, dates)
+
+
+def day_of_month_with_most_views(article, year_month, partial=False):
+    """
+    Returns a DateWithMostViewsResponse for the day(s) of the month (YYYY-MM) the article
+    was viewed most. If partial is true, days the upstream API has no data for yet are
+    left out and listed in the result's missing_dates instead of failing the request.
+    """
+    days = __month_days(year_month)
+    response_json = __stored_article_views(article, days)
+    if response_json is None:
+        query_dates = [__format_date(day) for day in days]
+        response_json = wikipedia_client.daily_views_per_article(
+            article, query_dates, partial=partial
+        )
+        __store_article_views(article, response_json[0])
+    else:
+        response_json = [response_json]
+    return __day_with_most_views(response_json, article, days, partial)
+
+
+def day_of_month_with_most_views_many(articles, year_month):
+    """
+    Expects:
+    A list of up to BATCH_MAX_ITEMS article names and a month (YYYY-MM)
+
+    Returns:
+    A list with an (article, result, exception) tuple for each article, in the same order,
+    where either result is the article's DateWithMostViewsResponse or exception is the
+    error it raised. The articles' daily views are fetched concurrently on the shared
+    upstream executor and their peak days are found together in one pass.
+    """
+    if not isinstance(articles, list) or not articles:
+        raise InvalidInputException("At least one article must be given.")
+    if len(articles) > config.BATCH_MAX_ITEMS:
+        raise InvalidInputException(
+            "At most {max} articles can be given, got {count} instead".format(
+                max=config.BATCH_MAX_ITEMS, count=len(articles)
+            )
+        )
+    days = __month_days(year_month)
+    futures = wikipedia_client.upstream_executor.submit_batch(
+        __month_daily_views, [(article, days) for article in articles]
+    )
+    series = {}
+    failures = {}
+    try:
+        for idx, future in enumerate(futures):
+            try:
+                series[idx] = future.result()
+            except Exception as e:
+                failures[idx] = e
+    finally:
+        for future in futures:
+            future.cancel()
+
+    peaks = dict(zip(series, aggregation.peak_days(list(series.values()))))
+    dates = [day.strftime("%Y-%m-%d") for day in days]
+    results = []
+    for idx, article in enumerate(articles):
+        if idx in failures:
+            results.append((article, None, failures[idx]))
+            continue
+        views, peak_days = peaks[idx]
+        result = response.DateWithMostViewsResponse.from_peak(
+            article, [dates[day] for day in peak_days], views
+        )
+        results.append((article, result, None))
+    return results
+
+
+async def day_of_month_with_most_views_async(article, year_month, partial=False):
+    """The same as day_of_month_with_most_views, but fetched with the asyncio client"""
+    days = __month_days(year_month)
+    response_json = __stored_article_views(article, days)
+    if response_json is None:
+        query_dates = [__format_date(day) for day in days]
+        response_json = await async_wikipedia_client.daily_views_per_article(
+            article, query_dates, partial=partial
+        )
+        __store_article_views(article, response_json[0])
+    else:
+        response_json = [response_json]
+    return __day_with_most_views(response_json, article, days, partial)
+
+
+def prefetch_top_day(date):
+    """
+    Fetches the daily top list for a date (datetime) into the response cache and, if
+    enabled, the pageview store, unless the store already has it. The fetch runs in the
+    calling thread, so this can run as a task in the upstream executor.
+
+    Returns:
+    False if the upstream API has no data for the date, otherwise True
+    """
+    if pageview_store is not None and pageview_store.has_top_day(date):
+        return True
+    parse = __raw_body if pageview_store is None else __parse_daily_views
+    try:
+        daily_views = wikipedia_client.top_articles_day(
+            __format_date(date, use_separators=True), parse=parse
+        )
+    except ZeroOrNotLoadedDataException:
+        return False
+    if pageview_store is not None:
+        __store_daily_views([date], [daily_views])
+    return True
+
+
+def prefetch_article_month(article, year_month):
+    """
+    Fetches an article's daily views for a month (YYYY-MM) into the response cache and,
+    if enabled, the pageview store, unless the store already has them. This is the same
+    upstream request as day_of_month_with_most_views makes, and like prefetch_top_day it
+    runs in the calling thread.
+
+    Returns:
+    False if the upstream API has no data for the article in the month, otherwise True
+    """
+    days = __month_days(year_month)
+    if __stored_article_views(article, days) is not None:
+        return True
+    try:
+        response_json = wikipedia_client.views_per_article(
+            article, __format_date(days[0]), __format_date(days[-1]), DAILY
+        )
+    except ZeroOrNotLoadedDataException:
+        return False
+    __store_article_views(article, response_json)
+    return True
+
+
+def __month_daily_views(article, days):
+    """Returns the article's views on each of days, from the pageview store or upstream"""
+    response_json = __stored_article_views(article, days)
+    if response_json is None:
+        query_dates = [__format_date(day) for day in days]
+        response_json = wikipedia_client.daily_views_per_article(article, query_dates)[0]
+        __store_article_views(article, response_json)
+    try:
+        views = {item["timestamp"][:8]: item["views"] for item in response_json["items"]}
+        return [views[__format_date(day)] for day in days]
+    except Exception as e:
+        raise ParseResponseException(str(e))
+
+
+def __batch_views_per_article(article, granularity, date):
+    return views_per_article(granularity, article, date)
+
+
+def __completed_batch(futures):
+    indices = {future: idx for idx, future in enumerate(futures)}
+    try:
+        for future in as_completed(futures):
+            try:
+                yield indices[future], future.result(), None
+            except Exception as e:
+                yield indices[future], None, e
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def __range_totals(dates):
+    """
+    Sums the views of each article over dates. Dates are fetched a chunk at a time as raw
+    bodies, and each chunk is parsed and summed into a partial Counter in the aggregation
+    pool while the next chunk downloads. At most one chunk per worker is waiting to be
+    parsed, which bounds the raw bodies held in memory. The partial Counters are then
+    merged pairwise in this process, as sending them to the pool would cost more than
+    the merges themselves.
+    """
+    pool = __aggregation_pool()
+    chunk_days = max(config.RANGE_CHUNK_DAYS, 1)
+    chunks = [dates[i : i + chunk_days] for i in range(0, len(dates), chunk_days)]
+    pending = deque()
+    partials = []
+    missing_data_dates = []
+    try:
+        for chunk in chunks:
+            try:
+                bodies = wikipedia_client.top_articles(
+                    [__format_date(date, use_separators=True) for date in chunk],
+                    parse=__raw_body,
+                )
+            except ZeroOrNotLoadedDataException as z:
+                # Keep going so every date without data is reported at once
+                missing_data_dates += z.dates
+                continue
+            if pool is None:
+                partials.append(aggregation.count_views(bodies))
+                continue
+            pending.append(pool.submit(aggregation.count_views, bodies))
+            if len(pending) > config.AGGREGATION_PROCESSES:
+                partials.append(pending.popleft().result())
+        while pending:
+            partials.append(pending.popleft().result())
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+    if missing_data_dates:
+        raise ZeroOrNotLoadedDataException(missing_data_dates)
+    return aggregation.tree_reduce(None, partials)
+
+
+def __aggregation_pool():
+    global aggregation_pool
+    if config.AGGREGATION_PROCESSES < 1:
+        return None
+    with __aggregation_pool_lock:
+        if aggregation_pool is None:
+            # Spawn rather than fork, as the serving process is already running threads
+            aggregation_pool = ProcessPoolExecutor(
+                config.AGGREGATION_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return aggregation_pool
+
+
+def __raw_body(body):
+    return body
+
+
+def __parse_daily_views(body):
+    """
+    Parses a daily top articles response body straight into the aggregation engine's
+    compact per-day views as it arrives, so the full payload is never held for long
+    """
+    with metrics.stage("parse"):
+        return window_aggregator.engine.daily_views(jsonlib.loads(body))
+
+
+def __top_views_from_daily(dates, fetched, limit, missing_dates=None):
+    """
+    Ranks the articles viewed over dates, given a dict of date to daily views for the
+    dates that had to be fetched or loaded from the store. The views for the other dates
+    come from the window aggregator. For a partial result, missing_dates lists the dates
+    without data, which are left out of the ranking.
+    """
+    for date, views in fetched.items():
+        # Views for today and yesterday may still change upstream, so they are refetched
+        # (from the short-lived response cache) rather than kept for the life of the process
+        if __is_final(date):
+            window_aggregator.add_day(date, views)
+    available = dates
+    if missing_dates is not None:
+        available = [date for date in dates if date not in missing_dates]
+        if not available:
+            raise ZeroOrNotLoadedDataException(
+                [__format_date(date, use_separators=True) for date in missing_dates]
+            )
+    with metrics.stage("aggregate"):
+        if (available[-1] - available[0]).days + 1 == len(available):
+            totals = window_aggregator.totals(available, fetched)
+        else:
+            totals = window_aggregator.sum_days(available, fetched)
+        ranking = window_aggregator.engine.rank(totals, limit)
+    result = response.TopViewsResponse.from_ranking(ranking, dates[0], dates[-1])
+    if missing_dates is not None:
+        result.missing_dates = [date.strftime("%Y-%m-%d") for date in missing_dates]
+    return result
+
+
+def __day_with_most_views(response_json, article, days, partial):
+    """
+    Finds the peak of a month of daily per-article json. For a partial result, the days
+    without an item are listed in the result's missing_dates.
+    """
+    result = response.DateWithMostViewsResponse(response_json, article)
+    if partial:
+        query_dates = [__format_date(day) for day in days]
+        missing = wikipedia_client.missing_daily_dates(response_json[0], query_dates)
+        if len(missing) == len(days):
+            raise ZeroOrNotLoadedDataException(missing)
+        result.missing_dates = [
+            day.strftime("%Y-%m-%d")
+            for day, date in zip(days, query_dates)
+            if date in missing
+        ]
+    return result
+
+
+def __stored_daily_views(dates):
+    """Returns a dict of date to daily views for the dates found in the pageview store"""
+    stored = {}
+    if pageview_store is None:
+        return stored
+    for date in dates:
+        articles = pageview_store.top_day(date)
+        if articles is not None:
+            stored[date] = window_aggregator.engine.from_articles(*articles)
+    return stored
+
+
+def __store_daily_views(dates, daily_views):
+    """
+    Writes fetched daily views whose data is final to the pageview store, returning them
+    as a dict of date to daily views. Dates without data (None) are left out.
+    """
+    fetched = {
+        date: views for date, views in zip(dates, daily_views) if views is not None
+    }
+    if pageview_store is not None:
+        for date, views in fetched.items():
+            if __is_final(date):
+                names, article_views = window_aggregator.engine.articles(views)
+                pageview_store.put_top_day(date, names, article_views)
+    return fetched
+
+
+def __stored_article_views(article, days):
+    """
+    Returns a per-article json response built from the pageview store if it has the
+    article's views for every one of days, otherwise None
+    """
+    if pageview_store is None:
+        return None
+    views = pageview_store.article_days(article, days)
+    if views is None:
+        return None
+    return {
+        "items": [
+            {"timestamp": __format_date(day) + "00", "views": day_views}
+            for day, day_views in zip(days, views)
+        ]
+    }
+
+
+def __store_article_views(article, response_json):
+    """Writes the final days of a daily per-article json response to the pageview store"""
+    if pageview_store is None:
+        return
+    day_views = {}
+    for item in response_json.get("items", []):
+        day = datetime.strptime(item["timestamp"][:8], "%Y%m%d")
+        if __is_final(day):
+            day_views[day.date()] = item["views"]
+    if day_views:
+        pageview_store.put_article_days(article, day_views)
+
+
+def __is_final(date):
+    """Whether pageviews for the date can no longer change upstream"""
+    return wikipedia_client.cache_ttl([__format_date(date)]) is None
+
+
+def __cache_top_views(key, result, dates):
+    """
+    Stores a TopViewsResponse with its serialized body. The size counted against the cache
+    budget is an estimate: the body plus a fixed cost per ranked article.
+    """
+    body = response.serialize(result)
+    size = len(body) + len(result.names) * RANKED_ARTICLE_BYTES
+    ttl = wikipedia_client.cache_ttl([__format_date(date) for date in dates])
+    if result.missing_dates:
+        # Recheck missing days once their cached 404 responses expire
+        ttl = min(ttl or config.CACHE_NOT_FOUND_TTL, config.CACHE_NOT_FOUND_TTL)
+    top_views_cache.put(key, (result, body), size, ttl)
+    return result, body
+
+
+def __parse_limit(limit):
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise InvalidInputException("Limit must be a positive integer.")
+    return limit
+
+
+def __views_per_article_range(granularity, date):
     if granularity == MONTHLY:
         start_date, end_date, _ = __date_range_for_month(date)
         search_granularity = MONTHLY
@@ -49,47 +710,45 @@ def views_per_article(granularity, article, date):
                 g=granularity
             )
         )
-    start_formatted, end_formatted = __format_date(start_date), __format_date(end_date)
-    response_json = wikipedia_client.views_per_article(
-        article, start_formatted, end_formatted, search_granularity
-    )
-    result = response.ArticleViewsResponse(
-        response_json, article, start_date.date(), end_date.date()
-    )
-
-    return result
+    return start_date, end_date, search_granularity
 
 
-def top_views(granularity, date):
+def __top_views_dates(granularity, date):
     if granularity == MONTHLY:
         start_date, _, month_length = __date_range_for_month(str(date))
-        dates = [start_date + timedelta(days=x) for x in range(month_length)]
+        return [start_date + timedelta(days=x) for x in range(month_length)]
     elif granularity == WEEKLY:
         start_date = __parse_full_date(str(date))
-        dates = [start_date + timedelta(days=x) for x in range(DAYS_IN_WEEK)]
+        return [start_date + timedelta(days=x) for x in range(DAYS_IN_WEEK)]
     else:
         raise InvalidInputException(
             "Top viewed articles granularity must be 'weekly' or 'monthly', got {g} instead".format(
                 g=granularity
             )
         )
-    query_dates = [__format_date(date, use_separators=True) for date in dates]
-    response_json = wikipedia_client.top_articles(query_dates)
-    result = response.TopViewsResponse(response_json, start_date, dates[-1])
 
-    return result
 
+def __range_dates(start, end):
+    start_date, end_date = __parse_full_date(start), __parse_full_date(end)
+    if start_date > end_date:
+        raise InvalidInputException("Start date must not be after end date.")
+    days = (end_date - start_date).days + 1
+    if days > config.RANGE_MAX_DAYS:
+        raise InvalidInputException(
+            "Date ranges can cover at most {max} days, got {days} instead".format(
+                max=config.RANGE_MAX_DAYS, days=days
+            )
+        )
+    return [start_date + timedelta(days=x) for x in range(days)]
 
-def day_of_month_with_most_views(article, year_month):
+
+def __month_days(year_month):
     start_date, _, month_length = __date_range_for_month(str(year_month))
-    dates = [start_date + timedelta(days=x) for x in range(month_length)]
-    query_dates = [__format_date(date) for date in dates]
+    return [start_date + timedelta(days=x) for x in range(month_length)]
 
-    response_json = wikipedia_client.views_per_article_by_day(
-        article, query_dates, DAILY
-    )
-    result = response.DateWithMostViewsResponse(response_json, article)
-    return result
+
+def __dates_between(start_date, end_date):
+    return [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
 
 
 def __week_from_date(date):
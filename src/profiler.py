@@ -0,0 +1,183 @@
+"""
+Profiles a single request on demand. A request from an address in PROFILE_ALLOWED_IPS
+with an X-Profile header or a profile query parameter runs its handler under a profiler,
+and gets the profile back instead of the usual response (or has it written to
+PROFILE_PATH). The value picks the profile format:
+- pstats (or 1): cProfile's binary stats, readable with pstats.Stats, snakeviz etc.
+- text: the same stats as a plain text table of the most expensive functions
+- collapsed: a sampling profile as collapsed stacks (one "frame;frame;frame count" line
+  per stack), the input format of flamegraph.pl and speedscope
+
+Only the thread running the handler is profiled. Work it waits on in the upstream
+executor (fetching and parsing upstream responses) shows up as time spent waiting.
+
+main checks the header or parameter and the client's address, and only imports this
+module for requests that pass both checks.
+"""
+
+import config
+import cProfile
+import functools
+import inspect
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+
+from collections import Counter
+from datetime import datetime, timezone
+from flask import Response, make_response, request
+
+PSTATS = "pstats"
+TEXT = "text"
+COLLAPSED = "collapsed"
+
+SAMPLE_INTERVAL = 0.001
+"""Seconds between samples of a collapsed profile"""
+
+TEXT_LIMIT = 50
+"""Number of functions listed in a text profile"""
+
+EXTENSIONS = {PSTATS: "pstats", TEXT: "txt", COLLAPSED: "collapsed"}
+
+
+def requested_format(value):
+    """Returns the profile format for an X-Profile header or profile parameter value"""
+    value = value.lower()
+    if value in (TEXT, COLLAPSED):
+        return value
+    return PSTATS
+
+
+def profiled(meth, value):
+    """
+    Returns the handler meth (a function or coroutine function) wrapped to run under a
+    profiler in the format given by value
+    """
+    profile_format = requested_format(value)
+
+    if inspect.iscoroutinefunction(meth):
+        # Coroutine handlers run on an event loop in another thread, so the profiler is
+        # started there
+        @functools.wraps(meth)
+        async def run_async(*args, **kwargs):
+            with Profiler(profile_format) as profiler:
+                result = await meth(*args, **kwargs)
+            return profiler.response(result)
+
+        return run_async
+
+    @functools.wraps(meth)
+    def run(*args, **kwargs):
+        with Profiler(profile_format) as profiler:
+            result = meth(*args, **kwargs)
+        return profiler.response(result)
+
+    return run
+
+
+class Profiler:
+    """Profiles the calling thread in one of the profile formats while in a with block"""
+
+    def __init__(self, profile_format):
+        self.profile_format = profile_format
+        self._profile = None
+        self._sampler = None
+
+    def __enter__(self):
+        if self.profile_format == COLLAPSED:
+            self._sampler = Sampler(threading.get_ident(), SAMPLE_INTERVAL)
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._sampler is not None:
+            self._sampler.stop()
+        else:
+            self._profile.disable()
+
+    def output(self):
+        """Returns the profile as bytes in the profile format"""
+        if self.profile_format == COLLAPSED:
+            return self._sampler.collapsed().encode()
+        self._profile.create_stats()
+        if self.profile_format == PSTATS:
+            return marshal.dumps(self._profile.stats)
+        text = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=text)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TEXT_LIMIT)
+        return text.getvalue().encode()
+
+    def response(self, result):
+        """
+        Returns the response for a handler's result: the profile (with the handler's status
+        in an X-Profile-Status header), or the result itself if PROFILE_PATH is set and the
+        profile was written there
+        """
+        handler_response = make_response(result)
+        output = self.output()
+        if config.PROFILE_PATH:
+            name = "{endpoint}-{time}-{pid}.{extension}".format(
+                endpoint=request.endpoint,
+                time=datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ"),
+                pid=os.getpid(),
+                extension=EXTENSIONS[self.profile_format],
+            )
+            os.makedirs(config.PROFILE_PATH, exist_ok=True)
+            with open(os.path.join(config.PROFILE_PATH, name), "wb") as f:
+                f.write(output)
+            handler_response.headers["X-Profile-File"] = name
+            return handler_response
+        mimetype = "application/octet-stream" if self.profile_format == PSTATS else "text/plain"
+        profile_response = Response(output, 200, mimetype=mimetype)
+        profile_response.headers["X-Profile-Status"] = str(handler_response.status_code)
+        profile_response.headers["Cache-Control"] = "no-store"
+        return profile_response
+
+
+class Sampler:
+    """Samples the stack of one thread every interval seconds from a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        """Number of samples of each stack, a tuple of frames from the outermost"""
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.__sample, name="Sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Returns the samples as collapsed stacks, one line per stack"""
+        return "".join(
+            "{stack} {count}\n".format(stack=";".join(stack), count=count)
+            for stack, count in self.stacks.most_common()
+        )
+
+    def __sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    "{function} ({file}:{line})".format(
+                        function=code.co_name,
+                        file=os.path.basename(code.co_filename),
+                        line=code.co_firstlineno,
+                    )
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
@@ -0,0 +1,78 @@
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    A token bucket shared by every outbound request, whose refill rate adapts to the
+    upstream API with additive increase / multiplicative decrease (AIMD).
+
+    Each successful response raises the rate by increase requests per second, up to
+    max_rate. Each 429 halves it (at most once per second, so one burst of 429s counts
+    once), down to min_rate, empties the bucket and, if the response had a Retry-After,
+    holds every request until then.
+    """
+
+    def __init__(self, max_rate, burst, min_rate=1.0, increase=1.0):
+        self.max_rate = float(max_rate)
+        """The highest rate (requests per second) the limiter will allow"""
+        self.min_rate = float(min(min_rate, max_rate))
+        """The lowest rate the limiter will back off to"""
+        self.burst = burst
+        """The number of requests that can be sent at once after an idle period"""
+        self.increase = increase
+        """Requests per second added to the rate after each successful response"""
+        self.throttled = 0
+        """The number of 429 responses reported"""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rate = self.max_rate
+            self._tokens = float(self.burst)
+            self._updated = time.monotonic()
+            self._blocked_until = 0.0
+            self._last_decrease = 0.0
+
+    def reserve(self):
+        """
+        Takes a token for one request, returning the number of seconds the caller must wait
+        before sending it. Tokens can be borrowed ahead of time, so concurrent callers are
+        spaced out at the current rate rather than all waking up at once.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._tokens + (now - self._updated) * self.rate, self.burst
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, 0)
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        """Blocks until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.rate + self.increase, self.max_rate)
+
+    def on_throttled(self, retry_after=None):
+        """Backs off after a 429, honouring its Retry-After delay in seconds if given"""
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self._last_decrease >= 1:
+                self.rate = max(self.rate / 2, self.min_rate)
+                self._last_decrease = now
+            self._tokens = min(self._tokens, 0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def stats(self):
+        with self._lock:
+            return {"rate": self.rate, "throttled": self.throttled}
@@ -1,20 +1,67 @@
 import errors
+import heapq
+import jsonlib
+import metrics
 
-from collections import defaultdict
+from array import array
+from collections import Counter
 from datetime import datetime
 
 
 class TopViewsResponse:
-    def __init__(self, json, start_date, end_date):
+    """
+    The most viewed articles between two dates. The ranking is kept as parallel columns
+    of article names and views, so a cached year-long ranking costs a few dozen bytes per
+    article rather than a dict per article. The hashes in article_views are only built when
+    the response is serialized.
+    """
+
+    __slots__ = ("start_date", "end_date", "names", "views", "missing_dates")
+
+    def __init__(self, json, start_date, end_date, limit=None):
         self.start_date = start_date.strftime("%Y-%m-%d")
         """The start date of the json data from which views are counted"""
         self.end_date = end_date.strftime("%Y-%m-%d")
         """The end date of the json data until which views are counted (inclusive)"""
-        self.article_views = self.parse_json(json)
-        """A list of hashes describing cumulative article views for the most viewed
-        articles between start_date and end_date"""
+        self.names, self.views = rank_articles(total_article_views(json), limit)
+        """A tuple of the most viewed articles between start_date and end_date (only the
+        top limit if one is given) from most to least viewed, and an array('q') of their
+        cumulative views"""
+        self.missing_dates = None
+        """For a partial result, the ISO 8601 dates without data that are not counted"""
 
-    def parse_json(self, response):
+    @classmethod
+    def from_ranking(cls, ranking, start_date, end_date):
+        """
+        Builds a TopViewsResponse from a ranking in the format returned by rank_articles
+        (for example from an aggregation engine, or rank_articles on summed totals)
+        """
+        result = cls.__new__(cls)
+        result.start_date = start_date.strftime("%Y-%m-%d")
+        result.end_date = end_date.strftime("%Y-%m-%d")
+        result.names, result.views = ranking
+        result.missing_dates = None
+        return result
+
+    @property
+    def article_views(self):
+        """
+        A list of hashes describing cumulative article views for the most viewed articles
+        between start_date and end_date, in the format returned by parse_json
+        """
+        return ranked_hashes(self.names, self.views)
+
+    def as_dict(self):
+        result = {
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "article_views": self.article_views,
+        }
+        if self.missing_dates is not None:
+            result["missing_dates"] = self.missing_dates
+        return result
+
+    def parse_json(self, response, limit=None):
         """
         Expects:
         A list of daily json responses from the WikiMedia PageViews most viewed
@@ -41,36 +88,91 @@ class TopViewsResponse:
                 }, ...
         ]
         """
-        article_views = defaultdict(int)
-        try:
-            for daily_result in response:
-                for item in daily_result["items"]:
-                    articles = item["articles"]
-                    for article in articles:
-                        name = article["article"]
-                        if name != "-":
-                            """The WikiMedia API returns a "-" as a special value for 'no page title found'"""
-                            views = article["views"]
-                            article_views[name] += views
-        except Exception as e:
-            raise errors.ParseResponseException(str(e))
+        return ranked_hashes(*rank_articles(total_article_views(response), limit))
 
-        result = []
-        for idx, key in enumerate(
-            sorted(
-                article_views,
-                key=lambda name: (article_views[name], name),
-                reverse=True,
-            )
-        ):
-            result.append(
-                {"rank": idx + 1, "article": key, "views": article_views[key]}
-            )
 
-        return result
+def total_article_views(response):
+    """
+    Expects:
+    A list of daily json responses from the WikiMedia PageViews most viewed articles
+    endpoint (see TopViewsResponse.parse_json)
+
+    Returns:
+    A Counter of article name to cumulative views over all the days
+    """
+    article_views = Counter()
+    for daily_result in response:
+        article_views.update(daily_article_views(daily_result))
+    return article_views
+
+
+def daily_article_views(daily_result):
+    """
+    Expects:
+    One daily json response from the WikiMedia PageViews most viewed articles endpoint
+    (see TopViewsResponse.parse_json)
+
+    Returns:
+    A Counter of article name to views for the day
+    """
+    article_views = Counter()
+    try:
+        for item in daily_result["items"]:
+            articles = item["articles"]
+            for article in articles:
+                name = article["article"]
+                if name != "-":
+                    """The WikiMedia API returns a "-" as a special value for 'no page title found'"""
+                    views = article["views"]
+                    article_views[name] += views
+    except Exception as e:
+        raise errors.ParseResponseException(str(e))
+    return article_views
+
+
+def rank_articles(article_views, limit=None):
+    """
+    Expects:
+    A mapping of article name to cumulative views, and optionally the number of top
+    articles to return
+
+    Returns:
+    A tuple of article names ordered from most to least views (ties broken by reverse
+    article name) and an array('q') of their views in the same order
+    """
+    key = lambda name: (article_views[name], name)
+    if limit is None:
+        ranked = sorted(article_views, key=key, reverse=True)
+    else:
+        # A bounded heap selects the same top articles, in the same order, as a full sort
+        ranked = heapq.nlargest(limit, article_views, key=key)
+    return tuple(ranked), array("q", [article_views[name] for name in ranked])
+
+
+def ranked_hashes(names, views):
+    """
+    Expects:
+    A ranking's columns, in the format returned by rank_articles
+
+    Returns:
+    A list of hashes in ranking order with the format
+    [
+            {
+                    'rank': <ranking based on total views>,
+                    'article': <article name>,
+                    'views': <total cumulative views>
+            }, ...
+    ]
+    """
+    return [
+        {"rank": idx + 1, "article": name, "views": count}
+        for idx, (name, count) in enumerate(zip(names, views))
+    ]
 
 
 class DateWithMostViewsResponse:
+    __slots__ = ("date", "views", "article", "missing_dates")
+
     def __init__(self, json, article):
         result = self.parse_json(json)
         self.date = result["dates"]
@@ -79,6 +181,27 @@ class DateWithMostViewsResponse:
         """The number of page views on the above date(s)"""
         self.article = article
         """The name of the article"""
+        self.missing_dates = None
+        """For a partial result, the ISO 8601 dates without data that are not counted"""
+
+    @classmethod
+    def from_peak(cls, article, dates, views):
+        """
+        Builds a DateWithMostViewsResponse from a peak that has already been found (for
+        example by aggregation.peak_days), given its ISO 8601 date(s) and views
+        """
+        result = cls.__new__(cls)
+        result.date = dates
+        result.views = views
+        result.article = article
+        result.missing_dates = None
+        return result
+
+    def as_dict(self):
+        result = {"date": self.date, "views": self.views, "article": self.article}
+        if self.missing_dates is not None:
+            result["missing_dates"] = self.missing_dates
+        return result
 
     def parse_json(self, response):
         top_ts = []
@@ -103,6 +226,8 @@ class DateWithMostViewsResponse:
 
 
 class ArticleViewsResponse:
+    __slots__ = ("views", "article", "start_date", "end_date")
+
     def __init__(self, json, article, start_date, end_date):
         self.views = self.sum_views(json)
         """The number of views for the article from start_date to end_date"""
@@ -113,8 +238,22 @@ class ArticleViewsResponse:
         self.end_date = end_date.strftime("%Y-%m-%d")
         """The end date of the json data until which views are counted (inclusive)"""
 
+    def as_dict(self):
+        return {
+            "views": self.views,
+            "article": self.article,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+        }
+
     def sum_views(self, response):
         try:
             return sum([item["views"] for item in response["items"]])
         except Exception as e:
             raise errors.ParseResponseException(str(e))
+
+
+def serialize(result):
+    """Returns a response object serialized as a UTF-8 JSON body"""
+    with metrics.stage("serialize"):
+        return jsonlib.dumps(result.as_dict())
@@ -0,0 +1,68 @@
+import threading
+
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls for the same key. The first caller for a key (the
+    leader) does the work, and callers that arrive while it is in flight wait for and
+    share its result (or exception) instead of repeating it.
+
+    Followers receive a concurrent.futures.Future, so asyncio callers can wait on it with
+    asyncio.wrap_future.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        """The number of calls that did the work themselves"""
+        self.coalesced = 0
+        """The number of calls that shared the result of a call already in flight"""
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """
+        Returns:
+        A tuple of the Future for key's call and whether the caller is its leader. A
+        leader must call finish with the outcome, a follower waits on the Future.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.calls += 1
+            return future, True
+
+    def finish(self, key, result=None, exception=None):
+        """Publishes the leader's result or exception to every follower of key"""
+        with self._lock:
+            future = self._in_flight.pop(key)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args):
+        """Calls fn(*args) unless a call for key is in flight, then returns its result"""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.finish(key, exception=e)
+            raise
+        self.finish(key, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+"""
+Warms the upstream response cache and the local pageview store for a range of dates, so
+the first users after a deploy do not pay for cold upstream fetches. Run it from the src
+directory with the same PAGEVIEWS_* settings as the server, for example:
+
+    python3 warm.py --from 2023-01-01 --to 2023-12-31 --top --articles articles.txt
+
+--top fetches the daily top list of every day in the range, and --articles fetches the
+daily views of each article listed in the file (one per line) for every month the range
+touches. Requests go out as fast as the upstream rate limiter (PAGEVIEWS_RATE_LIMIT)
+allows, on the server's shared upstream executor with PAGEVIEWS_POOL_SIZE kept in
+flight: a new unit is submitted as soon as any one finishes. Each finished day or article
+month is appended to a checkpoint file, so an interrupted run picks up where it stopped
+when it is started again with the same checkpoint. Days and months without data upstream, or whose
+pageviews may still change (today and yesterday), are not checkpointed, so they are
+fetched again by the next run.
+
+Only PAGEVIEWS_CACHE_PATH and PAGEVIEWS_STORE_PATH outlive this process, so at least one
+of them should be set.
+"""
+
+import argparse
+import calendar
+import config
+import os
+import pageviews
+import sys
+import time
+import wikipedia_client
+
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from errors import InvalidInputException
+
+DEFAULT_CHECKPOINT = ".warm-checkpoint"
+
+
+class Checkpoint:
+    """
+    The set of finished units of work (top list days and article months), kept in an
+    append-only file with one unit per line so progress is saved as each unit finishes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                content = f.read()
+                # Drop a line cut short by an interruption, so it is not counted as done
+                complete = content.rfind(b"\n") + 1
+                f.truncate(complete)
+            self.done = set(content[:complete].decode("utf-8").splitlines())
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, unit):
+        return unit in self.done
+
+    def mark(self, units):
+        for unit in units:
+            self._file.write(unit + "\n")
+            self.done.add(unit)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Progress:
+    """Reports units done, throughput and an estimate of the time left"""
+
+    def __init__(self, total, interval, out=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.out = out
+        self.done = 0
+        self.missing = 0
+        self.failed = 0
+        self._start = time.monotonic()
+        self._last_report = self._start
+        self._start_requests = wikipedia_client.upstream_calls.stats()["calls"]
+
+    def advance(self, units, missing=0, failed=0):
+        self.done += units
+        self.missing += missing
+        self.failed += failed
+        if time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        now = time.monotonic()
+        self._last_report = now
+        elapsed = max(now - self._start, 1e-9)
+        requests = wikipedia_client.upstream_calls.stats()["calls"] - self._start_requests
+        rate = self.done / elapsed
+        remaining = (self.total - self.done) / rate if rate else float("inf")
+        print(
+            "{done}/{total} ({percent:.1f}%) in {elapsed:.0f}s, {rate:.1f} units/s, "
+            "{request_rate:.1f} upstream requests/s, {missing} without data, "
+            "{failed} failed, about {remaining:.0f}s left".format(
+                done=self.done,
+                total=self.total,
+                percent=100 * self.done / self.total if self.total else 100,
+                elapsed=elapsed,
+                rate=rate,
+                request_rate=requests / elapsed,
+                missing=self.missing,
+                failed=self.failed,
+                remaining=remaining,
+            ),
+            file=self.out,
+        )
+
+
+def warm(start, end, top, articles, checkpoint, progress):
+    """
+    Expects:
+    The first and last dates to warm (datetimes), whether to warm daily top lists, a list
+    of articles whose daily views to warm, a Checkpoint and a Progress
+
+    Returns:
+    The number of units that failed and should be retried with another run
+    """
+    days = __days(start, end)
+    if top:
+        __warm_top_days(days, checkpoint, progress)
+    if articles:
+        __warm_articles(articles, __months(days), checkpoint, progress)
+    progress.report()
+    return progress.failed
+
+
+def top_units(days):
+    return ["top/" + day.strftime("%Y-%m-%d") for day in days]
+
+
+def article_unit(article, year_month):
+    return "article/{month}/{article}".format(month=year_month, article=article)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Warm the pageviews response cache and local store for a date range"
+    )
+    parser.add_argument("--from", dest="start", required=True, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", required=True, help="last day (YYYY-MM-DD)")
+    parser.add_argument("--top", action="store_true", help="warm daily top article lists")
+    parser.add_argument(
+        "--articles", help="file listing articles (one per line) to warm daily views for"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=DEFAULT_CHECKPOINT,
+        help="file recording finished work, to resume from (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5,
+        help="seconds between progress reports (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    if not args.top and not args.articles:
+        parser.error("nothing to warm, pass --top and/or --articles")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        start, end = __parse_date(args.start), __parse_date(args.end)
+    except InvalidInputException as i:
+        print(i, file=sys.stderr)
+        return 2
+    if start > end:
+        print("--from must not be after --to", file=sys.stderr)
+        return 2
+    if not config.CACHE_PATH and not config.STORE_PATH:
+        print(
+            "Warning: neither PAGEVIEWS_CACHE_PATH nor PAGEVIEWS_STORE_PATH is set, "
+            "so nothing will outlive this run",
+            file=sys.stderr,
+        )
+    articles = __read_articles(args.articles) if args.articles else []
+
+    days = __days(start, end)
+    total = (len(days) if args.top else 0) + len(articles) * len(__months(days))
+    checkpoint = Checkpoint(args.checkpoint)
+    progress = Progress(total, args.report_interval)
+    try:
+        failed = warm(start, end, args.top, articles, checkpoint, progress)
+    except KeyboardInterrupt:
+        progress.report()
+        print("Interrupted, run again to resume", file=sys.stderr)
+        return 130
+    finally:
+        checkpoint.close()
+    return 1 if failed else 0
+
+
+def __warm_top_days(days, checkpoint, progress):
+    todo = [
+        (unit, pageviews.prefetch_top_day, (day,), day)
+        for day, unit in zip(days, top_units(days))
+        if unit not in checkpoint
+    ]
+    progress.advance(len(days) - len(todo))
+    __warm_units(todo, checkpoint, progress)
+
+
+def __warm_articles(articles, months, checkpoint, progress):
+    todo = [
+        (unit, pageviews.prefetch_article_month, (article, month), __month_end(month))
+        for article in articles
+        for month in months
+        for unit in [article_unit(article, month)]
+        if unit not in checkpoint
+    ]
+    progress.advance(len(articles) * len(months) - len(todo))
+    __warm_units(todo, checkpoint, progress)
+
+
+def __warm_units(units, checkpoint, progress):
+    """
+    Runs each unit, a (unit name, prefetch function, arguments, last day) tuple, on the
+    upstream executor, keeping POOL_SIZE of them in flight until all are done. A unit
+    whose prefetch finds data is checkpointed as soon as it finishes if its last day is
+    final.
+    """
+    units = iter(units)
+    in_flight = {}
+    try:
+        while True:
+            for unit, fn, args, last_day in units:
+                future = wikipedia_client.upstream_executor.submit(fn, *args)
+                in_flight[future] = (unit, last_day)
+                if len(in_flight) >= config.POOL_SIZE:
+                    break
+            if not in_flight:
+                return
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                unit, last_day = in_flight.pop(future)
+                try:
+                    found = future.result()
+                except Exception as e:
+                    print(
+                        "Failed to warm {unit}: {e}".format(unit=unit, e=e), file=sys.stderr
+                    )
+                    progress.advance(1, failed=1)
+                    continue
+                if found and __is_final(last_day):
+                    checkpoint.mark([unit])
+                progress.advance(1, missing=0 if found else 1)
+    except BaseException:
+        for future in in_flight:
+            future.cancel()
+        raise
+
+
+def __days(start, end):
+    return [start + timedelta(days=x) for x in range((end - start).days + 1)]
+
+
+def __months(days):
+    months = []
+    for day in days:
+        month = day.strftime("%Y-%m")
+        if not months or months[-1] != month:
+            months.append(month)
+    return months
+
+
+def __month_end(year_month):
+    month = datetime.strptime(year_month, "%Y-%m")
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def __is_final(day):
+    """Whether pageviews for the day can no longer change upstream"""
+    return wikipedia_client.cache_ttl([day.strftime("%Y%m%d")]) is None
+
+
+def __read_articles(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def __parse_date(year_month_day):
+    try:
+        return datetime.strptime(year_month_day, "%Y-%m-%d")
+    except ValueError:
+        raise InvalidInputException(
+            "Year, month, and day must be in valid ISO 8601 format (yyyy-mm-dd)."
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
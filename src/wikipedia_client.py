@@ -1,18 +1,32 @@
 #!/usr/bin/env python3
 
+import config
 import datetime
 import json
+import jsonlib
+import metrics
 import requests
-from errors import ZeroOrNotLoadedDataException, ThrottlingException
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
+import time
+from requests.adapters import HTTPAdapter
+from errors import (
+    ZeroOrNotLoadedDataException,
+    ThrottlingException,
+    ParseResponseException,
+)
+from concurrent.futures import as_completed
+from cache import SQLiteStore, TieredCache
+from datetime import datetime, timedelta
 from dateutil.parser import parse
+from email.utils import parsedate_to_datetime
+from executor import FairExecutor
+from ratelimit import AdaptiveRateLimiter
+from singleflight import SingleFlight
 
 CLIENT_URL = "https://github.com/claratian/pageviews"
 USER_AGENT = "Python Wikipedia PageView client <{url}>"
 HEADERS = {"User-Agent": USER_AGENT.format(url=CLIENT_URL)}
 
-BASE_URL = "https://wikimedia.org/api/rest_v1/metrics/pageviews"
+BASE_URL = config.BASE_URL
 PROJECT = "en.wikipedia"
 
 TOP_ARTICLES = "top"
@@ -23,29 +37,146 @@ PER_ARTICLE_PARAMS = (
     "{project}/all-access/all-agents/{article}/{granularity}/{start}/{end}"
 )
 
+DAILY = "daily"
+
+
+def __new_session(pool_size):
+    """
+    Creates a requests Session whose connection pool holds up to pool_size keep-alive
+    connections per host, so concurrent fetches reuse TCP/TLS connections to Wikimedia
+    rather than opening a new one for every URL
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = __new_session(config.POOL_SIZE)
+"""Module-level session shared by every request handled in this process"""
+
+upstream_executor = FairExecutor(config.POOL_SIZE, metrics.executor_queue_wait.observe)
+"""Worker pool shared by every request, capping upstream concurrency at POOL_SIZE"""
+
+response_cache = TieredCache(
+    config.CACHE_MAX_BYTES,
+    SQLiteStore(config.CACHE_PATH) if config.CACHE_PATH else None,
+)
+"""Raw upstream responses keyed by URL, shared by the blocking and asyncio clients"""
+
+rate_limiter = AdaptiveRateLimiter(config.RATE_LIMIT, config.POOL_SIZE)
+"""Token bucket shared by every upstream request from the blocking and asyncio clients"""
+
+upstream_calls = SingleFlight()
+"""Upstream requests in flight keyed by URL, shared by the blocking and asyncio clients"""
+
+
+def __response_cache_lookups():
+    stats = response_cache.stats()
+    return {
+        ("upstream", "memory_hit"): stats["memory_hits"],
+        ("upstream", "disk_hit"): stats["disk_hits"],
+        ("upstream", "miss"): stats["misses"],
+    }
+
+
+def __executor_tasks():
+    stats = upstream_executor.stats()
+    return {("queued",): stats["queued"], ("running",): stats["running"]}
 
-def top_articles(dates):
-    params_list = [TOP_PARAMS.format(project=PROJECT, date=date) for date in dates]
-    urls = [__url(TOP_ARTICLES, params) for params in params_list]
-    return __get_pageviews_concurrent(urls, dates)
+
+metrics.cache_lookups.add(__response_cache_lookups)
+metrics.executor_tasks.add(__executor_tasks)
+metrics.upstream_coalesced.add(lambda: {(): upstream_calls.stats()["coalesced"]})
+
+
+def top_articles(dates, parse=None, partial=False):
+    """
+    Fetches the top articles for each date. If parse is given, each response body is passed
+    to it as soon as it arrives and its result is returned in place of the json, so only
+    what parse keeps (rather than every full payload) is held until all dates are fetched.
+    If partial is true, dates without data are returned as None instead of raising a
+    ZeroOrNotLoadedDataException for them.
+    """
+    urls = [top_articles_url(date) for date in dates]
+    with metrics.stage("fetch"):
+        return __get_pageviews_concurrent(urls, dates, parse, partial)
+
+
+def top_articles_day(date, parse=None):
+    """
+    Fetches the top articles for one date in the calling thread rather than the upstream
+    executor, so it can itself run as a task in the executor. parse is as in top_articles.
+    """
+    with metrics.stage("fetch"):
+        return __get_pageviews(top_articles_url(date), [date], parse)
+
+
+def top_articles_as_completed(dates, parse=None):
+    """
+    The same as top_articles, but a generator of (date, result) tuples in the order the
+    dates finish fetching, so callers can use each day as soon as it arrives. Dates
+    without data are yielded with a None result. Closing the generator early cancels the
+    fetches that have not started.
+    """
+    urls = [top_articles_url(date) for date in dates]
+    futures = upstream_executor.submit_batch(
+        __get_pageviews, [(url, [date], parse) for url, date in zip(urls, dates)]
+    )
+    positions = {future: idx for idx, future in enumerate(futures)}
+    completed = as_completed(futures)
+    try:
+        while True:
+            # Only the wait for the next date counts as fetching, not the caller's use of
+            # the dates already yielded
+            with metrics.stage("fetch"):
+                future = next(completed, None)
+            if future is None:
+                return
+            date = dates[positions[future]]
+            try:
+                yield date, future.result()
+            except ZeroOrNotLoadedDataException:
+                yield date, None
+    finally:
+        for future in futures:
+            future.cancel()
 
 
 def views_per_article_by_day(article, dates, granularity):
-    params_list = [
-        PER_ARTICLE_PARAMS.format(
-            project=PROJECT,
-            article=article,
-            start=date,
-            end=date,
-            granularity=granularity,
-        )
-        for date in dates
-    ]
-    urls = [__url(PER_ARTICLE, params) for params in params_list]
-    return __get_pageviews_concurrent(urls, dates)
+    urls = [per_article_url(article, date, date, granularity) for date in dates]
+    with metrics.stage("fetch"):
+        return __get_pageviews_concurrent(urls, dates)
+
+
+def daily_views_per_article(article, dates, partial=False):
+    """
+    Fetches the daily views of an article for a contiguous, ordered list of dates
+    (formatted YYYYMMDD) with a single ranged request rather than one request per day.
+    Dates missing from the returned items are reported individually so callers get the
+    same per-day ZeroOrNotLoadedDataException as views_per_article_by_day, unless partial
+    is true (see missing_daily_dates).
+    """
+    url = per_article_url(article, dates[0], dates[-1], DAILY)
+    with metrics.stage("fetch"):
+        response_json = __get_pageviews(url, dates)
+    if not partial:
+        check_daily_dates(response_json, dates)
+    return [response_json]
 
 
 def views_per_article(article, start_date, end_date, granularity):
+    url = per_article_url(article, start_date, end_date, granularity)
+    with metrics.stage("fetch"):
+        return __get_pageviews(url, range_error_dates(start_date, end_date))
+
+
+def top_articles_url(date):
+    return __url(TOP_ARTICLES, TOP_PARAMS.format(project=PROJECT, date=date))
+
+
+def per_article_url(article, start_date, end_date, granularity):
     params = PER_ARTICLE_PARAMS.format(
         project=PROJECT,
         article=article,
@@ -53,43 +184,154 @@ def views_per_article(article, start_date, end_date, granularity):
         end=end_date,
         granularity=granularity,
     )
-    url = __url(PER_ARTICLE, params)
+    return __url(PER_ARTICLE, params)
+
+
+def range_error_dates(start_date, end_date):
+    """The dates reported as missing when a per-article range request returns 404"""
     start_date_formatted = datetime.strptime(start_date, "%Y%m%d").strftime("%Y/%m/%d")
     end_date_formatted = datetime.strptime(end_date, "%Y%m%d").strftime("%Y/%m/%d")
-    return __get_pageviews(url, [start_date_formatted, end_date_formatted])
+    return [start_date_formatted, end_date_formatted]
+
+
+def cache_ttl(dates):
+    """
+    Returns how long a successful response covering the given dates (formatted YYYYMMDD
+    or YYYY/MM/DD) may be cached. Pageviews for days before yesterday (UTC) are final and
+    are cached until evicted, while today and yesterday may still be updated upstream.
+    """
+    latest = max(datetime.strptime(date.replace("/", ""), "%Y%m%d") for date in dates)
+    if latest.date() < datetime.utcnow().date() - timedelta(days=1):
+        return None
+    return config.CACHE_RECENT_TTL
+
 
+def retry_after(header):
+    """Returns the seconds to wait from a Retry-After header value, or None"""
+    if not isinstance(header, str):
+        return None
+    try:
+        return max(float(header), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0)
 
-def __get_pageviews_concurrent(urls, dates):
-    results = []
+
+def record_upstream(url, status, seconds):
+    """Records the latency and status code of an upstream request, if metrics are enabled"""
+    if not metrics.enabled:
+        return
+    endpoint = PER_ARTICLE if "/" + PER_ARTICLE + "/" in url else TOP_ARTICLES
+    metrics.upstream_seconds.observe(seconds, endpoint)
+    metrics.upstream_responses.inc(endpoint, str(status))
+
+
+def unexpected_status(url, status):
+    """The error for an upstream response that is not an error but has no pageviews"""
+    return ParseResponseException(
+        "status {status} from {url}".format(status=status, url=url)
+    )
+
+
+def load_cached_response(cached, dates, parse=None):
+    """
+    Returns the json of a cached (status, body) response, or the result of parse(body) if
+    given, or raises its 404 error
+    """
+    status, body = cached
+    if status == 404:
+        raise ZeroOrNotLoadedDataException(dates)
+    if parse is not None:
+        return parse(body)
+    return jsonlib.loads(body)
+
+
+def check_daily_dates(response_json, dates):
+    """
+    Raises ZeroOrNotLoadedDataException listing each of the dates (formatted YYYYMMDD)
+    that has no item in a daily per-article response
+    """
+    missing_data_dates = missing_daily_dates(response_json, dates)
+    if len(missing_data_dates):
+        raise ZeroOrNotLoadedDataException(missing_data_dates)
+
+
+def missing_daily_dates(response_json, dates):
+    """Returns the dates (formatted YYYYMMDD) with no item in a daily per-article response"""
+    try:
+        returned_dates = set(item["timestamp"][:-2] for item in response_json["items"])
+    except Exception as e:
+        raise ParseResponseException(str(e))
+    return [date for date in dates if date not in returned_dates]
+
+
+def __get_pageviews_concurrent(urls, dates, parse=None, partial=False):
+    """
+    Fetches each url concurrently, returning their json in the same order as urls. If
+    partial is true, urls without data are returned as None rather than raising.
+    """
+    results = [None] * len(urls)
     missing_data_dates = []
-    url_dates = zip(urls, dates)
-    with ThreadPoolExecutor() as executor:
-        future_results = [
-            executor.submit(__get_pageviews, url, [date]) for url, date in url_dates
-        ]
+    future_results = upstream_executor.submit_batch(
+        __get_pageviews, [(url, [date], parse) for url, date in zip(urls, dates)]
+    )
+    positions = {future: idx for idx, future in enumerate(future_results)}
+    try:
         for future in as_completed(future_results):
             try:
-                results.append(future.result())
-            except ThrottlingException as t:
-                raise t
+                results[positions[future]] = future.result()
             except ZeroOrNotLoadedDataException as z:
                 missing_data_dates += z.dates
-    if len(missing_data_dates):
+    except BaseException:
+        # Don't leave the rest of this request queued in the shared executor
+        for future in future_results:
+            future.cancel()
+        raise
+    if len(missing_data_dates) and not partial:
         raise ZeroOrNotLoadedDataException(missing_data_dates)
     return results
 
 
-def __get_pageviews(url, dates):
-    response = requests.get(url, headers=HEADERS)
+def __get_pageviews(url, dates, parse=None):
+    response = response_cache.get(url)
+    if response is None:
+        # Concurrent requests for the same url share a single upstream call
+        response = upstream_calls.do(url, __fetch, url, dates)
+    return load_cached_response(response, dates, parse)
+
+
+def __fetch(url, dates):
+    """
+    Requests url from the upstream API, returning (status, body) for a 200 or 404 response
+    and storing it in the response cache. Requests wait for the shared rate limiter and a
+    throttled (429) request is retried up to THROTTLE_RETRIES times before giving up. Any
+    other status raises, as an HTTPError or a ParseResponseException.
+    """
+    for _ in range(config.THROTTLE_RETRIES + 1):
+        rate_limiter.acquire()
+        start = time.perf_counter()
+        response = session.get(url, headers=HEADERS)
+        record_upstream(url, response.status_code, time.perf_counter() - start)
+        if response.status_code != 429:
+            break
+        rate_limiter.on_throttled(retry_after(response.headers.get("Retry-After")))
 
     if response.status_code == 200:
-        return response.json()
+        rate_limiter.on_success()
+        response_cache.put(url, 200, response.content, cache_ttl(dates))
+        return 200, response.content
     elif response.status_code == 404:
-        raise ZeroOrNotLoadedDataException(dates)
+        rate_limiter.on_success()
+        response_cache.put(url, 404, b"", config.CACHE_NOT_FOUND_TTL)
+        return 404, b""
     elif response.status_code == 429:
-        raise ThrottlingException
-    else:
-        response.raise_for_status()
+        raise ThrottlingException(retry_after(response.headers.get("Retry-After")))
+    response.raise_for_status()
+    raise unexpected_status(url, response.status_code)
 
 
 def __url(endpoint, params):
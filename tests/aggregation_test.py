@@ -0,0 +1,174 @@
+from context import aggregation
+
+import json
+import random
+import unittest
+from aggregation import WindowAggregator, DictEngine, NumpyEngine
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from mock import patch
+
+
+def days_from(start, length):
+    return [start + timedelta(days=x) for x in range(length)]
+
+
+def views_for(day):
+    """A distinct Counter for each day, with one article only viewed on that day"""
+    return Counter({"foo": day.day, "bar": 2 * day.day, str(day): 1})
+
+
+def expected_totals(days):
+    totals = Counter()
+    for day in days:
+        totals.update(views_for(day))
+    return totals
+
+
+class WindowAggregatorTest(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = WindowAggregator(60, 4)
+        for day in days_from(date(2023, 7, 1), 31):
+            self.aggregator.add_day(day, views_for(day))
+
+    def test_sliding_window(self):
+        first = days_from(date(2023, 7, 1), 7)
+        second = days_from(date(2023, 7, 2), 7)
+
+        self.assertEqual(self.aggregator.totals(first), expected_totals(first))
+        self.assertEqual(self.aggregator.days_summed, 7)
+
+        totals = self.aggregator.totals(second)
+        self.assertEqual(totals, expected_totals(second))
+        self.assertNotIn(str(date(2023, 7, 1)), totals)
+        # One day added and one day subtracted
+        self.assertEqual(self.aggregator.days_summed, 9)
+
+    def test_windows_of_different_lengths(self):
+        week = days_from(date(2023, 7, 10), 7)
+        fortnight = days_from(date(2023, 7, 8), 14)
+        self.aggregator.totals(week)
+        self.assertEqual(self.aggregator.totals(fortnight), expected_totals(fortnight))
+        self.assertEqual(self.aggregator.days_summed, 14)
+
+    def test_disjoint_windows_summed_from_days(self):
+        self.aggregator.totals(days_from(date(2023, 7, 1), 7))
+        later = days_from(date(2023, 7, 20), 7)
+        self.assertEqual(self.aggregator.totals(later), expected_totals(later))
+        self.assertEqual(self.aggregator.days_summed, 14)
+
+    def test_missing_and_fetched_days(self):
+        aggregator = WindowAggregator(2, 4)
+        days = days_from(date(2023, 7, 1), 3)
+        self.assertEqual(aggregator.missing_days(days), days)
+
+        fetched = {day: views_for(day) for day in days}
+        for day in days:
+            aggregator.add_day(day, fetched[day])
+        # Only two days fit in the store, but all three were just fetched
+        self.assertEqual(aggregator.missing_days(days), [days[0]])
+        self.assertEqual(aggregator.totals(days, fetched), expected_totals(days))
+        self.assertRaises(KeyError, lambda: aggregator.totals(days))
+
+    def test_windows_with_unstored_days_not_kept(self):
+        week = days_from(date(2023, 8, 1), 7)
+        recent = {day: views_for(day) for day in week[-2:]}
+        for day in week[:-2]:
+            self.aggregator.add_day(day, views_for(day))
+        self.assertEqual(self.aggregator.totals(week, recent), expected_totals(week))
+
+        # The days passed in may have changed since, so the window is derived again
+        recent[week[-1]] = Counter({"foo": 100})
+        totals = self.aggregator.totals(week, recent)
+        self.assertEqual(totals["foo"], sum(day.day for day in week[:-1]) + 100)
+
+
+def random_daily_results(days, vocabulary):
+    rand = random.Random(7)
+    results = []
+    for _ in range(days):
+        names = rand.sample(vocabulary, len(vocabulary) // 2)
+        articles = [{"article": name, "views": rand.randint(1, 20)} for name in names]
+        articles.append({"article": "-", "views": 100})
+        results.append({"items": [{"articles": articles}]})
+    return results
+
+
+@unittest.skipIf(aggregation.np is None, "numpy is not installed")
+class NumpyEngineTest(unittest.TestCase):
+    def test_matches_dict_engine(self):
+        vocabulary = ["article_{n}".format(n=n) for n in range(200)]
+        daily_results = random_daily_results(10, vocabulary)
+        dict_engine, numpy_engine = DictEngine(), NumpyEngine()
+
+        dict_days = [dict_engine.daily_views(day) for day in daily_results]
+        numpy_days = [numpy_engine.daily_views(day) for day in daily_results]
+        dict_totals = dict_engine.sum(dict_days)
+        numpy_totals = numpy_engine.sum(numpy_days)
+
+        # Small integer views produce many ties, which must be broken by name
+        for limit in [None, 1, 5, 37, 200, 500]:
+            self.assertEqual(
+                numpy_engine.rank(numpy_totals, limit),
+                dict_engine.rank(dict_totals, limit),
+            )
+
+    def test_window_derivation(self):
+        vocabulary = ["article_{n}".format(n=n) for n in range(50)]
+        daily_results = random_daily_results(10, vocabulary)
+        days = days_from(date(2023, 7, 1), 10)
+        engines = [DictEngine(), NumpyEngine()]
+        aggregators = [WindowAggregator(10, 4, engine) for engine in engines]
+        for aggregator in aggregators:
+            for day, daily_result in zip(days, daily_results):
+                aggregator.add_day(day, aggregator.engine.daily_views(daily_result))
+
+        for start in range(4):
+            window = days[start : start + 7]
+            dict_rank, numpy_rank = [
+                aggregator.engine.rank(aggregator.totals(window))
+                for aggregator in aggregators
+            ]
+            self.assertEqual(numpy_rank, dict_rank)
+        self.assertEqual(aggregators[1].days_summed, 13)
+
+    def test_engine_by_name(self):
+        self.assertIsInstance(aggregation.engine("numpy"), aggregation.NumpyEngine)
+        self.assertIsInstance(aggregation.engine("dict"), aggregation.DictEngine)
+        self.assertRaises(ValueError, lambda: aggregation.engine("pandas"))
+
+
+class PeakDaysTest(unittest.TestCase):
+    def test_peak_days(self):
+        series = [[1, 5, 3, 5], [2, 2, 2, 2], [0, 0, 9, 1]]
+        expected = [(5, [1, 3]), (2, [0, 1, 2, 3]), (9, [2])]
+        self.assertEqual(aggregation.peak_days(series), expected)
+        with patch.object(aggregation, "np", None):
+            self.assertEqual(aggregation.peak_days(series), expected)
+        self.assertEqual(aggregation.peak_days([]), [])
+
+
+class ParallelAggregationTest(unittest.TestCase):
+    def test_count_views(self):
+        body = json.dumps(
+            {"items": [{"articles": [{"article": "foo", "views": 3}, {"article": "-", "views": 9}]}]}
+        ).encode()
+        self.assertEqual(aggregation.count_views([body, body]), Counter({"foo": 6}))
+
+    def test_tree_reduce(self):
+        days = days_from(date(2023, 7, 1), 7)
+        self.assertEqual(
+            aggregation.tree_reduce(None, [views_for(day) for day in days]),
+            expected_totals(days),
+        )
+        self.assertEqual(aggregation.tree_reduce(None, []), Counter())
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(
+                aggregation.tree_reduce(executor, [views_for(day) for day in days]),
+                expected_totals(days),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
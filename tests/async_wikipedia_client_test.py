@@ -0,0 +1,135 @@
+from context import async_wikipedia_client
+
+import unittest
+import wikipedia_client
+from errors import (
+    ZeroOrNotLoadedDataException,
+    ThrottlingException,
+    ParseResponseException,
+)
+from mock import patch
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:
+    web = None
+
+
+def stub_app(requested_paths):
+    """
+    A stub of the PageViews API that returns 404 for 2003, 429 for 1999 and 204 for 1998
+    dates
+    """
+
+    async def handler(request):
+        path = request.match_info["path"]
+        requested_paths.append(path)
+        if "2003" in path:
+            return web.json_response({}, status=404)
+        if "1999" in path:
+            return web.json_response({}, status=429)
+        if "1998" in path:
+            return web.Response(status=204)
+        if path.startswith("per-article"):
+            start, end = path.split("/")[-2:]
+            days = range(int(start[-2:]), int(end[-2:]) + 1)
+            items = [
+                {"timestamp": start[:6] + "{:02d}00".format(day), "views": day}
+                for day in days
+                if day != 2
+            ]
+            return web.json_response({"items": items})
+        return web.json_response({"items": [{"articles": [], "path": path}]})
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", handler)
+    return app
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class AsyncWikipediaClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        wikipedia_client.response_cache.clear()
+        wikipedia_client.rate_limiter.reset()
+        self.requested_paths = []
+        self.server = TestServer(stub_app(self.requested_paths))
+        await self.server.start_server()
+        base_url = str(self.server.make_url("")).rstrip("/")
+        self.base_url_patch = patch("wikipedia_client.BASE_URL", base_url)
+        self.base_url_patch.start()
+
+    async def asyncTearDown(self):
+        self.base_url_patch.stop()
+        await self.server.close()
+
+    async def test_top_articles(self):
+        dates = ["2023/07/01", "2023/07/02", "2023/07/03"]
+        result = await async_wikipedia_client.top_articles(dates)
+
+        self.assertEqual(
+            sorted(self.requested_paths),
+            ["top/en.wikipedia/all-access/" + date for date in dates],
+        )
+        self.assertEqual(len(result), 3)
+
+    async def test_views_per_article(self):
+        result = await async_wikipedia_client.views_per_article(
+            "foo", "20230701", "20230703", "daily"
+        )
+        self.assertEqual(
+            self.requested_paths,
+            [
+                "per-article/en.wikipedia/all-access/all-agents/foo/daily/20230701/20230703"
+            ],
+        )
+        self.assertEqual([item["views"] for item in result["items"]], [1, 3])
+
+    async def test_daily_views_per_article_missing_dates(self):
+        with self.assertRaises(ZeroOrNotLoadedDataException) as context:
+            await async_wikipedia_client.daily_views_per_article(
+                "foo", ["20230701", "20230702", "20230703"]
+            )
+        self.assertEqual(context.exception.dates, ["20230702"])
+        self.assertEqual(len(self.requested_paths), 1)
+
+    async def test_zero_data_exception(self):
+        with self.assertRaises(ZeroOrNotLoadedDataException) as context:
+            await async_wikipedia_client.top_articles(
+                ["2003/07/01", "2003/07/02", "2023/07/03"]
+            )
+        self.assertEqual(sorted(context.exception.dates), ["2003/07/01", "2003/07/02"])
+
+        with self.assertRaises(ZeroOrNotLoadedDataException) as context:
+            await async_wikipedia_client.views_per_article(
+                "foo", "20030701", "20030731", "monthly"
+            )
+        self.assertEqual(context.exception.dates, ["2003/07/01", "2003/07/31"])
+
+    async def test_throttling_exception(self):
+        with self.assertRaises(ThrottlingException):
+            await async_wikipedia_client.top_articles(["1999/07/01", "2023/07/02"])
+        retries = wikipedia_client.config.THROTTLE_RETRIES
+        self.assertEqual(len(self.requested_paths), retries + 2)
+
+    async def test_unexpected_status(self):
+        with self.assertRaises(ParseResponseException):
+            await async_wikipedia_client.top_articles(["1998/07/01"])
+
+    async def test_shared_session(self):
+        async with async_wikipedia_client.new_session() as session:
+            await async_wikipedia_client.top_articles(["2023/07/01"], session=session)
+            await async_wikipedia_client.views_per_article_by_day(
+                "foo", ["20230701"], "daily", session=session
+            )
+        self.assertEqual(len(self.requested_paths), 2)
+
+    async def test_responses_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ZeroOrNotLoadedDataException):
+                await async_wikipedia_client.top_articles(["2023/07/01", "2003/07/01"])
+        self.assertEqual(len(self.requested_paths), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
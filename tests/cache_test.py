@@ -0,0 +1,84 @@
+from context import cache
+
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from cache import LRUCache, SQLiteStore, TieredCache, ENTRY_OVERHEAD
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(3 * (10 + ENTRY_OVERHEAD))
+        lru.put("a", 1, 10)
+        lru.put("b", 2, 10)
+        lru.put("c", 3, 10)
+        self.assertEqual(lru.get("a"), 1)
+        lru.put("d", 4, 10)
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), 1)
+        self.assertEqual(lru.get("d"), 4)
+        self.assertEqual(lru.evictions, 1)
+        self.assertEqual(lru.bytes, 3 * (10 + ENTRY_OVERHEAD))
+
+    def test_oversized_values_not_stored(self):
+        lru = LRUCache(50)
+        lru.put("a", 1, 100)
+        self.assertIsNone(lru.get("a"))
+        self.assertEqual(lru.bytes, 0)
+
+    def test_expiry(self):
+        lru = LRUCache(1000)
+        lru.put("a", 1, 10, ttl=0)
+        lru.put("b", 2, 10, ttl=60)
+        self.assertIsNone(lru.get("a"))
+        self.assertEqual(lru.get("b"), 2)
+        self.assertEqual(lru.hits, 1)
+        self.assertEqual(lru.misses, 1)
+
+
+class TieredCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_disk_tier_survives_restart(self):
+        store = SQLiteStore(self.path)
+        TieredCache(1000, store).put("url", 200, b"body")
+        store.close()
+
+        restarted = TieredCache(1000, SQLiteStore(self.path))
+        self.assertEqual(restarted.get("url"), (200, b"body"))
+        self.assertEqual(restarted.get("url"), (200, b"body"))
+        stats = restarted.stats()
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["misses"], 0)
+
+    def test_disk_entries_expire(self):
+        tiered = TieredCache(1000, SQLiteStore(self.path))
+        tiered.put("url", 404, b"", ttl=0)
+        tiered.memory.clear()
+        self.assertIsNone(tiered.get("url"))
+        self.assertEqual(tiered.stats()["misses"], 1)
+
+    def test_memory_only(self):
+        tiered = TieredCache(1000)
+        self.assertIsNone(tiered.get("url"))
+        tiered.put("url", 200, b"body")
+        self.assertEqual(tiered.get("url"), (200, b"body"))
+
+    def test_concurrent_misses_counted(self):
+        tiered = TieredCache(1000)
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(tiered.get, ["url-{n}".format(n=n) for n in range(4000)]))
+        self.assertEqual(tiered.stats()["misses"], 4000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+from context import columnar
+
+import tempfile
+import unittest
+from aggregation import DictEngine, NumpyEngine
+from array import array
+from collections import Counter
+from columnar import ColumnarStore
+from datetime import date
+
+
+class ColumnarStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ColumnarStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_top_day_round_trip(self):
+        day = date(2023, 7, 1)
+        self.assertIsNone(self.store.top_day(day))
+
+        self.store.put_top_day(day, ["Main_Page", "Café", "bar"], [100, 20, 3])
+        names, views = self.store.top_day(day)
+
+        self.assertEqual(names, ["Main_Page", "Café", "bar"])
+        self.assertEqual(list(views), [100, 20, 3])
+        # The views are read in place from the mapped file
+        self.assertIsInstance(views, memoryview)
+
+        # A store opened on the same directory (as in another worker) sees the same day
+        names, views = ColumnarStore(self.directory.name).top_day(day)
+        self.assertEqual(names, ["Main_Page", "Café", "bar"])
+
+    def test_empty_top_day(self):
+        day = date(2023, 7, 1)
+        self.store.put_top_day(day, [], [])
+        names, views = self.store.top_day(day)
+        self.assertEqual((names, list(views)), ([], []))
+
+    def test_article_days_merged(self):
+        self.store.put_article_days("foo", {date(2023, 7, 2): 20, date(2023, 7, 1): 10})
+        self.store.put_article_days("foo", {date(2023, 7, 3): 30})
+
+        self.assertEqual(
+            self.store.article_days("foo", [date(2023, 7, 1), date(2023, 7, 3)]),
+            [10, 30],
+        )
+        self.assertIsNone(self.store.article_days("foo", [date(2023, 7, 4)]))
+        self.assertIsNone(self.store.article_days("bar", [date(2023, 7, 1)]))
+
+    def test_engines_read_stored_days(self):
+        day = date(2023, 7, 1)
+        self.store.put_top_day(day, *DictEngine().articles(Counter(foo=4, bar=2)))
+
+        stored = self.store.top_day(day)
+        self.assertEqual(DictEngine().from_articles(*stored), Counter(foo=4, bar=2))
+        engine = NumpyEngine()
+        self.assertEqual(
+            engine.rank(engine.sum([engine.from_articles(*stored)])),
+            (("foo", "bar"), array("q", [4, 2])),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
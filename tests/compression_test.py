@@ -0,0 +1,52 @@
+from context import compression
+
+import gzip
+import unittest
+from mock import patch
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+BODY = b'{"article_views": []}' * 100
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+class CompressionTest(unittest.TestCase):
+    def setUp(self):
+        compression.compressed_cache.clear()
+
+    def test_negotiate(self):
+        self.assertEqual(compression.negotiate(accept("gzip, deflate, br"), 2000), "br")
+        self.assertEqual(compression.negotiate(accept("gzip;q=1.0, br;q=0.5"), 2000), "gzip")
+        self.assertEqual(compression.negotiate(accept("gzip"), 2000), "gzip")
+        self.assertIsNone(compression.negotiate(accept("identity"), 2000))
+        self.assertIsNone(compression.negotiate(accept(""), 2000))
+        # Small bodies are not worth compressing
+        self.assertIsNone(compression.negotiate(accept("gzip, br"), 100))
+        with patch.object(compression, "brotli", None):
+            self.assertEqual(compression.negotiate(accept("br, gzip"), 2000), "gzip")
+
+    def test_compress_gzip(self):
+        compressed = compression.compress(BODY, "gzip", "etag")
+        self.assertEqual(gzip.decompress(compressed), BODY)
+        self.assertLess(len(compressed), len(BODY))
+        # Deterministic output, so the representation's ETag stays valid
+        compression.compressed_cache.clear()
+        self.assertEqual(compression.compress(BODY, "gzip", "etag"), compressed)
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_compress_brotli(self):
+        compressed = compression.compress(BODY, "br", "etag")
+        self.assertEqual(compression.brotli.decompress(compressed), BODY)
+
+    def test_compressed_bodies_cached(self):
+        compressed = compression.compress(BODY, "gzip", "etag")
+        with patch("gzip.compress") as mock_compress:
+            self.assertIs(compression.compress(BODY, "gzip", "etag"), compressed)
+            mock_compress.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,5 +7,19 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from src import pageviews
 from src import wikipedia_client
+from src import async_wikipedia_client
 from src import response
 from src import errors
+from src import executor
+from src import cache
+from src import aggregation
+from src import singleflight
+from src import ratelimit
+from src import jsonlib
+from src import columnar
+from src import warm
+from src import httpcache
+from src import compression
+from src import metrics
+from src import profiler
+from src import main
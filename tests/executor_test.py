@@ -0,0 +1,83 @@
+from context import executor
+
+import threading
+import time
+import unittest
+from concurrent.futures import as_completed
+from executor import FairExecutor
+
+
+class FairExecutorTest(unittest.TestCase):
+    def test_submit_batch(self):
+        pool = FairExecutor(4)
+        futures = pool.submit_batch(lambda x, y: x * y, [(1, 2), (3, 4), (5, 6)])
+        self.assertEqual([f.result() for f in futures], [2, 12, 30])
+        pool.shutdown()
+
+    def test_exceptions_set_on_future(self):
+        pool = FairExecutor(2)
+
+        def fail():
+            raise ValueError("foo")
+
+        future = pool.submit(fail)
+        self.assertRaises(ValueError, future.result)
+        pool.shutdown()
+
+    def test_observe_queue_wait(self):
+        waits = []
+        pool = FairExecutor(1, waits.append)
+        futures = pool.submit_batch(time.sleep, [(0.05,), (0,)])
+        [f.result() for f in futures]
+        pool.shutdown()
+        self.assertEqual(len(waits), 2)
+        self.assertGreaterEqual(waits[1], 0.05)
+
+    def test_concurrency_is_bounded(self):
+        pool = FairExecutor(3)
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def task():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        futures = []
+        for _ in range(5):
+            futures += pool.submit_batch(task, [()] * 6)
+        for future in as_completed(futures):
+            future.result()
+        self.assertEqual(peak[0], 3)
+        self.assertEqual(pool.stats()["completed"], 30)
+        pool.shutdown()
+
+    def test_batches_take_turns(self):
+        pool = FairExecutor(1)
+        order = []
+        release = threading.Event()
+        blocker = pool.submit(release.wait)
+        while pool.stats()["running"] == 0:
+            time.sleep(0.001)
+
+        # Both batches queue up behind the blocking task and should then be interleaved
+        first = pool.submit_batch(order.append, [("a",)] * 3)
+        second = pool.submit_batch(order.append, [("b",)] * 3)
+        stats = pool.stats()
+        self.assertEqual(stats["queued"], 6)
+        self.assertEqual(stats["waiting_batches"], 2)
+
+        release.set()
+        for future in [blocker] + first + second:
+            future.result()
+        self.assertEqual(order, ["a", "b", "a", "b", "a", "b"])
+        self.assertEqual(pool.stats()["queued"], 0)
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
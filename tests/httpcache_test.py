@@ -0,0 +1,136 @@
+from context import httpcache
+
+import gzip
+import unittest
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from mock import patch
+
+
+LARGE_BODY = b'{"article_views": []}' * 100
+
+
+class HttpCacheTest(unittest.TestCase):
+    def setUp(self):
+        httpcache.validators.clear()
+        self.computed = 0
+        app = Flask(__name__)
+
+        @app.route("/<end_date>")
+        def view(end_date):
+            cached = httpcache.not_modified()
+            if cached is not None:
+                return cached
+            self.computed += 1
+            return httpcache.cacheable(b'{"views": 1}', end_date)
+
+        @app.route("/large")
+        def large_view():
+            cached = httpcache.not_modified()
+            if cached is not None:
+                return cached
+            return httpcache.cacheable(LARGE_BODY, "2023-07-31")
+
+        @app.route("/partial/<end_date>")
+        def partial_view(end_date):
+            return httpcache.cacheable(b'{"views": 1}', end_date, complete=False)
+
+        @app.route("/batch", methods=["POST"])
+        def batch_view():
+            return httpcache.compressed(LARGE_BODY)
+
+        self.client = app.test_client()
+
+    def test_past_ranges_immutable(self):
+        response = self.client.get("/2023-07-31")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["ETag"].startswith('"'))
+        self.assertEqual(
+            response.headers["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+        self.assertEqual(
+            response.last_modified, datetime(2023, 8, 2, tzinfo=timezone.utc)
+        )
+
+    def test_partial_ranges_short_lived(self):
+        response = self.client.get("/partial/2023-07-31")
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=60")
+
+    def test_recent_ranges_short_lived(self):
+        today = datetime.now(timezone.utc).date()
+        for day in [today, today - timedelta(days=1)]:
+            response = self.client.get("/" + day.isoformat())
+            self.assertEqual(response.headers["Cache-Control"], "public, max-age=60")
+
+    def test_not_modified_without_recomputing(self):
+        etag = self.client.get("/2023-07-31").headers["ETag"]
+
+        response = self.client.get("/2023-07-31", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.computed, 1)
+
+        response = self.client.get(
+            "/2023-07-31", headers={"If-Modified-Since": "Thu, 03 Aug 2023 00:00:00 GMT"}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get("/2023-07-31", headers={"If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.computed, 2)
+
+    def test_unknown_url_checked_after_computing(self):
+        etag = self.client.get("/2023-07-31").headers["ETag"]
+        httpcache.validators.clear()
+
+        response = self.client.get("/2023-07-31", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.computed, 2)
+
+    @patch("config.HTTP_RECENT_MAX_AGE", 0)
+    def test_expired_validators_forgotten(self):
+        path = "/" + datetime.now(timezone.utc).date().isoformat()
+        etag = self.client.get(path).headers["ETag"]
+        self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(self.computed, 2)
+
+    def test_compressed_representations(self):
+        identity = self.client.get("/large", headers={"Accept-Encoding": "identity"})
+        gzipped = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(identity.data, LARGE_BODY)
+        self.assertIsNone(identity.headers.get("Content-Encoding"))
+        self.assertEqual(gzipped.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(gzipped.data), LARGE_BODY)
+        self.assertIn("Accept-Encoding", gzipped.headers["Vary"])
+        self.assertNotEqual(gzipped.headers["ETag"], identity.headers["ETag"])
+
+        # Each representation is revalidated against its own ETag
+        response = self.client.get(
+            "/large",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            "/large",
+            headers={"Accept-Encoding": "identity", "If-None-Match": gzipped.headers["ETag"]},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_compressed_without_caching_headers(self):
+        res = self.client.post("/batch", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.data), LARGE_BODY)
+        self.assertIn("Accept-Encoding", res.headers["Vary"])
+        self.assertNotIn("ETag", res.headers)
+        self.assertNotIn("Cache-Control", res.headers)
+        self.assertEqual(len(httpcache.validators), 0)
+
+    def test_month_end(self):
+        self.assertEqual(httpcache.month_end("2024-02").isoformat(), "2024-02-29")
+
+
+if __name__ == "__main__":
+    unittest.main()
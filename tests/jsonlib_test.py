@@ -0,0 +1,33 @@
+from context import jsonlib
+
+import unittest
+from mock import patch
+
+
+class JsonlibTest(unittest.TestCase):
+    def test_loads(self):
+        self.assertEqual(jsonlib.loads(b'{"items": [1, 2]}'), {"items": [1, 2]})
+        self.assertEqual(jsonlib.loads('{"items": []}'), {"items": []})
+
+    def test_loads_without_orjson(self):
+        with patch.object(jsonlib, "orjson", None):
+            self.assertEqual(jsonlib.loads(b'{"items": [1]}'), {"items": [1]})
+        self.assertRaises(ValueError, lambda: jsonlib.loads(b"{"))
+
+    def test_dumps(self):
+        document = {"article_views": [{"rank": 1, "article": "Café", "views": 10}]}
+        self.assertIsInstance(jsonlib.dumps(document), bytes)
+        self.assertEqual(jsonlib.loads(jsonlib.dumps(document)), document)
+        with patch.object(jsonlib, "orjson", None):
+            self.assertEqual(jsonlib.loads(jsonlib.dumps(document)), document)
+
+    def test_dumps_same_bytes_without_orjson(self):
+        document = {"article_views": [{"rank": 1, "article": "Café", "views": 10}]}
+        expected = '{"article_views":[{"rank":1,"article":"Café","views":10}]}'.encode()
+        self.assertEqual(jsonlib.dumps(document), expected)
+        with patch.object(jsonlib, "orjson", None):
+            self.assertEqual(jsonlib.dumps(document), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
+from context import main
+
 import requests
 import json
 import unittest
+from mock import patch
 
 BASE_URL = "http://127.0.0.1:8000/"
 
@@ -80,5 +83,56 @@ class MainTest(unittest.TestCase):
         self.assertEqual(res.status_code, 404)
 
 
+
+def handler():
+    return "ok"
+
+
+class ProfilingTest(unittest.TestCase):
+    @patch("config.PROFILE_ALLOWED_IPS", ["10.0.0.0/8", "::1"])
+    def test_profiling_allowed(self):
+        self.assertTrue(main.profiling_allowed("10.1.2.3"))
+        self.assertTrue(main.profiling_allowed("::1"))
+        self.assertFalse(main.profiling_allowed("192.168.0.1"))
+        self.assertFalse(main.profiling_allowed("not an address"))
+
+    @patch("config.PROFILE_ALLOWED_IPS", ["10.0.0.0/8"])
+    def test_disallowed_address_skips_profiler(self):
+        # Importing the profiler fails while its sys.modules entry is None
+        with patch.dict("sys.modules", {"profiler": None}):
+            with main.app.test_request_context(
+                "/top/monthly/2023-06?profile=1",
+                environ_base={"REMOTE_ADDR": "192.168.0.1"},
+            ):
+                self.assertIs(main.profiled(handler), handler)
+            with main.app.test_request_context(
+                "/top/monthly/2023-06?profile=1",
+                environ_base={"REMOTE_ADDR": "10.0.0.1"},
+            ):
+                self.assertRaises(ImportError, lambda: main.profiled(handler))
+
+    @patch("config.PROFILE_PATH", "")
+    @patch("config.PROFILE_ALLOWED_IPS", ["10.0.0.0/8"])
+    def test_allowed_address_profiled(self):
+        with main.app.test_request_context(
+            "/top/monthly/2023-06",
+            headers={"X-Profile": "text"},
+            environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        ):
+            res = main.profiled(handler)()
+        self.assertEqual(res.headers["X-Profile-Status"], "200")
+        self.assertIn("handler", res.get_data(as_text=True))
+
+    @patch("config.PROFILE_ALLOWED_IPS", ["10.0.0.0/8"])
+    def test_other_values_not_profiled(self):
+        for value in ("0", "false", "yes"):
+            with main.app.test_request_context(
+                "/top/monthly/2023-06?profile=" + value,
+                environ_base={"REMOTE_ADDR": "10.0.0.1"},
+            ):
+                self.assertIs(main.profiled(handler), handler)
+                self.assertEqual(main.profiled(handler)(), "ok")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,116 @@
+from context import metrics
+
+import unittest
+from flask import Flask
+from mock import patch
+
+
+class MetricsTest(unittest.TestCase):
+    def test_disabled_counter_is_noop(self):
+        counter = metrics.Counter("test_disabled_total", "Disabled", ("status",))
+        metrics.registry.remove(counter)
+        with patch.object(metrics, "enabled", False):
+            counter.inc("200")
+        self.assertEqual(
+            counter.render(),
+            ["# HELP test_disabled_total Disabled", "# TYPE test_disabled_total counter"],
+        )
+
+    def test_counter(self):
+        counter = metrics.Counter("test_responses_total", "Responses", ("status",))
+        metrics.registry.remove(counter)
+        with patch.object(metrics, "enabled", True):
+            counter.inc("200")
+            counter.inc("200")
+            counter.inc("404", amount=3)
+        self.assertEqual(
+            counter.render()[2:],
+            [
+                'test_responses_total{status="200"} 2',
+                'test_responses_total{status="404"} 3',
+            ],
+        )
+
+    def test_histogram(self):
+        histogram = metrics.Histogram(
+            "test_seconds", "Latency", ("stage",), buckets=(0.1, 1)
+        )
+        metrics.registry.remove(histogram)
+        with patch.object(metrics, "enabled", True):
+            histogram.observe(0.05, "parse")
+            histogram.observe(0.5, "parse")
+            histogram.observe(2.0, "parse")
+        self.assertEqual(
+            histogram.render()[2:],
+            [
+                'test_seconds_bucket{stage="parse",le="0.1"} 1',
+                'test_seconds_bucket{stage="parse",le="1"} 2',
+                'test_seconds_bucket{stage="parse",le="+Inf"} 3',
+                'test_seconds_sum{stage="parse"} 2.55',
+                'test_seconds_count{stage="parse"} 3',
+            ],
+        )
+
+    def test_collected(self):
+        collected = metrics.Collected("test_tasks", "Tasks", "gauge", ("state",))
+        metrics.registry.remove(collected)
+        collected.add(lambda: {("running",): 2})
+        collected.add(lambda: {("queued",): 5})
+        collected.add(lambda: {("queued",): 1})
+        self.assertEqual(
+            collected.render(),
+            [
+                "# HELP test_tasks Tasks",
+                "# TYPE test_tasks gauge",
+                'test_tasks{state="queued"} 6',
+                'test_tasks{state="running"} 2',
+            ],
+        )
+
+    def test_escape_label(self):
+        self.assertEqual(
+            metrics.render_sample("test", ("path",), ('a"b\\c\n',), 1),
+            'test{path="a\\"b\\\\c\\n"} 1',
+        )
+
+    def test_stage_disabled(self):
+        with patch.object(metrics, "enabled", False), patch.object(
+            metrics, "server_timing", False
+        ):
+            self.assertIs(metrics.stage("parse"), metrics.NOOP)
+
+    def test_server_timing(self):
+        app = Flask(__name__)
+        app.before_request(metrics.begin_request)
+        app.after_request(
+            lambda response: metrics.end_request(response, "/", "GET")
+        )
+
+        @app.route("/")
+        def view():
+            metrics.record_stage("fetch", 0.0125)
+            metrics.record_stage("fetch", 0.0025)
+            metrics.record_stage("serialize", 0.001)
+            return "ok"
+
+        with patch.object(metrics, "server_timing", True):
+            header = app.test_client().get("/").headers["Server-Timing"]
+        entries = header.split(", ")
+        self.assertEqual(entries[:2], ["fetch;dur=15.0", "serialize;dur=1.0"])
+        self.assertTrue(entries[2].startswith("total;dur="))
+
+    def test_render(self):
+        with patch.object(metrics, "enabled", True):
+            metrics.http_responses.inc("/top/<granularity>/<date>", "GET", "200")
+        body = metrics.render()
+        self.assertIn("# TYPE pageviews_stage_seconds histogram", body)
+        self.assertIn(
+            'pageviews_http_responses_total{endpoint="/top/<granularity>/<date>",'
+            'method="GET",status="200"}',
+            body,
+        )
+        self.assertTrue(body.endswith("\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,13 @@
-from context import pageviews, wikipedia_client, response
+from context import pageviews, wikipedia_client, async_wikipedia_client, response
 
+import json
+import tempfile
 import unittest
 import mock
-from datetime import datetime, date
-from mock import patch, PropertyMock
+from datetime import datetime, date, timedelta
+from mock import patch, PropertyMock, AsyncMock, ANY
 import errors
+from columnar import ColumnarStore
 
 
 class ViewsPerArticleTest(unittest.TestCase):
@@ -67,28 +70,66 @@ class ViewsPerArticleTest(unittest.TestCase):
         )
 
 
+def daily_top_articles(dates, parse, partial=False):
+    """Returns a parsed daily top articles payload for each date, in order"""
+    body = json.dumps(
+        {
+            "items": [
+                {
+                    "articles": [
+                        {"article": "foo", "views": 4},
+                        {"article": "bar", "views": 2},
+                    ]
+                }
+            ]
+        }
+    ).encode()
+    return [parse(body) for _ in dates]
+
+
+class ViewsPerArticleBatchTest(unittest.TestCase):
+    @patch("wikipedia_client.views_per_article")
+    def test_batch(self, mock_views_per_article):
+        def views_per_article(article, start, end, granularity):
+            if article == "missing":
+                raise errors.ZeroOrNotLoadedDataException([start])
+            return {"items": [{"views": len(article)}]}
+
+        mock_views_per_article.side_effect = views_per_article
+        items = [
+            ("foo", "monthly", "2023-07"),
+            ("missing", "monthly", "2023-07"),
+            ("foobar", "weekly", "2023-07-01"),
+            ("foo", "yearly", "2023"),
+        ]
+
+        results = sorted(pageviews.views_per_article_batch(items), key=lambda r: r[0])
+
+        self.assertEqual([idx for idx, _, _ in results], [0, 1, 2, 3])
+        self.assertEqual(results[0][1].views, 3)
+        self.assertEqual(results[2][1].views, 6)
+        self.assertEqual(results[2][1].end_date, "2023-07-07")
+        self.assertIsInstance(results[1][2], errors.ZeroOrNotLoadedDataException)
+        self.assertIsInstance(results[3][2], errors.InvalidInputException)
+        self.assertIsNone(results[0][2])
+
+    @patch("config.BATCH_MAX_ITEMS", 2)
+    def test_invalid_batch(self):
+        for items in [[], None, [("foo", "monthly", "2023-07")] * 3]:
+            self.assertRaises(
+                errors.InvalidInputException,
+                lambda: pageviews.views_per_article_batch(items),
+            )
+
+
 class TopViewsTest(unittest.TestCase):
-    @patch("response.TopViewsResponse")
+    def setUp(self):
+        pageviews.top_views_cache.clear()
+        pageviews.window_aggregator.clear()
+
     @patch("wikipedia_client.top_articles")
-    def test_get_top_articles(self, mock_top_articles, mock_response):
-        mock_data = [
-            {
-                "items": [
-                    {
-                        "articles": [
-                            {"article": "foo", "views": 4},
-                            {"article": "bar", "views": 2},
-                        ]
-                    }
-                ]
-            }
-        ]
-        mock_top_articles.return_value = mock_data
-        response_start_date = datetime(2023, 7, 1)
-        response_end_date = datetime(2023, 7, 7)
-        mock_response.return_value = response.TopViewsResponse(
-            mock_data, response_start_date, response_end_date
-        )
+    def test_get_top_articles_weekly(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
 
         result = pageviews.top_views("weekly", "2023-07-01")
 
@@ -101,33 +142,20 @@ class TopViewsTest(unittest.TestCase):
             "2023/07/06",
             "2023/07/07",
         ]
-        mock_top_articles.assert_called_with(dates)
-        mock_response.assert_called_with(
-            mock_data, response_start_date, response_end_date
+        mock_top_articles.assert_called_with(dates, parse=ANY, partial=False)
+        self.assertEqual(
+            result.article_views,
+            [
+                {"rank": 1, "article": "foo", "views": 28},
+                {"rank": 2, "article": "bar", "views": 14},
+            ],
         )
-        self.assertEqual(result, mock_response.return_value)
+        self.assertEqual(result.start_date, "2023-07-01")
+        self.assertEqual(result.end_date, "2023-07-07")
 
-    @patch("response.TopViewsResponse")
     @patch("wikipedia_client.top_articles")
-    def test_get_top_articles(self, mock_top_articles, mock_response):
-        mock_data = [
-            {
-                "items": [
-                    {
-                        "articles": [
-                            {"article": "foo", "views": 4},
-                            {"article": "bar", "views": 2},
-                        ]
-                    }
-                ]
-            }
-        ]
-        mock_top_articles.return_value = mock_data
-        response_start_date = datetime(2023, 7, 1)
-        response_end_date = datetime(2023, 7, 31)
-        mock_response.return_value = response.TopViewsResponse(
-            mock_data, response_start_date, response_end_date
-        )
+    def test_get_top_articles_monthly(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
 
         result = pageviews.top_views("monthly", "2023-07")
 
@@ -164,11 +192,199 @@ class TopViewsTest(unittest.TestCase):
             "2023/07/30",
             "2023/07/31",
         ]
-        mock_top_articles.assert_called_with(dates)
-        mock_response.assert_called_with(
-            mock_data, response_start_date, response_end_date
+        mock_top_articles.assert_called_with(dates, parse=ANY, partial=False)
+        self.assertEqual(result.article_views[0]["views"], 124)
+        self.assertEqual(result.start_date, "2023-07-01")
+        self.assertEqual(result.end_date, "2023-07-31")
+
+    @patch("wikipedia_client.top_articles")
+    def test_overlapping_weeks_reuse_days(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+
+        pageviews.top_views("weekly", "2023-07-01")
+        result = pageviews.top_views("weekly", "2023-07-02")
+
+        # Only the day the second week adds should be fetched
+        mock_top_articles.assert_called_with(["2023/07/08"], parse=ANY, partial=False)
+        self.assertEqual(result.article_views[0]["views"], 28)
+
+    @patch("wikipedia_client.top_articles")
+    def test_recent_days_refetched(self, mock_top_articles):
+        upstream = {"views": 1}
+
+        def top_articles(dates, parse, partial=False):
+            body = json.dumps(
+                {"items": [{"articles": [{"article": "foo", "views": upstream["views"]}]}]}
+            ).encode()
+            return [parse(body) for _ in dates]
+
+        mock_top_articles.side_effect = top_articles
+        today = datetime.utcnow().date()
+        start = (today - timedelta(days=6)).strftime("%Y-%m-%d")
+
+        first = pageviews.top_views("weekly", start)
+        upstream["views"] = 100
+        pageviews.top_views_cache.clear()
+        second = pageviews.top_views("weekly", start)
+
+        # Final days are reused, while today and yesterday are fetched again
+        mock_top_articles.assert_called_with(
+            [
+                (today - timedelta(days=1)).strftime("%Y/%m/%d"),
+                today.strftime("%Y/%m/%d"),
+            ],
+            parse=ANY,
+            partial=False,
+        )
+        self.assertEqual(first.article_views[0]["views"], 7)
+        self.assertEqual(second.article_views[0]["views"], 5 + 200)
+
+    @patch("wikipedia_client.top_articles")
+    def test_results_cached(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+
+        result = pageviews.top_views("weekly", "2023-07-01")
+        body = pageviews.top_views_json("weekly", "2023-07-01")
+
+        self.assertEqual(mock_top_articles.call_count, 1)
+        self.assertEqual(json.loads(body), result.as_dict())
+        self.assertIs(pageviews.top_views("weekly", "2023-07-01"), result)
+
+        # A different start date is a different result
+        pageviews.top_views("monthly", "2023-07")
+        self.assertEqual(mock_top_articles.call_count, 2)
+
+    @patch("wikipedia_client.top_articles")
+    def test_limit(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+
+        result = pageviews.top_views("weekly", "2023-07-01", "1")
+        self.assertEqual(
+            result.article_views, [{"rank": 1, "article": "foo", "views": 28}]
+        )
+        self.assertEqual(len(pageviews.top_views("weekly", "2023-07-01").article_views), 2)
+        # The daily views are only fetched once
+        self.assertEqual(mock_top_articles.call_count, 1)
+
+        for limit in ["0", "-3", "ten"]:
+            self.assertRaises(
+                errors.InvalidInputException,
+                lambda: pageviews.top_views("weekly", "2023-07-01", limit),
+            )
+
+    @patch("wikipedia_client.top_articles")
+    def test_partial(self, mock_top_articles):
+        loaded = {"last": "2023/07/20"}
+
+        def top_articles(dates, parse, partial=False):
+            available = daily_top_articles(dates, parse)
+            if not partial and dates[-1] > loaded["last"]:
+                raise errors.ZeroOrNotLoadedDataException(dates)
+            return [
+                views if date <= loaded["last"] else None
+                for date, views in zip(dates, available)
+            ]
+
+        mock_top_articles.side_effect = top_articles
+        self.assertRaises(
+            errors.ZeroOrNotLoadedDataException,
+            lambda: pageviews.top_views("monthly", "2023-07"),
+        )
+
+        result = pageviews.top_views("monthly", "2023-07", partial=True)
+        self.assertEqual(result.article_views[0], {"rank": 1, "article": "foo", "views": 80})
+        self.assertEqual(
+            result.missing_dates,
+            ["2023-07-{day}".format(day=day) for day in range(21, 32)],
+        )
+        body = json.loads(response.serialize(result))
+        self.assertEqual(body["missing_dates"][0], "2023-07-21")
+
+        # Polling again once more days are loaded only fetches the days that were missing
+        pageviews.top_views_cache.clear()
+        loaded["last"] = "2023/07/22"
+        result = pageviews.top_views("monthly", "2023-07", partial=True)
+        mock_top_articles.assert_called_with(
+            ["2023/07/{day}".format(day=day) for day in range(21, 32)],
+            parse=ANY,
+            partial=True,
+        )
+        self.assertEqual(result.article_views[0]["views"], 88)
+        self.assertEqual(len(result.missing_dates), 9)
+
+        # A result with every day has no missing dates, and a full result is unchanged
+        pageviews.top_views_cache.clear()
+        loaded["last"] = "2023/07/31"
+        result = pageviews.top_views("monthly", "2023-07", partial=True)
+        self.assertEqual(result.missing_dates, [])
+        self.assertNotIn(
+            "missing_dates", json.loads(pageviews.top_views_json("monthly", "2023-07"))
+        )
+
+    @patch("config.STREAM_PROVISIONAL_LIMIT", 1)
+    @patch("wikipedia_client.top_articles_as_completed")
+    def test_progressive(self, mock_as_completed):
+        mock_as_completed.side_effect = lambda dates, parse: zip(
+            reversed(dates), daily_top_articles(dates, parse)
+        )
+
+        rankings = list(pageviews.top_views_progressive("weekly", "2023-07-01"))
+
+        self.assertEqual([final for _, final in rankings], [False] * 6 + [True])
+        first, _ = rankings[0]
+        self.assertEqual(first.article_views, [{"rank": 1, "article": "foo", "views": 4}])
+        self.assertEqual(len(first.missing_dates), 6)
+        self.assertNotIn("2023-07-07", first.missing_dates)
+        final, _ = rankings[-1]
+        self.assertEqual(len(final.article_views), 2)
+        self.assertEqual(final.article_views[0]["views"], 28)
+        self.assertIsNone(final.missing_dates)
+
+        # The final ranking is cached like top_views, and streamed at once next time
+        self.assertIs(pageviews.top_views("weekly", "2023-07-01"), final)
+        self.assertEqual(
+            list(pageviews.top_views_progressive("weekly", "2023-07-01")), [(final, True)]
+        )
+        self.assertEqual(mock_as_completed.call_count, 1)
+
+    @patch("wikipedia_client.top_articles_as_completed")
+    def test_progressive_missing_days(self, mock_as_completed):
+        mock_as_completed.side_effect = lambda dates, parse: [
+            (date, None if date == "2023/07/03" else views)
+            for date, views in zip(dates, daily_top_articles(dates, parse))
+        ]
+
+        rankings = pageviews.top_views_progressive("weekly", "2023-07-01")
+        self.assertRaises(errors.ZeroOrNotLoadedDataException, lambda: list(rankings))
+
+        rankings = list(
+            pageviews.top_views_progressive("weekly", "2023-07-01", partial=True)
+        )
+        final, _ = rankings[-1]
+        self.assertEqual(final.missing_dates, ["2023-07-03"])
+        self.assertEqual(final.article_views[0]["views"], 24)
+
+    @patch("wikipedia_client.top_articles")
+    def test_partial_with_gap(self, mock_top_articles):
+        def top_articles(dates, parse, partial=False):
+            available = daily_top_articles(dates, parse)
+            return [
+                None if date == "2023/07/03" else views
+                for date, views in zip(dates, available)
+            ]
+
+        mock_top_articles.side_effect = top_articles
+        result = pageviews.top_views("weekly", "2023-07-01", partial=True)
+        self.assertEqual(result.article_views[0]["views"], 24)
+        self.assertEqual(result.missing_dates, ["2023-07-03"])
+
+    @patch("wikipedia_client.top_articles")
+    def test_partial_without_data(self, mock_top_articles):
+        mock_top_articles.side_effect = lambda dates, parse, partial: [None] * len(dates)
+        self.assertRaises(
+            errors.ZeroOrNotLoadedDataException,
+            lambda: pageviews.top_views("weekly", "2023-07-01", partial=True),
         )
-        self.assertEqual(result, mock_response.return_value)
 
     def test_exceptions_thrown(self):
         self.assertRaises(
@@ -181,9 +397,141 @@ class TopViewsTest(unittest.TestCase):
         )
 
 
+class TopViewsRangeTest(unittest.TestCase):
+    def setUp(self):
+        pageviews.top_views_cache.clear()
+
+    @patch("config.RANGE_CHUNK_DAYS", 7)
+    @patch("config.AGGREGATION_PROCESSES", 0)
+    @patch("wikipedia_client.top_articles")
+    def test_range_chunked(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+
+        result = pageviews.top_views_range("2023-07-01", "2023-07-20")
+
+        # 20 days in chunks of 7
+        self.assertEqual(
+            [len(args[0]) for args, _ in mock_top_articles.call_args_list], [7, 7, 6]
+        )
+        mock_top_articles.assert_called_with(
+            ["2023/07/{day}".format(day=day) for day in range(15, 21)], parse=ANY
+        )
+        self.assertEqual(
+            result.article_views,
+            [
+                {"rank": 1, "article": "foo", "views": 80},
+                {"rank": 2, "article": "bar", "views": 40},
+            ],
+        )
+        self.assertEqual(result.start_date, "2023-07-01")
+        self.assertEqual(result.end_date, "2023-07-20")
+
+        limited = pageviews.top_views_range("2023-07-01", "2023-07-20", "1")
+        self.assertEqual(limited.article_views, result.article_views[:1])
+        self.assertIs(pageviews.top_views_range("2023-07-01", "2023-07-20"), result)
+
+    @patch("config.RANGE_CHUNK_DAYS", 3)
+    @patch("config.AGGREGATION_PROCESSES", 2)
+    @patch("wikipedia_client.top_articles")
+    def test_range_process_pool(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+
+        result = pageviews.top_views_range("2023-01-01", "2023-01-31")
+
+        self.assertEqual(mock_top_articles.call_count, 11)
+        self.assertEqual(result.article_views[0], {"rank": 1, "article": "foo", "views": 124})
+
+    @patch("config.RANGE_CHUNK_DAYS", 2)
+    @patch("config.AGGREGATION_PROCESSES", 0)
+    @patch("wikipedia_client.top_articles")
+    def test_range_missing_dates(self, mock_top_articles):
+        def top_articles(dates, parse):
+            if "2023/07/03" in dates:
+                raise errors.ZeroOrNotLoadedDataException(dates)
+            return daily_top_articles(dates, parse)
+
+        mock_top_articles.side_effect = top_articles
+
+        with self.assertRaises(errors.ZeroOrNotLoadedDataException) as context:
+            pageviews.top_views_range("2023-07-01", "2023-07-06")
+        # The chunks after the missing one are still fetched
+        self.assertEqual(mock_top_articles.call_count, 3)
+        self.assertEqual(context.exception.dates, ["2023/07/03", "2023/07/04"])
+
+    def test_invalid_range(self):
+        for start, end in [
+            ("2023-07-02", "2023-07-01"),
+            ("2023-07", "2023-07-31"),
+            ("2022-01-01", "2023-12-31"),
+        ]:
+            self.assertRaises(
+                errors.InvalidInputException,
+                lambda: pageviews.top_views_range(start, end),
+            )
+
+
+class PageviewStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ColumnarStore(self.directory.name)
+        pageviews.top_views_cache.clear()
+        pageviews.window_aggregator.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @patch("wikipedia_client.top_articles")
+    def test_top_views_from_store(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+
+        with patch.object(pageviews, "pageview_store", self.store):
+            first = pageviews.top_views("weekly", "2023-07-01")
+            pageviews.top_views_cache.clear()
+            pageviews.window_aggregator.clear()
+            second = pageviews.top_views("weekly", "2023-07-01")
+
+        self.assertEqual(mock_top_articles.call_count, 1)
+        self.assertEqual(second.article_views, first.article_views)
+
+    @patch("wikipedia_client.views_per_article")
+    @patch("wikipedia_client.daily_views_per_article")
+    def test_article_views_from_store(self, mock_daily_views, mock_views_per_article):
+        mock_daily_views.return_value = [
+            {
+                "items": [
+                    {"timestamp": "202307{day:02d}00".format(day=day), "views": day}
+                    for day in range(1, 32)
+                ]
+            }
+        ]
+
+        with patch.object(pageviews, "pageview_store", self.store):
+            first = pageviews.day_of_month_with_most_views("foo", "2023-07")
+            second = pageviews.day_of_month_with_most_views("foo", "2023-07")
+            weekly = pageviews.views_per_article("weekly", "foo", "2023-07-01")
+            monthly = pageviews.views_per_article("monthly", "foo", "2023-07")
+
+        self.assertEqual(mock_daily_views.call_count, 1)
+        mock_views_per_article.assert_not_called()
+        self.assertEqual((second.date, second.views), (first.date, first.views))
+        self.assertEqual(second.date, ["2023-07-31"])
+        self.assertEqual(weekly.views, sum(range(1, 8)))
+        self.assertEqual(monthly.views, sum(range(1, 32)))
+
+    @patch("wikipedia_client.top_articles")
+    def test_recent_days_not_stored(self, mock_top_articles):
+        mock_top_articles.side_effect = daily_top_articles
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+
+        with patch.object(pageviews, "pageview_store", self.store):
+            pageviews.top_views("weekly", today)
+
+        self.assertIsNone(self.store.top_day(datetime.utcnow()))
+
+
 class DayOfMonthWithMostViewsTest(unittest.TestCase):
     @patch("response.DateWithMostViewsResponse")
-    @patch("wikipedia_client.views_per_article_by_day")
+    @patch("wikipedia_client.daily_views_per_article")
     def test_get_views_per_article_by_day(self, mock_views_by_day, mock_response):
         mock_data = [
             {"items": [{"timestamp": "2023070500", "views": 6}]},
@@ -229,12 +577,73 @@ class DayOfMonthWithMostViewsTest(unittest.TestCase):
             "20230730",
             "20230731",
         ]
-        mock_views_by_day.assert_called_with("foo", dates, "daily")
+        mock_views_by_day.assert_called_with("foo", dates, partial=False)
         mock_response.assert_called_with(mock_data, "foo")
         self.assertEqual(result, mock_response.return_value)
         self.assertEqual(result.date, ["2023-07-05"])
         self.assertEqual(result.views, 6)
 
+    @patch("wikipedia_client.daily_views_per_article")
+    def test_partial(self, mock_views_by_day):
+        mock_views_by_day.return_value = [
+            {
+                "items": [
+                    {"timestamp": "2023070100", "views": 3},
+                    {"timestamp": "2023070200", "views": 5},
+                ]
+            }
+        ]
+
+        result = pageviews.day_of_month_with_most_views("foo", "2023-07", partial=True)
+
+        self.assertEqual(mock_views_by_day.call_args[1], {"partial": True})
+        self.assertEqual((result.date, result.views), (["2023-07-02"], 5))
+        self.assertEqual(len(result.missing_dates), 29)
+        self.assertEqual(result.missing_dates[0], "2023-07-03")
+        self.assertEqual(result.as_dict()["missing_dates"][-1], "2023-07-31")
+
+        mock_views_by_day.return_value = [{"items": []}]
+        self.assertRaises(
+            errors.ZeroOrNotLoadedDataException,
+            lambda: pageviews.day_of_month_with_most_views(
+                "foo", "2023-07", partial=True
+            ),
+        )
+
+    @patch("wikipedia_client.daily_views_per_article")
+    def test_many_articles(self, mock_daily_views):
+        def daily_views_per_article(article, dates):
+            if article == "missing":
+                raise errors.ZeroOrNotLoadedDataException(dates[:1])
+            peak = 3 if article == "foo" else 1
+            return [
+                {
+                    "items": [
+                        {"timestamp": date + "00", "views": peak if idx % 10 == 1 else 0}
+                        for idx, date in enumerate(dates)
+                    ]
+                }
+            ]
+
+        mock_daily_views.side_effect = daily_views_per_article
+
+        results = pageviews.day_of_month_with_most_views_many(
+            ["foo", "missing", "bar"], "2023-07"
+        )
+
+        self.assertEqual([article for article, _, _ in results], ["foo", "missing", "bar"])
+        foo = results[0][1]
+        self.assertEqual((foo.article, foo.views), ("foo", 3))
+        self.assertEqual(foo.date, ["2023-07-02", "2023-07-12", "2023-07-22"])
+        self.assertIsInstance(results[1][2], errors.ZeroOrNotLoadedDataException)
+        self.assertEqual(results[2][1].views, 1)
+        self.assertEqual(mock_daily_views.call_count, 3)
+
+        self.assertRaises(
+            errors.InvalidInputException,
+            lambda: pageviews.day_of_month_with_most_views_many([], "2023-07"),
+        )
+
     def test_exceptions_thrown(self):
         self.assertRaises(
             errors.ZeroOrNotLoadedDataException,
@@ -246,5 +655,40 @@ class DayOfMonthWithMostViewsTest(unittest.TestCase):
         )
 
 
+class AsyncPageviewsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        pageviews.top_views_cache.clear()
+        pageviews.window_aggregator.clear()
+
+    @patch("async_wikipedia_client.top_articles", new_callable=AsyncMock)
+    async def test_top_views_async(self, mock_top_articles):
+        mock_top_articles.side_effect = lambda dates, parse, partial: [
+            parse(json.dumps({"items": [{"articles": [{"article": date, "views": 4}]}]}))
+            for date in dates
+        ]
+
+        result = await pageviews.top_views_async("weekly", "2023-07-01")
+
+        mock_top_articles.assert_awaited_once()
+        self.assertEqual(mock_top_articles.call_args[0][0][0], "2023/07/01")
+        self.assertEqual(result.article_views[0]["article"], "2023/07/07")
+        self.assertEqual(result.end_date, "2023-07-07")
+
+    @patch("async_wikipedia_client.daily_views_per_article", new_callable=AsyncMock)
+    async def test_day_of_month_with_most_views_async(self, mock_views_by_day):
+        mock_views_by_day.return_value = [
+            {"items": [{"timestamp": "2023070500", "views": 6}]}
+        ]
+
+        result = await pageviews.day_of_month_with_most_views_async("foo", "2023-07")
+
+        self.assertEqual(len(mock_views_by_day.call_args[0][1]), 31)
+        self.assertEqual(result.date, ["2023-07-05"])
+
+    async def test_invalid_input_async(self):
+        with self.assertRaises(errors.InvalidInputException):
+            await pageviews.views_per_article_async("yearly", "foo", "2020-07")
+
+
 if __name__ == "__main__":
     unittest.main()
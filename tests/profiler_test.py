@@ -0,0 +1,82 @@
+from context import profiler
+
+import asyncio
+import marshal
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from flask import Flask
+from mock import patch
+
+
+def slow_handler():
+    time.sleep(0.02)
+    return '{"views": 1}', 404
+
+
+async def slow_async_handler():
+    await asyncio.sleep(0)
+    time.sleep(0.02)
+    return '{"views": 1}', 200
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+
+        @app.route("/<value>")
+        def view(value):
+            return profiler.profiled(slow_handler, value)()
+
+        @app.route("/async/<value>")
+        def async_view(value):
+            return app.ensure_sync(profiler.profiled(slow_async_handler, value))()
+
+        self.client = app.test_client()
+
+    @patch("config.PROFILE_PATH", "")
+    def test_pstats(self):
+        res = self.client.get("/1")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["X-Profile-Status"], "404")
+        self.assertEqual(res.headers["Cache-Control"], "no-store")
+        stats = marshal.loads(res.get_data())
+        self.assertIn("slow_handler", [function for _, _, function in stats])
+
+    @patch("config.PROFILE_PATH", "")
+    def test_text(self):
+        res = self.client.get("/text")
+        self.assertEqual(res.mimetype, "text/plain")
+        self.assertIn("slow_handler", res.get_data(as_text=True))
+
+    @patch("config.PROFILE_PATH", "")
+    def test_collapsed(self):
+        res = self.client.get("/collapsed")
+        lines = res.get_data(as_text=True).splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn("slow_handler (profiler_test.py", stack.split(";")[-1])
+        self.assertGreater(int(count), 0)
+
+    @patch("config.PROFILE_PATH", "")
+    def test_coroutine_handler(self):
+        res = self.client.get("/async/text")
+        self.assertEqual(res.headers["X-Profile-Status"], "200")
+        self.assertIn("slow_async_handler", res.get_data(as_text=True))
+
+    def test_profile_path(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with patch("config.PROFILE_PATH", directory):
+                res = self.client.get("/pstats")
+            self.assertEqual(res.status_code, 404)
+            self.assertEqual(res.get_data(), b'{"views": 1}')
+            name = res.headers["X-Profile-File"]
+            self.assertTrue(name.endswith(".pstats"))
+            stats = pstats.Stats(os.path.join(directory, name))
+            self.assertTrue(stats.total_calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
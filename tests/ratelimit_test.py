@@ -0,0 +1,58 @@
+from context import ratelimit
+
+import time
+import unittest
+from ratelimit import AdaptiveRateLimiter
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        limiter = AdaptiveRateLimiter(10, 2)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        # Later requests are spaced out at the rate
+        self.assertAlmostEqual(limiter.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(limiter.reserve(), 0.2, places=2)
+
+    def test_multiplicative_decrease(self):
+        limiter = AdaptiveRateLimiter(10, 5, min_rate=3)
+        limiter.on_throttled()
+        self.assertEqual(limiter.rate, 5)
+        # A burst of 429s only backs off once
+        limiter.on_throttled()
+        self.assertEqual(limiter.rate, 5)
+        self.assertEqual(limiter.stats()["throttled"], 2)
+        # Throttling empties the bucket
+        self.assertAlmostEqual(limiter.reserve(), 0.2, places=2)
+
+        limiter._last_decrease -= 1
+        limiter.on_throttled()
+        self.assertEqual(limiter.rate, 3)
+
+    def test_additive_increase(self):
+        limiter = AdaptiveRateLimiter(10, 5, increase=2)
+        limiter.on_throttled()
+        limiter.on_success()
+        self.assertEqual(limiter.rate, 7)
+        limiter.on_success()
+        limiter.on_success()
+        self.assertEqual(limiter.rate, 10)
+
+    def test_retry_after(self):
+        limiter = AdaptiveRateLimiter(10, 5)
+        limiter.on_throttled(retry_after=2)
+        self.assertGreater(limiter.reserve(), 1.9)
+
+        limiter.reset()
+        self.assertEqual(limiter.reserve(), 0)
+
+    def test_acquire(self):
+        limiter = AdaptiveRateLimiter(50, 1)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.035)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
+import json
 import unittest
 
+from array import array
 from context import errors, response
 from datetime import datetime, date
+from mock import patch
 from errors import ParseResponseException
 from response import TopViewsResponse, DateWithMostViewsResponse, ArticleViewsResponse
 
@@ -39,6 +42,52 @@ class TopViewsResponseTest(unittest.TestCase):
         self.assertEqual(result.start_date, "2023-07-01")
         self.assertEqual(result.end_date, "2023-07-07")
 
+    def test_limit(self):
+        day = {
+            "items": [
+                {
+                    "articles": [
+                        {"article": "foo", "views": 3},
+                        {"article": "bar", "views": 5},
+                        {"article": "baz", "views": 3},
+                        {"article": "qux", "views": 1},
+                    ]
+                }
+            ]
+        }
+        full = TopViewsResponse([day], datetime(2023, 7, 1), datetime(2023, 7, 7))
+        for limit in range(1, 6):
+            result = TopViewsResponse(
+                [day], datetime(2023, 7, 1), datetime(2023, 7, 7), limit
+            )
+            self.assertEqual(result.article_views, full.article_views[:limit])
+        # Ties are broken by reverse article name, as without a limit
+        self.assertEqual(
+            [a["article"] for a in full.article_views], ["bar", "foo", "baz", "qux"]
+        )
+
+    def test_from_ranking(self):
+        result = TopViewsResponse.from_ranking(
+            response.rank_articles({"foo": 2, "bar": 7}, 1),
+            datetime(2023, 7, 1),
+            datetime(2023, 7, 7),
+        )
+        self.assertEqual(result.article_views, [{"rank": 1, "article": "bar", "views": 7}])
+        self.assertEqual(result.end_date, "2023-07-07")
+
+    def test_columns(self):
+        result = TopViewsResponse.from_ranking(
+            response.rank_articles({"foo": 2, "bar": 7, "baz": 2}),
+            datetime(2023, 7, 1),
+            datetime(2023, 7, 7),
+        )
+        self.assertEqual(result.names, ("bar", "foo", "baz"))
+        self.assertEqual(result.views, array("q", [7, 2, 2]))
+        self.assertFalse(hasattr(result, "__dict__"))
+        self.assertEqual(
+            response.rank_articles({"foo": 2, "bar": 7}, 1), (("bar",), array("q", [7]))
+        )
+
     def test_exception(self):
         day1 = {
             "items": [
@@ -120,5 +169,51 @@ class ArticleViewsResponseTest(unittest.TestCase):
         )
 
 
+class SerializeTest(unittest.TestCase):
+    def test_serialize(self):
+        data = {"items": [{"article": "foo", "views": 10}]}
+        result = ArticleViewsResponse(data, "foo", date(2023, 7, 1), date(2023, 7, 7))
+        self.assertEqual(
+            json.loads(response.serialize(result)),
+            {
+                "views": 10,
+                "article": "foo",
+                "start_date": "2023-07-01",
+                "end_date": "2023-07-07",
+            },
+        )
+
+    def test_serialize_top_views(self):
+        result = TopViewsResponse.from_ranking(
+            response.rank_articles({"foo": 2, "bar": 7}),
+            datetime(2023, 7, 1),
+            datetime(2023, 7, 7),
+        )
+        self.assertEqual(
+            response.serialize(result),
+            json.dumps(
+                {
+                    "start_date": "2023-07-01",
+                    "end_date": "2023-07-07",
+                    "article_views": [
+                        {"rank": 1, "article": "bar", "views": 7},
+                        {"rank": 2, "article": "foo", "views": 2},
+                    ],
+                },
+                separators=(",", ":"),
+            ).encode(),
+        )
+
+    def test_serialize_without_orjson(self):
+        result = TopViewsResponse.from_ranking(
+            response.rank_articles({"Café": 2, "bar": 7}),
+            datetime(2023, 7, 1),
+            datetime(2023, 7, 7),
+        )
+        body = response.serialize(result)
+        with patch("jsonlib.orjson", None):
+            self.assertEqual(response.serialize(result), body)
+
+
 if __name__ == "__main__":
     unittest.main()
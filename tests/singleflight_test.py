@@ -0,0 +1,57 @@
+from context import singleflight
+
+import threading
+import time
+import unittest
+from singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def fetch(key):
+            calls.append(key)
+            release.wait()
+            return key.upper()
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("a", fetch, "a")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        while flight.stats()["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(results, ["A"] * 4)
+        self.assertEqual(flight.stats(), {"calls": 1, "coalesced": 3, "in_flight": 0})
+
+    def test_sequential_calls_not_coalesced(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("a", str.upper, "a"), "A")
+        self.assertEqual(flight.do("a", str.upper, "b"), "B")
+        self.assertEqual(flight.stats()["calls"], 2)
+
+    def test_exception_shared(self):
+        flight = SingleFlight()
+        future, leader = flight.begin("a")
+        follower, follower_leads = flight.begin("a")
+        self.assertTrue(leader)
+        self.assertFalse(follower_leads)
+        self.assertIs(future, follower)
+
+        flight.finish("a", exception=ValueError("foo"))
+        self.assertRaises(ValueError, follower.result)
+        self.assertTrue(flight.begin("a")[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+from context import warm
+
+import io
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from mock import patch
+from warm import Checkpoint, Progress
+
+
+class WarmTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.directory.name, "checkpoint")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_warm(self, start, end, top=True, articles=()):
+        checkpoint = Checkpoint(self.checkpoint_path)
+        progress = Progress(0, 60, out=io.StringIO())
+        try:
+            failed = warm.warm(
+                datetime.strptime(start, "%Y-%m-%d"),
+                datetime.strptime(end, "%Y-%m-%d"),
+                top,
+                list(articles),
+                checkpoint,
+                progress,
+            )
+        finally:
+            checkpoint.close()
+        return failed, progress
+
+    @patch("pageviews.prefetch_article_month")
+    @patch("pageviews.prefetch_top_day")
+    def test_resumes_from_checkpoint(self, mock_top_day, mock_article_month):
+        mock_top_day.return_value = True
+        mock_article_month.return_value = True
+
+        failed, progress = self.run_warm("2023-01-30", "2023-02-02", articles=["foo"])
+
+        self.assertEqual(failed, 0)
+        self.assertEqual(progress.done, 6)
+        self.assertEqual(
+            sorted(call[0][0].day for call in mock_top_day.call_args_list), [1, 2, 30, 31]
+        )
+        self.assertEqual(
+            sorted(call[0] for call in mock_article_month.call_args_list),
+            [("foo", "2023-01"), ("foo", "2023-02")],
+        )
+
+        # Everything is in the checkpoint, so a second run fetches nothing
+        mock_top_day.reset_mock()
+        mock_article_month.reset_mock()
+        failed, progress = self.run_warm("2023-01-28", "2023-02-02", articles=["foo"])
+        self.assertEqual(
+            sorted(call[0][0].day for call in mock_top_day.call_args_list), [28, 29]
+        )
+        mock_article_month.assert_not_called()
+        self.assertEqual(progress.done, 8)
+
+    @patch("pageviews.prefetch_article_month")
+    @patch("pageviews.prefetch_top_day")
+    def test_failures_are_retried(self, mock_top_day, mock_article_month):
+        mock_top_day.side_effect = Exception("throttled")
+        mock_article_month.side_effect = [False]
+
+        with patch("sys.stderr", io.StringIO()):
+            failed, progress = self.run_warm("2023-01-01", "2023-01-02", articles=["foo"])
+
+        self.assertEqual(failed, 2)
+        self.assertEqual(progress.missing, 1)
+        # Neither the failed days nor the article month without data are done
+        self.assertEqual(Checkpoint(self.checkpoint_path).done, set())
+
+    @patch("pageviews.prefetch_article_month")
+    @patch("pageviews.prefetch_top_day")
+    def test_resumes_missing_and_recent_days(self, mock_top_day, mock_article_month):
+        mock_top_day.side_effect = lambda day: day != datetime(2023, 1, 2)
+        mock_article_month.return_value = True
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+
+        self.run_warm("2023-01-01", "2023-01-03")
+        self.run_warm(today, today, articles=["foo"])
+        self.assertEqual(
+            Checkpoint(self.checkpoint_path).done, {"top/2023-01-01", "top/2023-01-03"}
+        )
+
+        # A resumed run fetches the day that was missing, and today's data again
+        mock_top_day.reset_mock()
+        self.run_warm("2023-01-01", "2023-01-03")
+        mock_top_day.assert_called_once_with(datetime(2023, 1, 2))
+        mock_top_day.reset_mock()
+        mock_article_month.reset_mock()
+        self.run_warm(today, today, articles=["foo"])
+        mock_top_day.assert_called_once_with(datetime.strptime(today, "%Y-%m-%d"))
+        mock_article_month.assert_called_once_with("foo", today[:7])
+
+    @patch("config.POOL_SIZE", 2)
+    @patch("pageviews.prefetch_top_day")
+    def test_slow_day_does_not_hold_back_others(self, mock_top_day):
+        last_day_started = threading.Event()
+
+        def prefetch(day):
+            if day.day == 1:
+                # Only finishes once the last day has been submitted
+                return last_day_started.wait(5)
+            if day.day == 4:
+                last_day_started.set()
+            return True
+
+        mock_top_day.side_effect = prefetch
+
+        failed, progress = self.run_warm("2023-01-01", "2023-01-04")
+
+        self.assertTrue(last_day_started.is_set())
+        self.assertEqual(progress.done, 4)
+        self.assertEqual(len(Checkpoint(self.checkpoint_path).done), 4)
+
+    def test_checkpoint_ignores_partial_lines(self):
+        with open(self.checkpoint_path, "w") as f:
+            f.write("top/2023-01-01\ntop/2023-01-0")
+        checkpoint = Checkpoint(self.checkpoint_path)
+        self.assertEqual(checkpoint.done, {"top/2023-01-01"})
+        checkpoint.mark(["top/2023-01-02"])
+        checkpoint.close()
+        self.assertEqual(
+            Checkpoint(self.checkpoint_path).done, {"top/2023-01-01", "top/2023-01-02"}
+        )
+
+    def test_invalid_arguments(self):
+        with patch("sys.stderr", io.StringIO()):
+            self.assertRaises(SystemExit, lambda: warm.parse_args(["--from", "2023-01-01"]))
+            self.assertRaises(
+                SystemExit,
+                lambda: warm.parse_args(["--from", "2023-01-01", "--to", "2023-01-02"]),
+            )
+            self.assertEqual(
+                warm.main(["--from", "2023-01-02", "--to", "2023-01-01", "--top"]), 2
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
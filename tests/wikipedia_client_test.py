@@ -1,17 +1,31 @@
 from context import wikipedia_client
 from context import errors
 
+import json
+import threading
+import time
 import unittest
 import mock
-from errors import ZeroOrNotLoadedDataException, ThrottlingException
+from errors import (
+    ZeroOrNotLoadedDataException,
+    ThrottlingException,
+    ParseResponseException,
+)
+from datetime import datetime, timedelta
 from mock import patch, call
 
 HEADERS = wikipedia_client.HEADERS
 
 
 class WikipediaClientTest(unittest.TestCase):
-    @patch("requests.get")
+    def setUp(self):
+        wikipedia_client.response_cache.clear()
+        wikipedia_client.rate_limiter.reset()
+
+    @patch("requests.Session.get")
     def test_top_articles(self, mock_requests):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = b'{"items": []}'
         api_url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/top/en.wikipedia/all-access/{date}"
         dates = [
             "2023/07/01",
@@ -28,8 +42,10 @@ class WikipediaClientTest(unittest.TestCase):
         calls = [call(api_url.format(date=date), headers=HEADERS) for date in dates]
         mock_requests.assert_has_calls(calls, any_order=True)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_views_per_article_by_day(self, mock_requests):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = b'{"items": []}'
         article = "foo"
         dates = ["20230701", "20230702", "20230703"]
         api_url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/per-article/en.wikipedia/all-access/all-agents/{article}/daily/{start}/{end}"
@@ -41,8 +57,40 @@ class WikipediaClientTest(unittest.TestCase):
         ]
         mock_requests.assert_has_calls(calls, any_order=True)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
+    def test_daily_views_per_article(self, mock_requests):
+        article = "foo"
+        dates = ["20230701", "20230702", "20230703"]
+        api_url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/per-article/en.wikipedia/all-access/all-agents/{article}/daily/{start}/{end}"
+        items = [{"timestamp": date + "00", "views": 1} for date in dates]
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = json.dumps({"items": items})
+
+        result = wikipedia_client.daily_views_per_article(article, dates)
+
+        # A single ranged request should cover every date
+        mock_requests.assert_called_once_with(
+            api_url.format(article=article, start=dates[0], end=dates[-1]),
+            headers=HEADERS,
+        )
+        self.assertEqual(result, [{"items": items}])
+
+    @patch("requests.Session.get")
+    def test_daily_views_per_article_missing_dates(self, mock_requests):
+        dates = ["20230701", "20230702", "20230703"]
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = json.dumps(
+            {"items": [{"timestamp": "2023070200", "views": 1}]}
+        )
+
+        with self.assertRaises(ZeroOrNotLoadedDataException) as context:
+            wikipedia_client.daily_views_per_article("foo", dates)
+        self.assertEqual(context.exception.dates, ["20230701", "20230703"])
+
+    @patch("requests.Session.get")
     def test_views_per_article(self, mock_requests):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = b'{"items": []}'
         article = "foo"
         start_date = "20230701"
         end_date = "20230703"
@@ -54,6 +102,122 @@ class WikipediaClientTest(unittest.TestCase):
             headers=HEADERS,
         )
 
+    @patch("requests.Session.get")
+    def test_responses_cached(self, mock_requests):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = json.dumps({"items": []})
+        hits = wikipedia_client.response_cache.stats()["memory_hits"]
+
+        first = wikipedia_client.top_articles(["2023/07/01"])
+        second = wikipedia_client.top_articles(["2023/07/01"])
+
+        self.assertEqual(mock_requests.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(
+            wikipedia_client.response_cache.stats()["memory_hits"], hits + 1
+        )
+
+    @patch("requests.Session.get")
+    def test_not_found_cached(self, mock_requests):
+        mock_requests.return_value.status_code = 404
+        for _ in range(2):
+            self.assertRaises(
+                ZeroOrNotLoadedDataException,
+                lambda: wikipedia_client.views_per_article(
+                    "foo", "20030701", "20030731", "monthly"
+                ),
+            )
+        self.assertEqual(mock_requests.call_count, 1)
+
+    @patch("requests.Session.get")
+    def test_top_articles_parse(self, mock_requests):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = b'{"items": []}'
+
+        result = wikipedia_client.top_articles(["2023/07/01", "2023/07/02"], parse=len)
+
+        # Each body is handed to parse instead of being decoded
+        self.assertEqual(result, [13, 13])
+
+    @patch("requests.Session.get")
+    def test_top_articles_as_completed(self, mock_requests):
+        def get(url, headers):
+            response = mock.Mock(status_code=404 if url.endswith("02") else 200)
+            response.content = b'{"items": []}'
+            return response
+
+        mock_requests.side_effect = get
+        dates = ["2023/07/01", "2023/07/02", "2023/07/03"]
+
+        results = dict(wikipedia_client.top_articles_as_completed(dates, parse=len))
+
+        # Dates without data are yielded with None rather than failing the others
+        self.assertEqual(results, {"2023/07/01": 13, "2023/07/02": None, "2023/07/03": 13})
+
+    @patch("metrics.record_stage")
+    @patch("metrics.enabled", True)
+    @patch("requests.Session.get")
+    def test_top_articles_as_completed_fetch_stage(self, mock_requests, mock_record_stage):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = b'{"items": []}'
+
+        list(wikipedia_client.top_articles_as_completed(["2023/07/01", "2023/07/02"]))
+
+        # One wait per date plus the one that finds no more dates
+        stages = [call[0][0] for call in mock_record_stage.call_args_list]
+        self.assertEqual(stages.count("fetch"), 3)
+
+    @patch("requests.Session.get")
+    def test_top_articles_day(self, mock_requests):
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.content = b'{"items": []}'
+
+        # Runs in the calling thread, so it also works as a task in the upstream executor
+        future = wikipedia_client.upstream_executor.submit(
+            wikipedia_client.top_articles_day, "2023/07/01", len
+        )
+        self.assertEqual(future.result(timeout=5), 13)
+
+    @patch("requests.Session.get")
+    def test_concurrent_requests_coalesced(self, mock_requests):
+        release = threading.Event()
+
+        def slow_response(url, headers):
+            release.wait()
+            response = mock.Mock(status_code=200)
+            response.content = json.dumps({"items": []})
+            return response
+
+        mock_requests.side_effect = slow_response
+        coalesced = wikipedia_client.upstream_calls.stats()["coalesced"]
+        threads = [
+            threading.Thread(
+                target=wikipedia_client.top_articles, args=(["2023/07/01"],)
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while wikipedia_client.upstream_calls.stats()["coalesced"] < coalesced + 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mock_requests.call_count, 1)
+        self.assertEqual(wikipedia_client.upstream_calls.stats()["in_flight"], 0)
+
+    def test_cache_ttl(self):
+        today = datetime.utcnow()
+        recent = [
+            (today - timedelta(days=2)).strftime("%Y/%m/%d"),
+            (today - timedelta(days=1)).strftime("%Y/%m/%d"),
+        ]
+        self.assertIsNone(wikipedia_client.cache_ttl(["20230701", "20230731"]))
+        self.assertEqual(
+            wikipedia_client.cache_ttl(recent), wikipedia_client.config.CACHE_RECENT_TTL
+        )
+
     def test_zero_data_exception(self):
         top_articles_url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/top/en.wikipedia/all-access/{date}"
         per_article_url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/per-article/en.wikipedia/all-access/all-agents/{article}/daily/{start}/{end}"
@@ -78,9 +242,25 @@ class WikipediaClientTest(unittest.TestCase):
             ),
         )
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
+    def test_unexpected_status(self, mock_requests):
+        # A status that is neither data, a 404 nor an error is not passed on as a result
+        mock_requests.return_value.status_code = 204
+        mock_requests.return_value.raise_for_status.return_value = None
+        self.assertRaises(
+            ParseResponseException,
+            lambda: wikipedia_client.top_articles(["2023/07/01"]),
+        )
+        self.assertIsNone(
+            wikipedia_client.response_cache.get(
+                wikipedia_client.top_articles_url("2023/07/01")
+            )
+        )
+
+    @patch("requests.Session.get")
     def test_throttling_exception(self, mock_requests):
-        # Should raise throttling exception immediately rather than returning list of errors
+        # Should raise throttling exception once retries are exhausted rather than
+        # returning list of errors
         mock_requests.return_value.status_code = 429
         self.assertRaises(
             ThrottlingException, lambda: wikipedia_client.top_articles(["2023/07/01"])
@@ -98,6 +278,43 @@ class WikipediaClientTest(unittest.TestCase):
             ),
         )
 
+        # The first attempt and each retry are sent for every request
+        self.assertEqual(
+            mock_requests.call_count, 3 * (wikipedia_client.config.THROTTLE_RETRIES + 1)
+        )
+
+    @patch("requests.Session.get")
+    def test_throttled_requests_retried(self, mock_requests):
+        throttled_url = "https://wikimedia.org/api/rest_v1/metrics/pageviews/top/en.wikipedia/all-access/2023/07/02"
+        throttled = []
+
+        def respond(url, headers):
+            response = mock.Mock(status_code=200, headers={})
+            response.content = json.dumps({"items": [{"url": url}]})
+            if url == throttled_url and not throttled:
+                throttled.append(url)
+                response.status_code = 429
+                response.headers = {"Retry-After": "0"}
+            return response
+
+        mock_requests.side_effect = respond
+        dates = ["2023/07/01", "2023/07/02", "2023/07/03"]
+
+        result = wikipedia_client.top_articles(dates)
+
+        # Only the throttled date is requested again, and no results are lost
+        self.assertEqual(mock_requests.call_count, 4)
+        self.assertEqual(result[1], {"items": [{"url": throttled_url}]})
+        self.assertEqual(wikipedia_client.rate_limiter.stats()["throttled"], 1)
+
+    def test_retry_after(self):
+        self.assertEqual(wikipedia_client.retry_after("2"), 2)
+        self.assertEqual(
+            wikipedia_client.retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0
+        )
+        self.assertIsNone(wikipedia_client.retry_after("soon"))
+        self.assertIsNone(wikipedia_client.retry_after(None))
+
 
 if __name__ == "__main__":
     unittest.main()